@@ -1,8 +1,32 @@
+from functools import lru_cache
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds
+    DB_POOL_PRE_PING: bool = True
+    DB_WARM_CONNECTIONS: int = 5  # opened at startup (per engine), at most DB_POOL_SIZE
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # 0 disables
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements per connection
+    DATABASE_REPLICA_URLS: Optional[str] = None  # comma separated, used by read-only endpoints
+    DB_REPLICA_HEALTH_CHECK_INTERVAL: int = 10  # seconds
+    DB_READ_YOUR_WRITES_SECONDS: int = 5
+    DB_SLOW_QUERY_MS: int = 500  # 0 disables the slow-query log
+    DB_SLOW_QUERY_EXPLAIN: bool = False  # log the plan of slow SELECTs (runs one extra EXPLAIN)
+    DB_SLOW_QUERY_REPORT_SIZE: int = 500  # distinct statements kept for /api/admin/db/slow-queries
     MONGO_URI: str
+    MONGO_DB_NAME: str = "HBH"
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_CONNECT_TIMEOUT_MS: int = 5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_SOCKET_TIMEOUT_MS: int = 10000
+    MONGO_WARM_CONNECTIONS: int = 5  # opened at startup so the first requests don't pay for the handshake
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 5 * 60
     EMAIL_VERIFICATION_TOKEN_EXPIRE_MINUTES: int = 7 * 24 * 60
@@ -10,14 +34,65 @@ class Settings(BaseSettings):
     SMTP_PORT: int
     SMTP_USER: str
     SMTP_PASSWORD: str
+    SMTP_START_TLS: bool = True  # off only for local stand-ins such as mailpit
     EMAILS_FROM_EMAIL: str
     EMAILS_FROM_NAME: str
     PASSWORD_RESET_TOKEN_EXPIRE_MINUTES: int = 60  # 1 hour
     PROD: bool
+    SOCKETIO_MESSAGE_QUEUE: Optional[str] = None  # e.g. redis://redis:6379/0 when running several workers
+    SOCKETIO_CHANNEL: str = "handbyhand-socketio"
+    SOCKETIO_STICKY_SESSIONS: bool = False
+    SOCKET_RATE_LIMIT_PER_SECOND: float = 20.0
+    SOCKET_RATE_LIMIT_BURST: int = 40
+    SOCKET_COALESCE_WINDOW_MS: int = 250
+    SOCKET_COALESCE_MAX_PENDING: int = 100
+    # socket ที่ไม่ได้ต่อ heartbeat ภายใน TTL (เช่น worker ตาย) ไม่นับว่าออนไลน์
+    PRESENCE_HEARTBEAT_SECONDS: int = 30
+    PRESENCE_TTL_SECONDS: int = 90
+    PENDING_EVENTS_TTL_SECONDS: int = 7 * 24 * 60 * 60  # 1 week
+    PENDING_EVENTS_MAX_PER_USER: int = 100
+    MESSAGE_WRITER_BATCH_SIZE: int = 500
+    MESSAGE_WRITER_FLUSH_INTERVAL_MS: int = 50
+    MESSAGE_WRITER_MAX_RETRIES: int = 5
+    MESSAGE_WRITER_RETRY_BACKOFF_MS: int = 100
+    STORAGE_BACKEND: str = "local"  # "local" (images/ directory) or "s3"
+    S3_BUCKET: Optional[str] = None
+    S3_ENDPOINT_URL: Optional[str] = None  # for MinIO or other S3-compatible services
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None  # falls back to the usual AWS credential chain
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_MAX_POOL_CONNECTIONS: int = 50
+    S3_MULTIPART_CHUNK_SIZE: int = 8 * 1024 * 1024  # bytes per part, at least 5 MiB
+    S3_PRESIGNED_URL_EXPIRES: int = 60 * 60  # seconds
+    S3_PUBLIC_BASE_URL: Optional[str] = None  # e.g. a CDN in front of a public bucket; skips presigning
+    STORAGE_DELETE_BATCH_SIZE: int = 100
+    STORAGE_DELETE_POLL_SECONDS: float = 30  # also woken right after a commit that scheduled deletions
+    STORAGE_DELETE_MAX_ATTEMPTS: int = 8
+    STORAGE_DELETE_RETRY_BACKOFF_SECONDS: float = 5  # doubled after each failed attempt
+    IMAGE_GC_INTERVAL_SECONDS: int = 0  # run the orphaned-image reconciler this often; 0 = off (enable on one instance)
+    IMAGE_GC_GRACE_SECONDS: int = 24 * 60 * 60  # never delete objects younger than this
+    IMAGE_GC_BATCH_SIZE: int = 1000
+    IMAGE_CACHE_MAX_AGE: int = 365 * 24 * 60 * 60  # seconds, for uuid-named uploads
+    IMAGE_SENDFILE_HEADER: Optional[str] = None  # "X-Accel-Redirect" (nginx) or "X-Sendfile" to let the proxy send files
+    IMAGE_ACCEL_PREFIX: str = "/protected-images/"  # nginx internal location that maps to the images directory
+    SERVE_HOST: str = "0.0.0.0"
+    SERVE_PORT: int = 9090
+    SERVE_WORKERS: int = 0  # 0 = one per CPU core; more than one needs SOCKETIO_MESSAGE_QUEUE
+    SERVE_LOOP: str = "uvloop"
+    SERVE_HTTP: str = "httptools"
+    SERVE_BACKLOG: int = 2048
+    SERVE_KEEPALIVE_SECONDS: int = 5
+    SERVE_GRACEFUL_TIMEOUT_SECONDS: int = 30  # in-flight requests get this long on shutdown
+    SERVE_FORWARDED_ALLOW_IPS: str = "127.0.0.1"  # proxies trusted for X-Forwarded-For/Proto
+    SERVE_ACCESS_LOG: bool = True
+    CATEGORY_CACHE_TTL_SECONDS: int = 60  # other workers see category changes within this long
+    ADMIN_TOKEN: Optional[str] = None  # enables /api/admin when set
     BASE_URL: str
     model_config = SettingsConfigDict(
         env_file=".env", validate_assignment=True, extra="allow"
     )
 
+@lru_cache
 def get_settings():
+    # อ่าน .env และ environment ครั้งเดียว ทุกโมดูลได้ object เดียวกัน
     return Settings()
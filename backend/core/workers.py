@@ -0,0 +1,12 @@
+"""Which pre-fork worker this process is, without importing the server.
+
+``backend.serve`` sets ``WORKER_ID_ENV`` in each worker it forks; the app
+reads it here so importing ``backend.main`` doesn't pull in uvicorn.
+"""
+import os
+
+WORKER_ID_ENV = "SERVE_WORKER_ID"
+
+def primary_worker() -> bool:
+    """True in worker 0 (or a single-process server); runs the once-per-host jobs."""
+    return os.environ.get(WORKER_ID_ENV, "0") == "0"
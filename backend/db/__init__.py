@@ -1,8 +1,12 @@
-from typing import AsyncIterator
+import asyncio
+from typing import AsyncIterator, Optional
+from fastapi import Request
 from sqlmodel import SQLModel
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.engine import make_url
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
 
 from backend.models.items import *
 from backend.models.user import *
@@ -10,20 +14,100 @@ from backend.models.exchanges import *
 from backend.models.category import * 
 from backend.models.customer_interest import * 
 from backend.models.rating import * 
-connect_args = {}
-
+from backend.models.storage_deletion import *
+from .replicas import MUTATING_METHODS, PRIMARY_COOKIE, ReadYourWrites, ReplicaPool, replica_urls
+from .slow_queries import init_slow_query_log
 engine = None
+async_session_maker = None
+replicas: Optional[ReplicaPool] = None
+read_your_writes: Optional[ReadYourWrites] = None
 
 
-def init_db(settings):
-    global engine
-
-    engine = create_async_engine(
-        settings.DATABASE_URL,
-        echo=True,
+def engine_options(settings, url: Optional[str] = None) -> dict:
+    """Engine keyword arguments built from ``Settings`` (for the primary unless ``url`` is given)."""
+    options = dict(
+        echo=settings.DB_ECHO,
         future=True,
-        connect_args=connect_args,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
     )
+    if make_url(url or settings.DATABASE_URL).get_driver_name() == "asyncpg":
+        server_settings = {}
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        # ใช้ PgBouncer แบบ transaction pooling ให้ตั้ง DB_STATEMENT_CACHE_SIZE=0
+        options["connect_args"] = {
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": server_settings,
+        }
+    return options
+
+
+def init_db(settings):
+    global engine, async_session_maker, replicas, read_your_writes
+
+    engine = create_async_engine(settings.DATABASE_URL, **engine_options(settings))
+    # สร้าง session factory ครั้งเดียว ไม่ต้องสร้างใหม่ทุก request
+    async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    urls = replica_urls(settings)
+    if urls:
+        replicas = ReplicaPool(urls, engine_options(settings, urls[0]), settings.DB_REPLICA_HEALTH_CHECK_INTERVAL)
+        read_your_writes = ReadYourWrites(settings.DB_READ_YOUR_WRITES_SECONDS)
+    else:
+        replicas = None
+        read_your_writes = None
+    init_slow_query_log(settings, [engine, *(replicas.engines if replicas is not None else [])])
+
+
+async def open_connections(target_engine, connections: int):
+    """Check out ``connections`` connections at once so the pool keeps them open."""
+    async def touch():
+        async with target_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    await asyncio.gather(*(touch() for _ in range(connections)))
+
+
+async def warm_pool(connections: int):
+    if engine is None:
+        raise Exception("DatabaseSessionManager is not initialized")
+    await open_connections(engine, connections)
+    if replicas is not None:
+        # replica ที่ล่มอยู่ไม่ควรทำให้ worker เริ่มไม่ได้ health check จะพักมันไว้เอง
+        await asyncio.gather(*(open_connections(e, connections) for e in replicas.engines), return_exceptions=True)
+
+
+def start_replicas():
+    if replicas is not None:
+        replicas.start()
+
+
+async def read_your_writes_middleware(request: Request, call_next):
+    """Pin a client's reads to the primary for a short while after it writes."""
+    response = await call_next(request)
+    if read_your_writes is not None and request.method in MUTATING_METHODS and response.status_code < 400:
+        until = read_your_writes.record_write(request)
+        response.set_cookie(PRIMARY_COOKIE, f"{until:.3f}", max_age=int(read_your_writes.window) + 1, httponly=True)
+    return response
+
+
+def pool_stats() -> dict:
+    if engine is None:
+        raise Exception("DatabaseSessionManager is not initialized")
+    pool = engine.pool
+    stats = {
+        "status": pool.status(),
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    if replicas is not None:
+        stats["replicas"] = replicas.stats()
+    return stats
 
 
 async def recreate_table():
@@ -35,13 +119,37 @@ async def recreate_table():
         print(f"Database error occurred: {e}")
 
 async def get_session() -> AsyncIterator[AsyncSession]:
-    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    async with async_session() as session:
+    async with async_session_maker() as session:
         yield session
 
 
+async def get_read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """Session for read-only endpoints: a healthy replica, else the primary.
+
+    Clients that wrote within ``DB_READ_YOUR_WRITES_SECONDS`` keep reading
+    from the primary so they always see their own changes.
+    """
+    index = None
+    if replicas is not None and not read_your_writes.pinned_to_primary(request):
+        index = replicas.pick()
+    if index is None:
+        async with async_session_maker() as session:
+            yield session
+        return
+
+    async with replicas.session_makers[index]() as session:
+        try:
+            yield session
+        except DBAPIError as e:
+            if e.connection_invalidated or isinstance(e.orig, (OSError, ConnectionError)):
+                replicas.mark_unhealthy(index)
+            raise
+
+
 async def close_session():
     global engine
     if engine is None:
         raise Exception("DatabaseSessionManager is not initialized")
     await engine.dispose()
+    if replicas is not None:
+        await replicas.close()
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from bson import ObjectId
+
+from . import mongodb
+from ..utils.chat_messages import message_preview
+from ..utils.pending_events import record_chat_messages
+
+if TYPE_CHECKING:
+    from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+APPLIED_BATCHES_KEPT = 50  # recent batch ids per chat, enough to cover a retry window
+
+class MessageWriter:
+    """Write-behind queue for chat messages.
+
+    Messages are delivered to sockets first and persisted here in batches:
+    one ``insert_many`` for the messages and one ``bulk_write`` with a single
+    update per chat for the inbox counters. Each batch gets an id that the
+    chat update records, so retrying a partly applied ``bulk_write`` does not
+    count a message twice. A batch that still fails after the retries goes
+    back to the front of the queue for the next flush. ``stop`` drains
+    whatever is still queued, so a clean shutdown does not lose messages
+    unless MongoDB stays unreachable.
+    """
+
+    def __init__(self, settings):
+        self.batch_size = settings.MESSAGE_WRITER_BATCH_SIZE
+        self.flush_interval = settings.MESSAGE_WRITER_FLUSH_INTERVAL_MS / 1000
+        self.max_retries = settings.MESSAGE_WRITER_MAX_RETRIES
+        self.retry_backoff = settings.MESSAGE_WRITER_RETRY_BACKOFF_MS / 1000
+        self._buffer: List[Dict[str, Any]] = []
+        self._failed: List[Tuple[ObjectId, List[Dict[str, Any]]]] = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # ไม่ cancel ระหว่าง flush เพื่อไม่ให้ batch ที่กำลังเขียนหายไป
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self.pending:
+            logger.error("MongoDB unavailable at shutdown, %d chat messages were not saved", self.pending)
+
+    def submit(self, message_data: Dict[str, Any]):
+        self._buffer.append(message_data)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer) + sum(len(batch) for _, batch in self._failed)
+
+    def buffered_count(self, chat_id, exclude_sender=None) -> int:
+        """Messages for ``chat_id`` not yet counted in the chat document."""
+        return sum(
+            1
+            for message_data in self._buffer + [message for _, batch in self._failed for message in batch]
+            if message_data["chat_id"] == chat_id and message_data["sender"] != exclude_sender
+        )
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        while self._failed or self._buffer:
+            if self._failed:
+                batch_id, batch = self._failed.pop(0)
+            else:
+                batch_id, batch = ObjectId(), self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+            try:
+                await self._retry(self._insert_messages, batch)
+                await self._retry(self._update_chats, batch_id, batch)
+            except Exception:
+                # เก็บ batch เดิม (id เดิม) ไว้ลองใหม่รอบหน้า ไม่ทิ้งข้อความ
+                logger.exception("Writing %d chat messages failed after %d attempts, will retry", len(batch), self.max_retries)
+                self._failed.insert(0, (batch_id, batch))
+                return
+            try:
+                await record_chat_messages(batch)
+            except Exception:
+                # ข้อความถูกบันทึกแล้ว คิวออฟไลน์เป็นแค่ตัวช่วย ไม่ต้อง retry
+                logger.exception("Failed to queue offline notifications for %d chat messages", len(batch))
+
+    async def _retry(self, write, *args):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                return await write(*args)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+
+    async def _insert_messages(self, batch):
+        from pymongo.errors import BulkWriteError
+
+        try:
+            await mongodb.get_db().get_collection("messages").insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # _id มาจากเซิร์ฟเวอร์ ข้อความที่ถูกบันทึกไปแล้วในรอบก่อนจึงซ้ำได้อย่างปลอดภัย
+            if any(error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+
+    async def _update_chats(self, batch_id, batch):
+        await mongodb.get_db().get_collection("chats").bulk_write(chat_updates(batch, batch_id), ordered=False)
+
+def chat_updates(batch: List[Dict[str, Any]], batch_id) -> List["UpdateOne"]:
+    """Fold a batch into one counter update per chat.
+
+    Unread counts are message_count minus each participant's read marker;
+    senders have read their own messages. A chat that already recorded
+    ``batch_id`` does not match, so re-sending the batch is a no-op for it.
+    """
+    from pymongo import UpdateOne
+
+    latest: Dict[Any, Dict[str, Any]] = {}
+    counts: Dict[Any, int] = defaultdict(int)
+    sent: Dict[Any, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    for message_data in batch:
+        chat_id = message_data["chat_id"]
+        if chat_id not in latest or message_data["timestamp"] >= latest[chat_id]["timestamp"]:
+            latest[chat_id] = message_data
+        counts[chat_id] += 1
+        sent[chat_id][message_data["sender"]] += 1
+
+    operations = []
+    for chat_id, message_data in latest.items():
+        increments = {"message_count": counts[chat_id]}
+        for sender_id, count in sent[chat_id].items():
+            increments[f"read_counts.{sender_id}"] = count
+        operations.append(UpdateOne({"_id": chat_id, "applied_batches": {"$ne": batch_id}}, {
+            "$set": {"last_message": message_preview(message_data)},
+            "$max": {"last_message_at": message_data["timestamp"]},
+            "$inc": increments,
+            "$push": {"applied_batches": {"$each": [batch_id], "$slice": -APPLIED_BATCHES_KEPT}},
+        }))
+    return operations
+
+# Global MessageWriter instance
+message_writer = None
+
+def init_message_writer(settings):
+    global message_writer
+    message_writer = MessageWriter(settings)
+
+def start_message_writer():
+    if message_writer is None:
+        raise Exception("MessageWriter is not initialized")
+    message_writer.start()
+
+async def stop_message_writer():
+    if message_writer is not None:
+        await message_writer.stop()
+
+def get_message_writer():
+    if message_writer is None:
+        raise Exception("MessageWriter is not initialized")
+    return message_writer
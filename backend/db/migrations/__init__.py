@@ -0,0 +1,60 @@
+"""Versioned schema migrations.
+
+Each migration module has a ``VERSION``, a ``DESCRIPTION``, a
+``TRANSACTIONAL`` flag and an ``async def upgrade(conn)``. Applied versions
+are recorded in ``schema_migrations``. Non-transactional migrations run
+on an autocommit connection so Postgres can build indexes with
+``CREATE INDEX CONCURRENTLY`` without locking writes.
+"""
+import logging
+from datetime import datetime
+from typing import List
+from sqlalchemy import text
+
+from . import v0001_baseline, v0002_hot_path_indexes, v0003_storage_deletions
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = [v0001_baseline, v0002_hot_path_indexes, v0003_storage_deletions]
+
+async def ensure_migrations_table(engine):
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version VARCHAR(32) PRIMARY KEY, "
+            "description VARCHAR(255) NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL)"
+        ))
+
+async def applied_versions(engine) -> List[str]:
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))
+        return [row[0] for row in result]
+
+async def record_version(conn, migration):
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:version, :description, :applied_at)"),
+        {"version": migration.VERSION, "description": migration.DESCRIPTION, "applied_at": datetime.utcnow()},
+    )
+
+async def upgrade(engine) -> List[str]:
+    """Apply pending migrations in order and return the versions applied."""
+    await ensure_migrations_table(engine)
+    done = set(await applied_versions(engine))
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.VERSION in done:
+            continue
+        logger.info("Applying migration %s: %s", migration.VERSION, migration.DESCRIPTION)
+        if migration.TRANSACTIONAL:
+            async with engine.begin() as conn:
+                await migration.upgrade(conn)
+                await record_version(conn, migration)
+        else:
+            # แต่ละคำสั่งต้อง idempotent เพราะถ้าล้มกลางทางจะถูกรันซ้ำทั้งไฟล์
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await migration.upgrade(conn)
+                await record_version(conn, migration)
+        applied.append(migration.VERSION)
+    return applied
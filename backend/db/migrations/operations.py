@@ -0,0 +1,20 @@
+from typing import List
+from sqlalchemy import text
+
+async def create_index_online(conn, name: str, table: str, columns: List[str]):
+    """Create an index without blocking writes on Postgres, plainly elsewhere.
+
+    A failed ``CONCURRENTLY`` build leaves an invalid index behind, which is
+    dropped first so a re-run rebuilds it.
+    """
+    column_list = ", ".join(columns)
+    if conn.dialect.name == "postgresql":
+        invalid = await conn.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": name})
+        if invalid.first() is not None:
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        await conn.execute(text(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON "{table}" ({column_list})'))
+    else:
+        await conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({column_list})'))
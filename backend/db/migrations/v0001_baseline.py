@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel
+
+VERSION = "0001"
+DESCRIPTION = "Baseline schema"
+TRANSACTIONAL = True
+
+async def upgrade(conn):
+    # ฐานข้อมูลที่สร้างด้วย initial-db.py มีตารางอยู่แล้ว จึงสร้างเฉพาะที่ยังขาด
+    await conn.run_sync(SQLModel.metadata.create_all, checkfirst=True)
@@ -0,0 +1,23 @@
+from .operations import create_index_online
+
+VERSION = "0002"
+DESCRIPTION = "Indexes for item feed, exchange listings and ratings"
+TRANSACTIONAL = False
+
+INDEXES = [
+    ("ix_item_owner_id", "item", ["owner_id"]),
+    ("ix_item_category_id", "item", ["category_id"]),
+    ("ix_item_created_at", "item", ["created_at"]),
+    ("ix_item_is_exchanged", "item", ["is_exchanged"]),
+    ("ix_exchange_requester_id", "exchange", ["requester_id"]),
+    ("ix_exchange_requested_item_id", "exchange", ["requested_item_id"]),
+    ("ix_exchange_offered_item_id", "exchange", ["offered_item_id"]),
+    ("ix_exchange_status", "exchange", ["status"]),
+    ("ix_exchange_updated_at", "exchange", ["updated_at"]),
+    ("ix_rating_user_id", "rating", ["user_id"]),
+    ("ix_customerinterest_user_id", "customerinterest", ["user_id"]),
+]
+
+async def upgrade(conn):
+    for name, table, columns in INDEXES:
+        await create_index_online(conn, name, table, columns)
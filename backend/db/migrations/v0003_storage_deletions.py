@@ -0,0 +1,8 @@
+from backend.models.storage_deletion import StorageDeletion
+
+VERSION = "0003"
+DESCRIPTION = "Tombstones for deferred storage deletions"
+TRANSACTIONAL = True
+
+async def upgrade(conn):
+    await conn.run_sync(StorageDeletion.__table__.create, checkfirst=True)
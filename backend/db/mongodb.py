@@ -1,17 +1,87 @@
-from pymongo import MongoClient
+import asyncio
+
+from ..utils.query_stats import MongoCommandCounter
+
+# ค่าเดียวกับ pymongo.ASCENDING/DESCENDING; pymongo และ motor ถูก import ตอนเชื่อมต่อ
+# ไม่ใช่ตอน import แอป (โหลดรวมกันเกือบ 100 ms)
+ASCENDING = 1
+DESCENDING = -1
+
+def command_listener():
+    from pymongo import monitoring
+
+    # pymongo รับเฉพาะ subclass ของ CommandListener
+    class Listener(MongoCommandCounter, monitoring.CommandListener):
+        pass
+    return Listener()
 
 class MongoDB:
-    def __init__(self):
+    def __init__(self, settings):
+        self.settings = settings
         self.client = None
         self.db = None
 
-    def connect(self, mongo_uri: str):
-        self.client = MongoClient(mongo_uri)
-        self.db = self.client["HBH"]
+    def connect(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        # Motor ผูก client กับ event loop ที่กำลังรันอยู่ จึงต้องสร้างใน lifespan
+        self.client = AsyncIOMotorClient(
+            self.settings.MONGO_URI,
+            maxPoolSize=self.settings.MONGO_MAX_POOL_SIZE,
+            minPoolSize=self.settings.MONGO_MIN_POOL_SIZE,
+            connectTimeoutMS=self.settings.MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=self.settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            socketTimeoutMS=self.settings.MONGO_SOCKET_TIMEOUT_MS,
+            event_listeners=[command_listener()],
+        )
+        self.db = self.client[self.settings.MONGO_DB_NAME]
+
+    async def ping(self):
+        await self.client.admin.command("ping")
+
+    async def warm_pool(self, connections: int):
+        # ping พร้อมกันหลายตัว driver ต้องเปิด connection ใหม่ให้แต่ละตัว แล้วเก็บไว้ใน pool
+        await asyncio.gather(*(self.ping() for _ in range(connections)))
+
+    async def create_indexes(self):
+        # ประวัติแชทอ่านทีละหน้าตาม chat_id เรียงจากข้อความล่าสุด
+        # cursor เป็น (timestamp, _id) เพราะข้อความใน batch เดียวกันอาจมี timestamp ซ้ำ
+        await self.db["messages"].create_index(
+            [("chat_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+            name="chat_id_timestamp_id",
+        )
+        # index เดิมที่ไม่มี _id ถูกแทนด้วยตัวบนแล้ว
+        if "chat_id_timestamp" in await self.db["messages"].index_information():
+            await self.db["messages"].drop_index("chat_id_timestamp")
+        # กล่องข้อความ: แชทของผู้ใช้ เรียงตามข้อความล่าสุด (ใช้ตรวจสมาชิกแชทด้วย)
+        await self.db["chats"].create_index(
+            [("participants", ASCENDING), ("last_message_at", DESCENDING)],
+            name="participants_last_message_at",
+        )
+        # หนึ่งคู่ผู้ใช้มีได้แชทเดียว แชทเก่าที่ยังไม่ migrate จะไม่มี pair_key
+        await self.db["chats"].create_index(
+            [("pair_key", ASCENDING)],
+            name="pair_key_unique",
+            unique=True,
+            partialFilterExpression={"pair_key": {"$exists": True}},
+        )
+        # คิวเหตุการณ์ของผู้ใช้ที่ออฟไลน์: หนึ่งรายการต่อแชท/การแลกเปลี่ยน และหมดอายุเอง
+        await self.db["pending_events"].create_index(
+            [("user_id", ASCENDING), ("kind", ASCENDING), ("key", ASCENDING)],
+            name="user_kind_key_unique",
+            unique=True,
+        )
+        await self.db["pending_events"].create_index(
+            [("updated_at", ASCENDING)],
+            name="updated_at_ttl",
+            expireAfterSeconds=self.settings.PENDING_EVENTS_TTL_SECONDS,
+        )
 
     def disconnect(self):
         if self.client:
             self.client.close()
+            self.client = None
+            self.db = None
 
     def get_collection(self, collection_name: str):
         if self.db is None:
@@ -23,9 +93,18 @@ mongodb = None
 
 def init_mongoDB(settings):
     global mongodb
-    mongodb = MongoDB()
-    mongo_uri = settings.MONGO_URI
-    mongodb.connect(mongo_uri)
+    mongodb = MongoDB(settings)
+
+async def connect_mongoDB():
+    if mongodb is None:
+        raise Exception("MongoDB is not initialized")
+    mongodb.connect()
+    await mongodb.ping()
+    await mongodb.create_indexes()
+
+def close_mongoDB():
+    if mongodb is not None:
+        mongodb.disconnect()
 
 def get_db():
     if mongodb is None:
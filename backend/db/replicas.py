@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+import logging
+import time
+from itertools import count
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_COOKIE = "hbh_primary_until"
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_TRACKED_WRITERS = 10000
+
+def replica_urls(settings) -> List[str]:
+    return [url.strip() for url in (settings.DATABASE_REPLICA_URLS or "").split(",") if url.strip()]
+
+class ReplicaPool:
+    """Round-robin over read replicas, skipping the ones failing health checks.
+
+    A background task runs ``SELECT 1`` on every replica each
+    ``DB_REPLICA_HEALTH_CHECK_INTERVAL`` seconds; a replica that errors during
+    a request is also taken out until its next successful check.
+    """
+
+    def __init__(self, urls: List[str], engine_options: dict, health_check_interval: float):
+        self.urls = urls
+        self.engines = [create_async_engine(url, **engine_options) for url in urls]
+        self.session_makers = [
+            sessionmaker(engine, class_=AsyncSession, expire_on_commit=False) for engine in self.engines
+        ]
+        self.healthy = [True] * len(urls)
+        self.health_check_interval = health_check_interval
+        self._counter = count()
+        self._task = None
+
+    def pick(self) -> Optional[int]:
+        healthy = [index for index, ok in enumerate(self.healthy) if ok]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def mark_unhealthy(self, index: int):
+        if self.healthy[index]:
+            logger.warning("Read replica %d marked unhealthy", index)
+        self.healthy[index] = False
+
+    async def check_health(self):
+        for index, engine in enumerate(self.engines):
+            try:
+                async with engine.connect() as conn:
+                    await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout=self.health_check_interval)
+            except Exception:
+                self.mark_unhealthy(index)
+            else:
+                if not self.healthy[index]:
+                    logger.info("Read replica %d is healthy again", index)
+                self.healthy[index] = True
+
+    async def _run(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_check_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for engine in self.engines:
+            await engine.dispose()
+
+    def stats(self) -> List[dict]:
+        return [
+            {"healthy": ok, "checked_out": engine.pool.checkedout(), "size": engine.pool.size()}
+            for ok, engine in zip(self.healthy, self.engines)
+        ]
+
+class ReadYourWrites:
+    """Remembers which clients wrote recently so their reads stay on the primary.
+
+    A client is keyed by its bearer token (hashed) and also gets a cookie, so
+    stickiness holds on whichever worker serves the next request as long as
+    either survives.
+    """
+
+    def __init__(self, window_seconds: float, clock=time.time):
+        self.window = window_seconds
+        self.clock = clock
+        self._writers: Dict[str, float] = {}
+
+    @staticmethod
+    def client_key(request) -> Optional[str]:
+        authorization = request.headers.get("authorization")
+        if not authorization:
+            return None
+        return hashlib.sha256(authorization.encode()).hexdigest()
+
+    def record_write(self, request) -> float:
+        until = self.clock() + self.window
+        key = self.client_key(request)
+        if key is not None:
+            if len(self._writers) >= MAX_TRACKED_WRITERS:
+                now = self.clock()
+                self._writers = {k: v for k, v in self._writers.items() if v > now}
+            self._writers[key] = until
+        return until
+
+    def pinned_to_primary(self, request) -> bool:
+        if request.method in MUTATING_METHODS:
+            return True
+        now = self.clock()
+        try:
+            if float(request.cookies.get(PRIMARY_COOKIE, 0)) > now:
+                return True
+        except ValueError:
+            pass
+        key = self.client_key(request)
+        return key is not None and self._writers.get(key, 0) > now
@@ -0,0 +1,209 @@
+import json
+import logging
+import queue
+import re
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event
+
+from ..utils.query_stats import current_stats
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+# รายการพารามิเตอร์ที่ยาวกว่านี้ (เช่น IN (...)) จะสรุปเป็นจำนวนกับชนิดแทน
+MAX_SHAPE_ITEMS = 10
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN "}
+EXPLAIN_SAVEPOINT = "slow_query_explain"
+
+def normalize_sql(statement: str) -> str:
+    """Strip literals and placeholders so the same query groups together.
+
+    ``WHERE id IN ($1, $2, $3)`` and ``WHERE id IN (?, ?)`` both become
+    ``WHERE id IN (?)``.
+    """
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    statement = _PLACEHOLDER_LIST.sub("(?)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+def _value_shape(values) -> Any:
+    if values is None:
+        return None
+    if isinstance(values, dict):
+        return {key: type(value).__name__ for key, value in values.items()}
+    types = [type(value).__name__ for value in values]
+    if len(types) > MAX_SHAPE_ITEMS:
+        return {"count": len(types), "types": sorted(set(types))}
+    return types
+
+def parameter_shape(parameters, executemany: bool = False) -> Any:
+    """Parameter names/types without the values, which may hold personal data."""
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "row": _value_shape(rows[0]) if rows else None}
+    return _value_shape(parameters)
+
+class SlowQueryReport:
+    """Slow statements aggregated by normalized SQL, for the admin endpoint."""
+
+    def __init__(self, max_statements: int):
+        self.max_statements = max_statements
+        self.statements: Dict[str, Dict[str, Any]] = {}
+        self.dropped = 0
+
+    def record(self, entry: Dict[str, Any]):
+        stats = self.statements.get(entry["statement"])
+        if stats is None:
+            if len(self.statements) >= self.max_statements:
+                self.dropped += 1
+                return
+            stats = self.statements[entry["statement"]] = {
+                "statement": entry["statement"],
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "routes": [],
+                "parameters": None,
+                "plan": None,
+            }
+        stats["count"] += 1
+        stats["total_ms"] += entry["duration_ms"]
+        stats["max_ms"] = max(stats["max_ms"], entry["duration_ms"])
+        if entry["route"] and entry["route"] not in stats["routes"]:
+            stats["routes"].append(entry["route"])
+        stats["parameters"] = entry["parameters"]
+        if entry.get("plan"):
+            stats["plan"] = entry["plan"]
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        ranked = sorted(self.statements.values(), key=lambda stats: stats["total_ms"], reverse=True)
+        return [
+            dict(stats, total_ms=round(stats["total_ms"], 1), max_ms=round(stats["max_ms"], 1),
+                 avg_ms=round(stats["total_ms"] / stats["count"], 1))
+            for stats in ranked[:limit]
+        ]
+
+class SlowQueryLog:
+    """Times every statement on the attached engines and reports the slow ones.
+
+    Entries go through a ``QueueHandler`` so the event loop never waits on
+    log I/O; a ``QueueListener`` thread writes them out.
+    """
+
+    def __init__(self, threshold_ms: float, explain: bool, report_size: int):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.report = SlowQueryReport(report_size)
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.listener: Optional[QueueListener] = None
+
+    def attach(self, engine):
+        sync_engine = getattr(engine, "sync_engine", engine)
+        event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(sync_engine, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["slow_query_start"] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info.pop("slow_query_start")) * 1000
+        if duration_ms >= self.threshold_ms:
+            entry = self._entry(statement, parameters, executemany, duration_ms)
+            if self.explain and not executemany:
+                entry["plan"] = self._explain(conn, statement, parameters)
+            self._record(entry)
+
+    def _handle_error(self, exception_context):
+        # statement ที่ถูก statement_timeout ตัดจะมาทางนี้ ไม่ผ่าน after_cursor_execute
+        conn = exception_context.connection
+        started = conn.info.pop("slow_query_start", None) if conn is not None else None
+        if started is None:
+            return
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms >= self.threshold_ms:
+            context = exception_context.execution_context
+            entry = self._entry(exception_context.statement, exception_context.parameters,
+                                bool(context and context.executemany), duration_ms)
+            entry["error"] = type(exception_context.original_exception).__name__
+            self._record(entry)
+
+    @staticmethod
+    def _entry(statement, parameters, executemany: bool, duration_ms: float) -> Dict[str, Any]:
+        stats = current_stats.get()
+        return {
+            "statement": normalize_sql(statement or ""),
+            "parameters": parameter_shape(parameters, executemany),
+            "duration_ms": round(duration_ms, 1),
+            "route": stats.route if stats else None,
+        }
+
+    def _record(self, entry: Dict[str, Any]):
+        self.report.record(entry)
+        logger.warning(json.dumps(entry, default=str))
+
+    @staticmethod
+    def _explain(conn, statement: str, parameters) -> Optional[List[str]]:
+        # EXPLAIN เฉพาะ SELECT เพราะไม่มีผลข้างเคียง; ยิงผ่าน cursor ของ DBAPI ตรงๆ จะได้ไม่วนกลับมาที่ event นี้
+        if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return None
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name, "EXPLAIN ")
+        cursor = conn.connection.cursor()
+        try:
+            # ครอบด้วย savepoint: บน Postgres EXPLAIN ที่ล้มจะทำให้ transaction ของ request ใช้ต่อไม่ได้
+            cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = [str(row[-1]) for row in cursor.fetchall()]
+            except Exception as e:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+                plan = [f"EXPLAIN failed: {e}"]
+            cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            return plan
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+        finally:
+            cursor.close()
+
+    def start(self):
+        if self.listener is None:
+            self.listener = QueueListener(self.queue, *(logging.getLogger().handlers or [logging.StreamHandler()]))
+            self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+slow_query_log: Optional[SlowQueryLog] = None
+
+def init_slow_query_log(settings, engines) -> Optional[SlowQueryLog]:
+    global slow_query_log
+    if slow_query_log is not None:
+        # handler ของรอบก่อนยังผูกกับ logger อยู่
+        logger.handlers.clear()
+    if not settings.DB_SLOW_QUERY_MS:
+        slow_query_log = None
+        return None
+    slow_query_log = SlowQueryLog(settings.DB_SLOW_QUERY_MS, settings.DB_SLOW_QUERY_EXPLAIN, settings.DB_SLOW_QUERY_REPORT_SIZE)
+    for engine in engines:
+        slow_query_log.attach(engine)
+    logger.addHandler(QueueHandler(slow_query_log.queue))
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False
+    return slow_query_log
+
+def start_slow_query_log():
+    if slow_query_log is not None:
+        slow_query_log.start()
+
+def stop_slow_query_log():
+    if slow_query_log is not None:
+        slow_query_log.stop()
@@ -0,0 +1,211 @@
+import mimetypes
+import os
+import re
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# ไฟล์ที่อัปโหลดตั้งชื่อเป็น uuid และไม่ถูกเขียนทับ จึง cache ได้ตลอดไป
+_IMMUTABLE_NAME = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+# รูปแบบอื่นที่เก็บไว้ข้างไฟล์ต้นฉบับ (photo.jpg -> photo.avif / photo.webp) เรียงตามที่อยากส่งก่อน
+VARIANTS = [("image/avif", ".avif"), ("image/webp", ".webp")]
+# ไฟล์บีบอัดไว้ล่วงหน้า (เช่น icon.svg.br)
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+CHUNK_SIZE = 64 * 1024
+
+def _accepts(header: Optional[str], token: str) -> bool:
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() != token:
+            continue
+        quality = params.strip()
+        try:
+            return not (quality.startswith("q=") and float(quality[2:]) == 0)
+        except ValueError:
+            return False
+    return False
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """The inclusive byte range asked for by a single-range ``Range`` header.
+
+    Returns ``None`` when the header should be ignored (not bytes, several
+    ranges, malformed) and raises 416 when it cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            length = int(last)
+            if length == 0:
+                raise HTTPException(status_code=416, headers={"content-range": f"bytes */{size}"})
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(status_code=416, headers={"content-range": f"bytes */{size}"})
+    if end < start:
+        return None
+    end = min(end, size - 1)
+    return start, end
+
+class FileRangeResponse(Response):
+    """Stream ``end - start + 1`` bytes of a file from ``start``."""
+
+    def __init__(self, path: str, start: int, end: int, status_code: int, headers: dict):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+class ImageFiles(StaticFiles):
+    """Serves uploaded images with long-lived caching.
+
+    On top of ``StaticFiles`` this adds immutable ``Cache-Control`` for
+    uuid-named files, strong ETags, single-range requests and
+    ``Accept``/``Accept-Encoding`` negotiation to ``.avif``/``.webp`` and
+    ``.br``/``.gz`` files stored next to the original. With
+    ``sendfile_header`` set, the body is left to the front proxy through
+    ``X-Accel-Redirect`` (nginx) or ``X-Sendfile``.
+    """
+
+    def __init__(self, directory: str, cache_max_age: int, sendfile_header: Optional[str] = None, accel_prefix: str = "/protected-images/"):
+        super().__init__(directory=directory)
+        self.cache_max_age = cache_max_age
+        self.sendfile_header = sendfile_header
+        self.accel_prefix = accel_prefix.rstrip("/") + "/"
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        request_headers = Headers(scope=scope)
+        try:
+            found = await anyio.to_thread.run_sync(self.lookup_image, path, request_headers)
+        except PermissionError:
+            raise HTTPException(status_code=401)
+        if found is None:
+            raise HTTPException(status_code=404)
+        served_path, full_path, stat_result, encoding = found
+        return self.image_response(path, served_path, full_path, stat_result, encoding, request_headers)
+
+    def lookup_image(self, path: str, request_headers: Headers):
+        """Pick the best stored file for the request, else ``None``."""
+        candidates: List[str] = []
+        stem, extension = os.path.splitext(path)
+        for media_type, variant_extension in VARIANTS:
+            if extension.lower() != variant_extension and _accepts(request_headers.get("accept"), media_type):
+                candidates.append(stem + variant_extension)
+        candidates.append(path)
+
+        for candidate in candidates:
+            full_path, stat_result = self.lookup_path(candidate)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            for encoding, encoded_extension in ENCODINGS:
+                if _accepts(request_headers.get("accept-encoding"), encoding):
+                    encoded_path, encoded_stat = self.lookup_path(candidate + encoded_extension)
+                    if encoded_stat is not None and stat.S_ISREG(encoded_stat.st_mode):
+                        return candidate + encoded_extension, encoded_path, encoded_stat, encoding
+            return candidate, full_path, stat_result, None
+        return None
+
+    def cache_headers(self, path: str, served_path: str, stat_result: os.stat_result, encoding: Optional[str]) -> dict:
+        media_type = mimetypes.guess_type(served_path[: -len(dict(ENCODINGS)[encoding])] if encoding else served_path)[0]
+        immutable = _IMMUTABLE_NAME.match(os.path.splitext(os.path.basename(path))[0])
+        headers = {
+            "content-type": media_type or "application/octet-stream",
+            # รูปแบบเดียวกับ ETag ของ nginx ค่าจึงตรงกันทั้งโหมดส่งเองและโหมด X-Accel-Redirect
+            "etag": f'"{int(stat_result.st_mtime):x}-{stat_result.st_size:x}"',
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "cache-control": f"public, max-age={self.cache_max_age}, immutable" if immutable else "public, max-age=60",
+            "vary": "Accept, Accept-Encoding",
+        }
+        if encoding:
+            headers["content-encoding"] = encoding
+        else:
+            headers["accept-ranges"] = "bytes"
+        return headers
+
+    def image_response(self, path: str, served_path: str, full_path: str, stat_result: os.stat_result,
+                       encoding: Optional[str], request_headers: Headers) -> Response:
+        headers = self.cache_headers(path, served_path, stat_result, encoding)
+
+        if self.sendfile_header:
+            # proxy จัดการ conditional/range และส่งไฟล์เอง
+            if self.sendfile_header.lower() == "x-accel-redirect":
+                headers["x-accel-redirect"] = self.accel_prefix + served_path.replace(os.sep, "/")
+            else:
+                headers[self.sendfile_header] = full_path
+            return Response(headers=headers)
+
+        if self.is_not_modified(Headers(headers), request_headers):
+            return Response(status_code=304, headers={
+                key: value for key, value in headers.items() if key in ("etag", "cache-control", "vary", "last-modified")
+            })
+
+        size = stat_result.st_size
+        byte_range = None
+        if "range" in request_headers and not encoding and self.range_is_current(headers, request_headers):
+            byte_range = parse_range(request_headers["range"], size)
+        if byte_range is None:
+            return FileRangeResponse(full_path, 0, size - 1, 200, headers)
+        start, end = byte_range
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+        return FileRangeResponse(full_path, start, end, 206, headers)
+
+    @staticmethod
+    def range_is_current(headers: dict, request_headers: Headers) -> bool:
+        # If-Range: ส่งแค่บางส่วนเฉพาะเมื่อไฟล์ยังเป็นเวอร์ชันเดียวกับที่ client มีอยู่
+        if_range = request_headers.get("if-range")
+        if if_range is None:
+            return True
+        if if_range.startswith('"'):
+            return if_range == headers["etag"]
+        try:
+            return parsedate_to_datetime(if_range) >= parsedate_to_datetime(headers["last-modified"])
+        except (TypeError, ValueError):
+            return False
+
+def mount_images(app: ASGIApp, images: ImageFiles, prefix: str = "/images") -> ASGIApp:
+    """Route ``prefix`` straight to ``images``, ahead of the FastAPI app.
+
+    Image requests then skip the app's middleware stack and routing.
+    """
+    async def dispatch(scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if scope["type"] == "http" and (path == prefix or path.startswith(prefix + "/")):
+            scope = dict(scope, root_path=scope.get("root_path", "") + prefix)
+            try:
+                await images(scope, receive, send)
+            except HTTPException as e:
+                await Response(status_code=e.status_code, headers=e.headers)(scope, receive, send)
+            return
+        await app(scope, receive, send)
+    return dispatch
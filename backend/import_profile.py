@@ -0,0 +1,97 @@
+"""Import-time profile of the app with a budget: ``python -m backend.import_profile``.
+
+Runs ``python -X importtime -c "import backend.main"`` in fresh
+interpreters, reports the most expensive modules and top-level packages,
+and exits non-zero when the median total exceeds ``--budget-ms`` or when a
+module that should load lazily (see ``LAZY_MODULES``) was imported.
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from collections import Counter
+from typing import Dict, List, NamedTuple
+
+TARGET = "backend.main"
+DEFAULT_BUDGET_MS = 1500
+
+# ใช้เฉพาะบาง request หรือตอนเชื่อมต่อใน lifespan ห้ามโหลดตอน import แอป
+LAZY_MODULES = (
+    "aiosmtplib",  # sending email
+    "jinja2",  # email and the few HTML pages
+    "motor",  # Mongo client, created in the lifespan
+    "pymongo",
+    "boto3",  # only with STORAGE_BACKEND=s3
+    "botocore",
+    "uvicorn",  # only the server entry point, backend.serve
+)
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+class ModuleTime(NamedTuple):
+    name: str
+    self_us: int
+    cumulative_us: int
+
+def parse_importtime(output: str) -> List[ModuleTime]:
+    modules = []
+    for line in output.splitlines():
+        match = LINE.match(line)
+        if match:
+            modules.append(ModuleTime(match.group(4), int(match.group(1)), int(match.group(2))))
+    return modules
+
+def profile_once(target: str = TARGET) -> List[ModuleTime]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import {target} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+def by_package(modules: List[ModuleTime]) -> Dict[str, int]:
+    totals = Counter()
+    for module in modules:
+        totals[module.name.split(".")[0]] += module.self_us
+    return dict(totals)
+
+def eager_lazy_modules(modules: List[ModuleTime]) -> List[str]:
+    loaded = {module.name.split(".")[0] for module in modules}
+    return [name for name in LAZY_MODULES if name in loaded]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3, help="median of this many cold imports")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--target", default=TARGET)
+    args = parser.parse_args(argv)
+
+    runs = [profile_once(args.target) for _ in range(args.runs)]
+    totals = [sum(module.self_us for module in modules) / 1000 for modules in runs]
+    total_ms = statistics.median(totals)
+    # รายละเอียดจากรอบที่ใกล้ค่ามัธยฐานที่สุด รอบแรกมักช้ากว่าเพราะ cache ของดิสก์
+    modules = runs[min(range(len(runs)), key=lambda index: abs(totals[index] - total_ms))]
+
+    print(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for module in sorted(modules, key=lambda module: module.self_us, reverse=True)[:args.top]:
+        print(f"{module.self_us / 1000:9.1f} {module.cumulative_us / 1000:9.1f}  {module.name}")
+    print(f"\n{'ms':>9}  package")
+    for package, self_us in sorted(by_package(modules).items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:9.1f}  {package}")
+    print(f"\nimport {args.target}: {total_ms:.0f} ms (median of {args.runs}), budget {args.budget_ms:.0f} ms")
+
+    failed = False
+    eager = eager_lazy_modules(modules)
+    if eager:
+        print(f"FAIL: imported eagerly but should load lazily: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import time over budget by {total_ms - args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
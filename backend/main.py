@@ -9,24 +9,50 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from . import db
 from . import router
+from . import storage
+from . import warmup
 from .core import config
-from .db import mongodb
-from fastapi.staticfiles import StaticFiles
-from .socket_events import sio
+from .core.workers import primary_worker
+from .db import message_writer, mongodb, slow_queries
+from .storage import deletions, reconciler
+from .image_files import ImageFiles, mount_images
+from .socket_events import close_socketio, init_socketio, sio
+from .utils.category_cache import init_category_cache
+from .utils.query_stats import query_stats_middleware
 
 # ใช้ async context manager สำหรับจัดการ lifespan ของแอป
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await mongodb.connect_mongoDB()
+    db.start_replicas()
+    slow_queries.start_slow_query_log()
+    message_writer.start_message_writer()
+    deletions.start_deletion_queue()
+    # งานที่ควรรันครั้งเดียวต่อเครื่อง ไม่ใช่ทุก worker
+    if primary_worker():
+        reconciler.start_reconciler()
+    # เปิด pool และเติม cache ให้ครบก่อนรายงานว่าพร้อมรับ traffic
+    await warmup.warm_up(app.state.settings)
     yield
+    # ให้ load balancer หยุดส่ง request ใหม่มาก่อนเริ่มปิดทรัพยากร
+    warmup.readiness.ready = False
+    await reconciler.stop_reconciler()
+    await deletions.stop_deletion_queue()
+    await close_socketio()
+    # เขียนข้อความที่ยังค้างอยู่ในคิวให้หมดก่อนปิด MongoDB
+    await message_writer.stop_message_writer()
+    mongodb.close_mongoDB()
     if db.engine is not None:
         await db.close_session()
+    slow_queries.stop_slow_query_log()
 
 def create_images_directory_if_not_exists():
     images_directory = "images"
     
     if not os.path.exists(images_directory):
         print(f"Creating directory: {images_directory}")
-        os.makedirs(images_directory)
+        # worker หลายตัวเริ่มพร้อมกันอาจสร้างแข่งกัน
+        os.makedirs(images_directory, exist_ok=True)
     else:
         print(f"Directory {images_directory} already exists")
 # ฟังก์ชันสร้างแอป
@@ -35,18 +61,35 @@ def create_app(settings=None):
         settings = config.get_settings()
 
     app = FastAPI(lifespan=lifespan)
+    app.state.settings = settings
 
     # เริ่มต้นการเชื่อมต่อกับฐานข้อมูล
     db.init_db(settings)
+    if db.replicas is not None:
+        app.middleware("http")(db.read_your_writes_middleware)
+    # นับ query ต่อ request; แสดงใน header เฉพาะตอนไม่ใช่ production
+    app.middleware("http")(query_stats_middleware(expose_headers=not settings.PROD))
     router.init_router_root(app)
     app.include_router(router.get_router(), prefix="/api")
     # Create images directory
     create_images_directory_if_not_exists()
+    image_storage = storage.init_storage(settings)
+    deletions.init_deletion_queue(settings, image_storage, db.async_session_maker)
+    reconciler.init_reconciler(settings, image_storage, db.async_session_maker)
     # เริ่มต้น MongoDB
     mongodb.init_mongoDB(settings)
-    app.mount("/images", StaticFiles(directory="images"), name="images")
-    
-    app_socket = socketio.ASGIApp(sio, app)
+    message_writer.init_message_writer(settings)
+    init_category_cache(settings)
+
+    init_socketio(settings)
+    # รูปภาพแยกออกจาก FastAPI ไม่ผ่าน middleware และ routing ของแอป
+    images = ImageFiles(
+        directory="images",
+        cache_max_age=settings.IMAGE_CACHE_MAX_AGE,
+        sendfile_header=settings.IMAGE_SENDFILE_HEADER,
+        accel_prefix=settings.IMAGE_ACCEL_PREFIX,
+    )
+    app_socket = socketio.ASGIApp(sio, mount_images(app, images))
 
     return app_socket
 
@@ -1,12 +1,23 @@
+from pydantic import BaseModel, field_validator
 from sqlalchemy import JSON, Column
 from sqlmodel import Relationship, SQLModel, Field
 from typing import Dict, List, Optional
 
 from backend.models.items import Item
+from ..storage import resolve_image
 
 class Category(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     image: Optional[Dict[str, str]] = Field(sa_column=Column(JSON), default=None)
     items: List["Item"] = Relationship(back_populates="category")  # เพิ่ม relationship นี้
-    
\ No newline at end of file
+    
+class CategoryRead(BaseModel):
+    id: int
+    name: str
+    image: Optional[Dict[str, str]] = None
+
+    _resolve_image = field_validator("image")(resolve_image)
+
+    class Config:
+        from_attributes = True
@@ -1,12 +1,15 @@
 from pydantic import BaseModel, Field
-from typing import Literal, Optional, List
+from typing import Any, Dict, Literal, Optional, List
 from datetime import datetime
-from .messages import Message
 
 class Chat(BaseModel):
     user1: Optional[int] = None # Optional User ID
     user2: int  # User ID
-    messages: Optional[List[Message]] = None
+    participants: List[int] = Field(default_factory=list)  # Sorted user IDs, used by the inbox index
+    last_message: Optional[Dict[str, Any]] = None  # Preview of the newest message
+    last_message_at: Optional[datetime] = None
+    message_count: int = 0
+    read_counts: Dict[str, int] = Field(default_factory=dict)  # Per-participant read marker
     created_at: datetime = Field(default_factory=datetime.utcnow)  # Auto-set to current time
 
     class Config:
@@ -4,5 +4,5 @@ from typing import List, Optional
 
 class CustomerInterest(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int
+    user_id: int = Field(index=True)
     category_ids: List[int] = Field(sa_column=Column(JSON), default_factory=list)
\ No newline at end of file
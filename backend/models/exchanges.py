@@ -1,8 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 from typing import Dict, Optional, TYPE_CHECKING
 
+from ..storage import resolve_image
+
 if TYPE_CHECKING:
     from .user import User
     from .items import Item
@@ -29,6 +31,8 @@ class UserInfo(BaseModel):
     name: Optional[str] = None
     email: str
     profile_image: Optional[Dict[str, str]] = None
+
+    _resolve_profile_image = field_validator("profile_image")(resolve_image)
 class ExchangeRead(ExchangeBase):
     id: int
     status: str
@@ -38,19 +42,20 @@ class ExchangeRead(ExchangeBase):
     offered_item_id: Optional[int] = None
     requester: Optional[UserInfo] = None  # For incoming exchanges
     owner: Optional[UserInfo] = None
+    updated_at: Optional[datetime] = None  # Pass back as ``since`` to fetch only later changes
 class ExchangeRequestCheck(BaseModel):
     requested_item_id: int
 class Exchange(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    requester_id: Optional[int] = Field(default=None, foreign_key="user.id")
-    requested_item_id: Optional[int] = Field(default=None, foreign_key="item.id")
-    offered_item_id: Optional[int] = Field(default=None, foreign_key="item.id")
+    requester_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
+    requested_item_id: Optional[int] = Field(default=None, foreign_key="item.id", index=True)
+    offered_item_id: Optional[int] = Field(default=None, foreign_key="item.id", index=True)
     
     requester: "User" = Relationship(back_populates="exchanges_requested")
     requested_item: "Item" = Relationship(sa_relationship_kwargs={"foreign_keys": "Exchange.requested_item_id"})
     offered_item: "Item" = Relationship(sa_relationship_kwargs={"foreign_keys": "Exchange.offered_item_id"})
 
-    status: str = Field(default="pending")
+    status: str = Field(default="pending", index=True)
     exchange_uuid: Optional[str] = Field(default=None)
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow}, index=True)
\ No newline at end of file
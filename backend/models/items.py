@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 import pytz
 from sqlalchemy import JSON, Column
 from sqlmodel import SQLModel, Field, Relationship
@@ -6,6 +6,7 @@ from typing import Any, Dict, List, Optional, TYPE_CHECKING
 from datetime import datetime
 
 from .user import OwnerInfo
+from ..storage import resolve_images
 
 if TYPE_CHECKING:
     from .user import User
@@ -41,6 +42,8 @@ class ItemRead(ItemBase):
     created_at: datetime
     updated_at: datetime
 
+    _resolve_images = field_validator("images")(resolve_images)
+
     class Config:
         orm_mode = True
 
@@ -53,12 +56,12 @@ class PaginatedItemResponse(BaseModel):
 
 class Item(ItemBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    owner_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    owner_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
     owner: "User" = Relationship(back_populates="items")
-    is_exchanged: bool = Field(default=False)
+    is_exchanged: bool = Field(default=False, index=True)
     exchanges_requested: List["Exchange"] = Relationship(sa_relationship_kwargs={"foreign_keys": "Exchange.requested_item_id"})
     exchanges_offered: List["Exchange"] = Relationship(sa_relationship_kwargs={"foreign_keys": "Exchange.offered_item_id"})
     category: Optional["Category"] = Relationship(back_populates="items")
-    category_id: Optional[int] = Field(default=None, foreign_key="category.id")
-    created_at: datetime = Field(default_factory=thailand_now)
+    category_id: Optional[int] = Field(default=None, foreign_key="category.id", index=True)
+    created_at: datetime = Field(default_factory=thailand_now, index=True)
     updated_at: datetime = Field(default_factory=thailand_now, sa_column_kwargs={"onupdate": thailand_now})
\ No newline at end of file
@@ -5,7 +5,7 @@ from datetime import datetime
 
 class Rating(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.id")
+    user_id: int = Field(foreign_key="user.id", index=True)
     rater_id: int = Field(foreign_key="user.id")
     score: float
     created_at: datetime = Field(default_factory=datetime.utcnow)
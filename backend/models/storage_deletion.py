@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import SQLModel, Field
+
+class StorageDeletion(SQLModel, table=True):
+    """Tombstone for stored files to remove once the row that used them is gone.
+
+    Written in the same transaction as the change, so files are only deleted
+    after it commits; the deletion queue retries until ``attempts`` runs out.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    key: str
+    is_prefix: bool = Field(default=False)
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,5 +1,5 @@
 from fastapi import UploadFile
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
 import pytz
 from sqlalchemy import JSON, Column
 from sqlmodel import SQLModel, Field, Relationship
@@ -9,6 +9,8 @@ from datetime import datetime
 from typing import Optional, List, TYPE_CHECKING
 
 
+from ..storage import resolve_image
+
 if TYPE_CHECKING:
     from .items import Item
     from .exchanges import Exchange
@@ -20,6 +22,8 @@ class OwnerInfo(BaseModel):
     name: Optional[str] = None
     phone: Optional[str] = None
     profile_image: Optional[Dict[str, str]] = None
+
+    _resolve_profile_image = field_validator("profile_image")(resolve_image)
 class UserBase(BaseModel):
     email: EmailStr
     phone: Optional[str] = None
@@ -49,6 +53,8 @@ class UserRead(UserBase):
     post_count: int
     exchange_complete_count: int
     rating: float
+
+    _resolve_profile_image = field_validator("profile_image")(resolve_image)
     class Config:
         orm_mode = True
 
@@ -7,6 +7,7 @@ from . import exchange
 from . import chat
 from . import category
 from . import customer_interest
+from . import admin
 
 router = APIRouter()
 
@@ -21,6 +22,7 @@ router.include_router(exchange.router, prefix="/exchanges", tags=["Exchanges"])
 router.include_router(chat.router, prefix="/chats", tags=["Chats"])
 router.include_router(category.router, prefix="/categorys", tags=["categorys"])
 router.include_router(customer_interest.router, prefix="/customerInterest", tags=["CustomerInterest"])
+router.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
 
 def get_router():
@@ -0,0 +1,48 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+
+from .. import db
+from ..db import slow_queries
+from ..storage.reconciler import get_reconciler
+from ..core.config import get_settings
+from ..utils.query_stats import route_metrics
+
+router = APIRouter()
+
+settings = get_settings()
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    # ปิด endpoint ทั้งหมดถ้าไม่ได้ตั้ง ADMIN_TOKEN
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+@router.get("/db/pool", dependencies=[Depends(require_admin_token)])
+async def get_pool_stats() -> dict:
+    return db.pool_stats()
+
+@router.get("/db/slow-queries", dependencies=[Depends(require_admin_token)])
+async def get_slow_queries(limit: int = Query(20, ge=1, le=200)) -> dict:
+    slow_query_log = slow_queries.slow_query_log
+    if slow_query_log is None:
+        return {"enabled": False, "threshold_ms": None, "dropped": 0, "statements": []}
+    return {
+        "enabled": True,
+        "threshold_ms": slow_query_log.threshold_ms,
+        "dropped": slow_query_log.report.dropped,
+        "statements": slow_query_log.report.top(limit),
+    }
+
+@router.get("/metrics/queries", dependencies=[Depends(require_admin_token)])
+async def get_query_metrics() -> dict:
+    return route_metrics.snapshot()
+
+@router.get("/storage/reconcile", dependencies=[Depends(require_admin_token)])
+async def get_last_reconcile_report() -> dict:
+    return {"last_report": get_reconciler().last_report}
+
+@router.post("/storage/reconcile", dependencies=[Depends(require_admin_token)])
+async def reconcile_storage(dry_run: bool = Query(True)) -> dict:
+    return await get_reconciler().run(dry_run=dry_run)
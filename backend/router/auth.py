@@ -7,7 +7,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.templating import Jinja2Templates
 from typing import TYPE_CHECKING, Annotated, Optional
 from sqlmodel import select
 from pydantic import EmailStr
@@ -18,6 +17,7 @@ from ..db import get_session
 from ..utils.email import send_password_reset_email
 from ..utils.auth import create_access_token, get_password_hash, verify_password,create_password_reset_token,create_verification_token
 from ..utils.email import send_verification_email
+from ..utils.templates import get_templates
 from ..core.config import get_settings
 from sqlalchemy.exc import IntegrityError
 
@@ -87,9 +87,7 @@ async def verify_email(token: str, request: Request, session: AsyncSession = Dep
         db_user.is_verified = True
         await session.commit()
         
-        templates = Jinja2Templates(directory='backend/template')
-
-        return templates.TemplateResponse(
+        return get_templates().TemplateResponse(
             request=request, name="email_verify_success.html", context={ "message" :"Email verified successfully"}
         )
 
@@ -185,7 +183,7 @@ async def reset_password(
         hashed_password = get_password_hash(new_password)
         user.hashed_password = hashed_password
         await session.commit()
-        return templates.TemplateResponse("password_reset_success.html", {"request": request})
+        return get_templates().TemplateResponse("password_reset_success.html", {"request": request})
     except JWTError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token")
 @router.post("/resend-verification")
@@ -204,8 +202,6 @@ async def resend_verification_link(
     await send_verification_email(user.email, verification_url)
     return {"message": "Verification email resent successfully"}
 
-templates = Jinja2Templates(directory="backend/template")
-
 @router.get("/reset-password", response_class=HTMLResponse)
 async def reset_password_page(request: Request, token: str):
-    return templates.TemplateResponse("reset_password.html", {"request": request, "token": token})
\ No newline at end of file
+    return get_templates().TemplateResponse("reset_password.html", {"request": request, "token": token})
\ No newline at end of file
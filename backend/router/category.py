@@ -4,27 +4,19 @@ from fastapi import APIRouter, Form, UploadFile, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from sqlmodel import select
-from ..models.category import Category
-from ..db import get_session
+from ..models.category import Category, CategoryRead
+from ..db import get_read_session, get_session
+from ..storage import get_storage, image_key
+from ..storage.deletions import schedule_deletion
+from ..utils.category_cache import get_category_cache, invalidate_category_cache
 
 router = APIRouter()
-# ฟังก์ชันสำหรับลบไฟล์รูปภาพเก่า
-def delete_old_image(file_path: str):
-    if file_path and os.path.exists(file_path):
-        os.remove(file_path)
-# ตรวจสอบว่ามีโฟลเดอร์สำหรับเก็บรูปภาพหรือไม่ ถ้าไม่มีให้สร้างขึ้น
-def create_directory_if_not_exists(path: str):
-    if not os.path.exists(path):
-        os.makedirs(path)
 
-@router.get("/categories", response_model=List[Category])
-async def get_categories(session: AsyncSession = Depends(get_session)):
-    result = await session.execute(select(Category))
-    categories = result.scalars().all()
-    return categories
+@router.get("/categories", response_model=List[CategoryRead])
+async def get_categories(session: AsyncSession = Depends(get_read_session)):
+    return await get_category_cache().get(session)
 
-@router.post("/categories", response_model=Category)
+@router.post("/categories", response_model=CategoryRead)
 async def create_category(
     name: str = Form(...),
     session: AsyncSession = Depends(get_session)
@@ -32,15 +24,11 @@ async def create_category(
     new_category = Category(name=name)
     session.add(new_category)
     await session.commit()
+    invalidate_category_cache()
     await session.refresh(new_category)
-    
-    # สร้างโฟลเดอร์สำหรับ category_id หลังจากที่ Category ถูกสร้าง
-    category_directory = f"images/categories/{new_category.id}"
-    create_directory_if_not_exists(category_directory)  # ตรวจสอบและสร้างโฟลเดอร์
-    
     return new_category
 
-@router.post("/categories/{category_id}/upload-image", response_model=Category)
+@router.post("/categories/{category_id}/upload-image", response_model=CategoryRead)
 async def upload_category_image(
     category_id: int,
     file: UploadFile,
@@ -50,25 +38,22 @@ async def upload_category_image(
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
 
-    category_directory = f"images/categories/{category_id}"
-    os.makedirs(category_directory, exist_ok=True)
-
+    storage = get_storage()
     image_id = str(uuid.uuid4())
     file_extension = os.path.splitext(file.filename)[1]
-    file_name = f"{image_id}{file_extension}"
-    file_location = f"{category_directory}/{file_name}"
+    key = f"categories/{category_id}/{image_id}{file_extension}"
 
-    # Delete the old image if it exists
-    if category.image and os.path.exists(category.image["url"]):
-        os.remove(category.image["url"])
+    # Delete the old image after the new one is committed
+    if category.image and image_key(category.image):
+        schedule_deletion(session, image_key(category.image))
 
     # Save the new image
-    with open(file_location, "wb+") as file_object:
-        file_object.write(await file.read())
+    await storage.save(key, file.file, file.content_type)
 
-    category.image = {"id": image_id, "url": file_location}
+    category.image = {"id": image_id, "key": key}
 
     session.add(category)
     await session.commit()
+    invalidate_category_cache()
     await session.refresh(category)
     return category
\ No newline at end of file
@@ -1,48 +1,77 @@
-from fastapi import APIRouter,status, Body, Depends, Form, HTTPException
+from fastapi import APIRouter,status, Body, Depends, Form, HTTPException, Query
 from bson import ObjectId
-from typing import Literal, List, Dict, Any
+from typing import Literal, List, Dict, Any, Optional
 from datetime import datetime
-from requests import session
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.models.chats import CreateChatRequest, SendMessageRequest
 
 from ..models.user import User
 from ..models.messages import Message
-from ..utils.auth import get_current_user, get_session
-from ..db.mongodb import get_db
+from ..utils.auth import get_current_user
+from ..utils.loaders import UserLoader, get_user_loader
+from ..utils.chat_messages import get_chat_participants, other_participant
+from ..db.mongodb import ASCENDING, DESCENDING, get_db
+from ..db.message_writer import get_message_writer
+from ..storage import resolve_image
+from ..socket_events import publish_chat_message
 
 router = APIRouter()
 
+def participant_info(user_id: int, user: Optional[User]) -> Dict[str, Any]:
+    return {
+        "id": user_id,
+        "name": user.name if user else "Unknown User",
+        "email": user.email if user else None,
+        "profile_image": resolve_image(user.profile_image) if user and user.profile_image else None
+    }
+
+def chat_pair_key(user_a: int, user_b: int) -> str:
+    """Normalized key for a pair of users, backing the unique chat index."""
+    low, high = sorted([user_a, user_b])
+    return f"{low}:{high}"
+
 @router.get("/sessions", response_model=List[Dict[str, Any]])
 async def get_chat_sessions(
+    before: Optional[datetime] = Query(None, description="Return chats whose last message is older than this timestamp"),
+    limit: int = Query(20, ge=1, le=100, description="Chats per page"),
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session)
+    user_loader: UserLoader = Depends(get_user_loader)
 ) -> List[Dict[str, Any]]:
     collection = get_db().get_collection("chats")
-    chats_cursor = collection.find({
-        "$or": [
-            {"user1": current_user.id},
-            {"user2": current_user.id}
-        ],
-    })
     
-    if chats_cursor is None:
-        return []
+    match: Dict[str, Any] = {"participants": current_user.id}
+    if before is not None:
+        match["last_message_at"] = {"$lt": before}
+    
+    # One query on the (participants, last_message_at) index; unread counts
+    # are derived from the chat counters instead of scanning messages
+    chats_cursor = collection.aggregate([
+        {"$match": match},
+        {"$sort": {"last_message_at": DESCENDING}},
+        {"$limit": limit},
+        {"$project": {
+            "participants": 1,
+            "last_message": 1,
+            "last_message_at": 1,
+            "unread_count": {"$max": [0, {"$subtract": [
+                {"$ifNull": ["$message_count", 0]},
+                {"$ifNull": [f"$read_counts.{current_user.id}", 0]},
+            ]}]},
+        }},
+    ])
+    chats = await chats_cursor.to_list(length=limit)
+    
+    other_user_ids = [other_participant(chat["participants"], current_user.id) for chat in chats]
+    users = await user_loader.load_map(other_user_ids)
     
     chat_list = []
-    for chat in chats_cursor:
-        other_user_id = chat["user2"] if chat["user1"] == current_user.id else chat["user1"]
-        other_user = await session.get(User, other_user_id)
-        
+    for chat, other_user_id in zip(chats, other_user_ids):
         chat_info = {
             "_id": str(chat["_id"]),
-            "user": {
-                "id": other_user_id,
-                "name": other_user.name if other_user else "Unknown User",
-                "email": other_user.email if other_user else None,
-                "profile_image": other_user.profile_image if other_user and other_user.profile_image else None
-            }
+            "user": participant_info(other_user_id, users.get(other_user_id)),
+            "last_message": chat.get("last_message"),
+            "last_message_at": chat.get("last_message_at"),
+            "unread_count": chat["unread_count"],
         }
         chat_list.append(chat_info)
     
@@ -52,90 +81,160 @@ async def get_chat_sessions(
 async def create_chat(
     chat_request: CreateChatRequest = Body(...),
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session)
+    user_loader: UserLoader = Depends(get_user_loader)
 ):
     # ตรวจสอบว่า user_id ที่ระบุมีอยู่จริง
-    target_user = await session.get(User, chat_request.user)
+    target_user = await user_loader.load(chat_request.user)
     if not target_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with id {chat_request.user} not found"
         )
 
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+
     collection = get_db().get_collection("chats")
     
-    # Check if a chat session already exists
-    existing_chat = collection.find_one({
-        "$or": [
-            {"user1": current_user.id, "user2": chat_request.user},
-            {"user1": chat_request.user, "user2": current_user.id}
-        ]
-    })
-    
-    if existing_chat:
-        return {"message": "Chat session already exists.", "chat_id": str(existing_chat["_id"])}
-    
-    # Create a new chat session
+    # One upsert on the unique participant pair: concurrent requests for the
+    # same two users can no longer create duplicate chats
+    now = datetime.utcnow()
+    new_chat_id = ObjectId()
+    participants = sorted([current_user.id, chat_request.user])
+    chat_filter = {"pair_key": chat_pair_key(*participants)}
     chat_data = {
+        "_id": new_chat_id,
         "user1": current_user.id,
         "user2": chat_request.user,
-        "messages": []  # Initialize messages as an empty array
+        "participants": participants,
+        "created_at": now,
+        "last_message": None,
+        "last_message_at": now,
+        "message_count": 0,
+        "read_counts": {},
     }
-    result = collection.insert_one(chat_data)
-    return {"message": "Chat session created successfully.", "chat_id": str(result.inserted_id)}
+    try:
+        chat = await collection.find_one_and_update(
+            chat_filter,
+            {"$setOnInsert": chat_data},
+            projection={"_id": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Lost the race to a concurrent upsert; that chat is the one to use
+        chat = await collection.find_one(chat_filter, {"_id": 1})
+    
+    if chat["_id"] != new_chat_id:
+        return {"message": "Chat session already exists.", "chat_id": str(chat["_id"])}
+    return {"message": "Chat session created successfully.", "chat_id": str(new_chat_id)}
+
 @router.post("/send_message", response_model=Message)
 async def send_message(
     message_request: SendMessageRequest = Body(...),
     current_user: User = Depends(get_current_user)
 ):
-    collection = get_db().get_collection("chats")
-    
     # Convert chat_id to ObjectId
     try:
         chat_object_id = ObjectId(message_request.chat_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid chat ID format: {str(e)}")
     
-    # Verify the chat exists
-    chat = collection.find_one({"_id": chat_object_id})
-    if chat is None:
-        raise HTTPException(status_code=404, detail=f"Chat session with ID {message_request.chat_id} not found")
-    
-    # Check if the current user is part of the chat
-    if chat["user1"] != current_user.id and chat["user2"] != current_user.id:
+    participants = await get_chat_participants(chat_object_id, current_user.id)
+    if participants is None:
+        # Only the failure path pays for telling "missing" from "forbidden"
+        if await get_db().get_collection("chats").find_one({"_id": chat_object_id}, {"_id": 1}) is None:
+            raise HTTPException(status_code=404, detail=f"Chat session with ID {message_request.chat_id} not found")
         raise HTTPException(status_code=403, detail="Not authorized to send message in this chat")
     
-    # Ensure the messages field is an array
-    if chat.get("messages") is None:
-        chat["messages"] = []
-    
-    # Add the message to the chat
-    message_data = {
-        "sender": current_user.id,
-        "receiver": chat["user2"] if chat["user1"] == current_user.id else chat["user1"],
-        "message": message_request.message,
-        "timestamp": datetime.utcnow(),
-        "message_type": message_request.message_type
-    }
+    # Same path as the socket send_message event: push to the chat's sockets
+    # now, persist through the batched write-behind queue
+    message_data, _ = await publish_chat_message(
+        chat_object_id, current_user.id, participants,
+        message_request.message, message_request.message_type,
+    )
+    return message_data
+
+@router.post("/{chat_id}/read")
+async def mark_chat_read(
+    chat_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    collection = get_db().get_collection("chats")
     
-    chat_update = {"$push": {"messages": message_data}}
-    result = collection.update_one({"_id": chat_object_id}, chat_update)
+    try:
+        chat_object_id = ObjectId(chat_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid chat ID format: {str(e)}")
     
+    # ข้อความที่ยังรอใน MessageWriter ยังไม่ถูกนับใน message_count นับรวมไว้ด้วย
+    # (ของที่ผู้ใช้ส่งเองไม่ต้องนับ ตอน flush จะเพิ่ม read_counts ของผู้ส่งให้อยู่แล้ว)
+    buffered = get_message_writer().buffered_count(chat_object_id, exclude_sender=current_user.id)
+    # Move the read marker up to the current message count in one update
+    result = await collection.update_one(
+        {"_id": chat_object_id, "participants": current_user.id},
+        [{"$set": {f"read_counts.{current_user.id}": {"$add": [{"$ifNull": ["$message_count", 0]}, buffered]}}}],
+    )
     if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail=f"Chat session with ID {message_request.chat_id} not found after update")
-    
-    # Retrieve the updated chat to return the message
-    updated_chat = collection.find_one({"_id": chat_object_id})
-    if not updated_chat:
-        raise HTTPException(status_code=404, detail=f"Chat session with ID {message_request.chat_id} not found")
+        raise HTTPException(status_code=404, detail=f"Chat session with ID {chat_id} not found")
     
-    return message_data
+    return {"message": "Chat marked as read.", "chat_id": chat_id}
+
+def cursor_condition(operator: str, timestamp: datetime, message_id: Optional[ObjectId]) -> Dict[str, Any]:
+    """Messages past the ``(timestamp, _id)`` cursor in the ``operator`` direction.
+
+    Messages flushed in one batch can share a timestamp, so the ``_id``
+    breaks ties; without it the cursor falls back to the timestamp alone.
+    """
+    if message_id is None:
+        return {"timestamp": {operator: timestamp}}
+    return {"$or": [
+        {"timestamp": {operator: timestamp}},
+        {"timestamp": timestamp, "_id": {operator: message_id}},
+    ]}
+
+def message_page_query(chat_object_id: ObjectId, before: Optional[datetime], after: Optional[datetime],
+                       before_id: Optional[ObjectId] = None, after_id: Optional[ObjectId] = None):
+    """Build the filter and sort for one page of chat history.
+
+    Without a cursor the newest page is returned. ``before`` walks back
+    through older messages and ``after`` fetches anything newer; pass the
+    ``_id`` of the message the cursor came from as ``before_id``/``after_id``
+    so messages with the same timestamp are neither skipped nor repeated.
+    """
+    query: Dict[str, Any] = {"chat_id": chat_object_id}
+    conditions = []
+    if before is not None:
+        conditions.append(cursor_condition("$lt", before, before_id))
+    if after is not None:
+        conditions.append(cursor_condition("$gt", after, after_id))
+    if len(conditions) == 1:
+        query.update(conditions[0])
+    elif conditions:
+        query["$and"] = conditions
+
+    # Page forward from ``after``, otherwise read newest-first from the index
+    direction = ASCENDING if after is not None and before is None else DESCENDING
+    return query, [("timestamp", direction), ("_id", direction)]
+
+def parse_message_id(message_id: Optional[str]) -> Optional[ObjectId]:
+    if message_id is None:
+        return None
+    try:
+        return ObjectId(message_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid message ID format: {str(e)}")
 
 @router.get("/messages/{chat_id}", response_model=List[Dict[str, Any]])
 async def get_messages_by_chat_id(
     chat_id: str,
+    before: Optional[datetime] = Query(None, description="Return messages older than this timestamp"),
+    after: Optional[datetime] = Query(None, description="Return messages newer than this timestamp"),
+    before_id: Optional[str] = Query(None, description="_id of the message ``before`` was taken from"),
+    after_id: Optional[str] = Query(None, description="_id of the message ``after`` was taken from"),
+    limit: int = Query(50, ge=1, le=100, description="Messages per page"),
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session)
+    user_loader: UserLoader = Depends(get_user_loader)
 ) -> List[Dict[str, Any]]:
     collection = get_db().get_collection("chats")
     
@@ -144,33 +243,42 @@ async def get_messages_by_chat_id(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid chat ID format: {str(e)}")
     
-    chat = collection.find_one({"_id": chat_object_id})
+    chat = await collection.find_one({"_id": chat_object_id}, {"participants": 1})
     if chat is None:
         raise HTTPException(status_code=404, detail=f"Chat session with ID {chat_id} not found")
     
-    if chat["user1"] != current_user.id and chat["user2"] != current_user.id:
+    if current_user.id not in chat.get("participants", []):
         raise HTTPException(status_code=403, detail="Not authorized to view messages in this chat")
     
-    messages = chat.get("messages", [])
+    query, sort = message_page_query(
+        chat_object_id, before, after, parse_message_id(before_id), parse_message_id(after_id)
+    )
+    messages_cursor = (
+        get_db().get_collection("messages")
+        .find(query, {"chat_id": 0})
+        .sort(sort)
+        .limit(limit)
+    )
+    messages = await messages_cursor.to_list(length=limit)
+    # Always hand the page back oldest-first, like the old embedded array
+    if sort[0][1] == DESCENDING:
+        messages.reverse()
+    
+    # A chat has two participants, so the whole page resolves in one query
+    user_loader.prime(current_user)
+    users = await user_loader.load_map(
+        user_id for msg in messages for user_id in (msg["sender"], msg["receiver"])
+    )
     
     for msg in messages:
-        sender = await session.get(User, msg["sender"])
-        receiver = await session.get(User, msg["receiver"])
+        msg["_id"] = str(msg["_id"])
+        sender_id = msg["sender"]
+        receiver_id = msg["receiver"]
         
-        msg["sender"] = {
-            "id": sender.id,
-            "name": sender.name if sender else "Unknown User",
-            "email": sender.email if sender else None,
-            "profile_image": sender.profile_image if sender and sender.profile_image else None
-        }
-        msg["receiver"] = {
-            "id": receiver.id,
-            "name": receiver.name if receiver else "Unknown User",
-            "email": receiver.email if receiver else None,
-            "profile_image": receiver.profile_image if receiver and receiver.profile_image else None
-        }
+        msg["sender"] = participant_info(sender_id, users.get(sender_id))
+        msg["receiver"] = participant_info(receiver_id, users.get(receiver_id))
         
-        msg["sender_is_me"] = sender.id == current_user.id if sender else False
-        msg["receiver_is_me"] = receiver.id == current_user.id if receiver else False
+        msg["sender_is_me"] = sender_id == current_user.id
+        msg["receiver_is_me"] = receiver_id == current_user.id
     
     return messages
@@ -10,6 +10,9 @@ from ..utils.auth import get_current_user
 
 router = APIRouter()
 
+def customer_interest_statement(user_id: int):
+    return select(CustomerInterest).where(CustomerInterest.user_id == user_id)
+
 # Route to submit customer interests
 @router.post("/customer-interest")
 async def submit_customer_interest(
@@ -31,7 +34,7 @@ async def submit_customer_interest(
         raise HTTPException(status_code=400, detail=f"Invalid category IDs: {invalid_category_ids}. These IDs do not exist in the database.")
     
     # Check if the user has already submitted their interests
-    result = await session.execute(select(CustomerInterest).where(CustomerInterest.user_id == current_user.id))
+    result = await session.execute(customer_interest_statement(current_user.id))
     existing_interest = result.scalar_one_or_none()
 
     if existing_interest:
@@ -56,7 +59,7 @@ async def get_customer_interest(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session)
 ):
-    result = await session.execute(select(CustomerInterest).where(CustomerInterest.user_id == current_user.id))
+    result = await session.execute(customer_interest_statement(current_user.id))
     interest = result.scalar_one_or_none()
 
     if not interest:
@@ -92,7 +95,7 @@ async def update_customer_interest(
             raise HTTPException(status_code=400, detail=f"Invalid category IDs to remove: {invalid_remove_category_ids}")
 
     # Check if the user has already submitted their interests
-    result = await session.execute(select(CustomerInterest).where(CustomerInterest.user_id == current_user.id))
+    result = await session.execute(customer_interest_statement(current_user.id))
     existing_interest = result.scalar_one_or_none()
 
     if not existing_interest:
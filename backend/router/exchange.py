@@ -1,6 +1,8 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
+import logging
 import uuid
-from fastapi import APIRouter, Body, Depends, HTTPException, status, Form
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 from sqlalchemy.orm import joinedload
@@ -10,10 +12,112 @@ from ..models.exchanges import Exchange, ExchangeAcceptReject, ExchangeCreate, E
 from ..models.items import Item
 from ..db import get_session
 from ..utils.auth import get_current_user
+from ..utils.loaders import UserLoader, get_user_loader
+from ..utils.pending_events import record_exchange_event
+from ..socket_events import emit_exchange_event
 from ..models.user import User
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+async def notify_exchange_update(event_type: str, exchange: Exchange, owner_id: int):
+    """Push an exchange change to both parties and queue it for whoever is offline.
+
+    Called only after commit; a socket or Mongo failure must not fail the request.
+    """
+    try:
+        await emit_exchange_event(event_type, exchange, owner_id)
+        await record_exchange_event([exchange.requester_id, owner_id], exchange.id, exchange.status)
+    except Exception:
+        logger.exception("Failed to notify exchange %s update", exchange.id)
+
+def incoming_exchanges_statement(owner_id: int, since: Optional[datetime] = None):
+    """Exchanges asking for the owner's items, optionally only those changed after ``since``."""
+    query = (
+        select(Exchange)
+        .options(
+            joinedload(Exchange.requested_item).joinedload(Item.category),
+            joinedload(Exchange.offered_item).joinedload(Item.category),
+            joinedload(Exchange.requester)
+        )
+        .join(Item, Exchange.requested_item_id == Item.id)
+        .where(Item.owner_id == owner_id)
+    )
+    if since is not None:
+        query = query.where(Exchange.updated_at > since).order_by(Exchange.updated_at)
+    return query
+
+def outgoing_exchanges_statement(requester_id: int, since: Optional[datetime] = None):
+    """Exchanges the user requested, optionally only those changed after ``since``."""
+    query = (
+        select(Exchange)
+        .options(
+            joinedload(Exchange.requested_item).joinedload(Item.category),
+            joinedload(Exchange.offered_item).joinedload(Item.category),
+            joinedload(Exchange.requested_item).joinedload(Item.owner),
+            joinedload(Exchange.offered_item).joinedload(Item.owner)
+        )
+        .where(Exchange.requester_id == requester_id)
+    )
+    if since is not None:
+        query = query.where(Exchange.updated_at > since).order_by(Exchange.updated_at)
+    return query
+
+def incoming_exchange_read(exchange: Exchange) -> ExchangeRead:
+    """Row of ``/incoming``: the exchange as the owner of the requested item sees it."""
+    return ExchangeRead(
+        id=exchange.id,
+        status=exchange.status,
+        exchange_uuid=exchange.exchange_uuid,
+        requested_item_id=exchange.requested_item_id,
+        offered_item_id=exchange.offered_item_id,
+        requested_item=ItemInfo(
+            id=exchange.requested_item.id,
+            name=exchange.requested_item.title,
+            category=exchange.requested_item.category.name if exchange.requested_item.category else None
+        ),
+        offered_item=ItemInfo(
+            id=exchange.offered_item.id,
+            name=exchange.offered_item.title,
+            category=exchange.offered_item.category.name if exchange.offered_item and exchange.offered_item.category else None
+        ) if exchange.offered_item else None,
+        requester=UserInfo(
+            id=exchange.requester.id,
+            name=exchange.requester.name,
+            email=exchange.requester.email,
+            profile_image=exchange.requester.profile_image
+        ),
+        updated_at=exchange.updated_at
+    )
+
+def outgoing_exchange_read(exchange: Exchange) -> ExchangeRead:
+    """Row of ``/outgoing``: the exchange as the requester sees it."""
+    return ExchangeRead(
+        id=exchange.id,
+        status=exchange.status,
+        exchange_uuid=exchange.exchange_uuid,
+        requested_item_id=exchange.requested_item_id,
+        offered_item_id=exchange.offered_item_id,
+        requested_item=ItemInfo(
+            id=exchange.requested_item.id,
+            name=exchange.requested_item.title,
+            category=exchange.requested_item.category.name if exchange.requested_item.category else None
+        ) if exchange.requested_item else None,
+        offered_item=ItemInfo(
+            id=exchange.offered_item.id,
+            name=exchange.offered_item.title,
+            category=exchange.offered_item.category.name if exchange.offered_item and exchange.offered_item.category else None
+        ) if exchange.offered_item else None,
+        owner=UserInfo(
+            id=exchange.requested_item.owner.id,
+            name=exchange.requested_item.owner.name,
+            email=exchange.requested_item.owner.email,
+            profile_image=exchange.requested_item.owner.profile_image
+        ) if exchange.requested_item and exchange.requested_item.owner else None,
+        updated_at=exchange.updated_at
+    )
+
 @router.post("/request", response_model=ExchangeRead)
 async def request_exchange(
     exchange: ExchangeCreate = Body(...),
@@ -50,6 +154,7 @@ async def request_exchange(
     session.add(db_exchange)
     await session.commit()
     await session.refresh(db_exchange)
+    await notify_exchange_update("exchange.requested", db_exchange, requested_item.owner_id)
 
     # Fetch item details
     requested_item = await session.execute(
@@ -68,7 +173,8 @@ async def request_exchange(
             name=requested_item.title,
             category=requested_item.category.name
         ),
-        offered_item=None
+        offered_item=None,
+        updated_at=db_exchange.updated_at
     )
 
     if db_exchange.offered_item_id:
@@ -134,53 +240,21 @@ async def request_exchange_check(
         }
 @router.get("/incoming", response_model=List[ExchangeRead])
 async def get_incoming_exchanges(
+    since: Optional[datetime] = Query(None, description="Only exchanges changed after this time (the newest updated_at already seen)"),
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    result = await session.execute(
-        select(Exchange)
-        .options(
-            joinedload(Exchange.requested_item).joinedload(Item.category),
-            joinedload(Exchange.offered_item).joinedload(Item.category),
-            joinedload(Exchange.requester)
-        )
-        .join(Item, Exchange.requested_item_id == Item.id)
-        .where(Item.owner_id == current_user.id)
-    )
+    result = await session.execute(incoming_exchanges_statement(current_user.id, since))
     exchanges = result.scalars().all()
     
-    return [
-        ExchangeRead(
-            id=exchange.id,
-            status=exchange.status,
-            exchange_uuid=exchange.exchange_uuid,
-            requested_item_id=exchange.requested_item_id,
-            offered_item_id=exchange.offered_item_id,
-            requested_item=ItemInfo(
-                id=exchange.requested_item.id,
-                name=exchange.requested_item.title,
-                category=exchange.requested_item.category.name if exchange.requested_item.category else None
-            ),
-            offered_item=ItemInfo(
-                id=exchange.offered_item.id,
-                name=exchange.offered_item.title,
-                category=exchange.offered_item.category.name if exchange.offered_item and exchange.offered_item.category else None
-            ) if exchange.offered_item else None,
-            requester=UserInfo(
-                id=exchange.requester.id,
-                name=exchange.requester.name,
-                email=exchange.requester.email,
-                profile_image=exchange.requester.profile_image
-            )
-        )
-        for exchange in exchanges
-    ]
+    return [incoming_exchange_read(exchange) for exchange in exchanges]
 
 @router.post("/check-uuid")
 async def check_exchange_uuid(
     data: ExchangeUUIDCheck,
     session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    user_loader: UserLoader = Depends(get_user_loader)
 ):
     exchange = await session.get(Exchange, data.exchange_id)
     if not exchange:
@@ -202,8 +276,7 @@ async def check_exchange_uuid(
     exchange.status = "completed"
     
     # Increment exchange_complete_count for both users
-    requester = await session.get(User, exchange.requester_id)
-    owner = await session.get(User, requested_item.owner_id)
+    requester, owner = await user_loader.load_many([exchange.requester_id, requested_item.owner_id])
     
     requester.exchange_complete_count += 1
     owner.exchange_complete_count += 1
@@ -216,10 +289,7 @@ async def check_exchange_uuid(
     
     await session.commit()
     await session.refresh(exchange)
-
-    # Fetch the requester and the owner of the requested item
-    requester = await session.get(User, exchange.requester_id)
-    owner = await session.get(User, requested_item.owner_id)
+    await notify_exchange_update("exchange.completed", exchange, requested_item.owner_id)
 
     # Send confirmation emails
     await send_exchange_confirmation_email(
@@ -239,47 +309,14 @@ async def check_exchange_uuid(
 
 @router.get("/outgoing", response_model=List[ExchangeRead])
 async def get_outgoing_exchanges(
+    since: Optional[datetime] = Query(None, description="Only exchanges changed after this time (the newest updated_at already seen)"),
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    result = await session.execute(
-        select(Exchange)
-        .options(
-            joinedload(Exchange.requested_item).joinedload(Item.category),
-            joinedload(Exchange.offered_item).joinedload(Item.category),
-            joinedload(Exchange.requested_item).joinedload(Item.owner),
-            joinedload(Exchange.offered_item).joinedload(Item.owner)
-        )
-        .where(Exchange.requester_id == current_user.id)
-    )
+    result = await session.execute(outgoing_exchanges_statement(current_user.id, since))
     exchanges = result.scalars().all()
     
-    return [
-        ExchangeRead(
-            id=exchange.id,
-            status=exchange.status,
-            exchange_uuid=exchange.exchange_uuid,
-            requested_item_id=exchange.requested_item_id,
-            offered_item_id=exchange.offered_item_id,
-            requested_item=ItemInfo(
-                id=exchange.requested_item.id,
-                name=exchange.requested_item.title,
-                category=exchange.requested_item.category.name if exchange.requested_item.category else None
-            ) if exchange.requested_item else None,
-            offered_item=ItemInfo(
-                id=exchange.offered_item.id,
-                name=exchange.offered_item.title,
-                category=exchange.offered_item.category.name if exchange.offered_item and exchange.offered_item.category else None
-            ) if exchange.offered_item else None,
-            owner=UserInfo(
-                id=exchange.requested_item.owner.id,
-                name=exchange.requested_item.owner.name,
-                email=exchange.requested_item.owner.email,
-                profile_image=exchange.requested_item.owner.profile_image
-            ) if exchange.requested_item and exchange.requested_item.owner else None
-        )
-        for exchange in exchanges
-    ]
+    return [outgoing_exchange_read(exchange) for exchange in exchanges]
 @router.post("/accept", response_model=ExchangeRead)
 async def accept_exchange(
     data: ExchangeAcceptReject,
@@ -306,6 +343,7 @@ async def accept_exchange(
     exchange.exchange_uuid = exchange_uuid
     await session.commit()
     await session.refresh(exchange)
+    await notify_exchange_update("exchange.accepted", exchange, requested_item.owner_id)
 
     # Prepare the response
     response = ExchangeRead(
@@ -319,7 +357,8 @@ async def accept_exchange(
             name=requested_item.title,
             category=requested_item.category.name if requested_item.category else None
         ),
-        offered_item=None
+        offered_item=None,
+        updated_at=exchange.updated_at
     )
 
     # Fetch offered item details if it exists
@@ -359,6 +398,7 @@ async def reject_exchange(
     exchange.status = "rejected"
     await session.commit()
     await session.refresh(exchange)
+    await notify_exchange_update("exchange.rejected", exchange, requested_item.owner_id)
 
     # Prepare the response
     response = ExchangeRead(
@@ -372,7 +412,8 @@ async def reject_exchange(
             name=requested_item.title,
             category=requested_item.category.name if requested_item.category else None
         ),
-        offered_item=None
+        offered_item=None,
+        updated_at=exchange.updated_at
     )
 
     # Fetch offered item details if it exists
@@ -407,4 +448,7 @@ async def delete_exchange(
 
     await session.delete(exchange)
     await session.commit()
+    # แถวถูกลบแล้ว ``since=`` จึงมองไม่เห็น ต้องแจ้งผ่าน event แทน
+    exchange.status = "deleted"
+    await notify_exchange_update("exchange.deleted", exchange, requested_item.owner_id)
     return {"message": "Exchange deleted successfully"}
\ No newline at end of file
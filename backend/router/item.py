@@ -1,6 +1,6 @@
+import logging
 import os
 import re
-import shutil
 from typing import List, Optional
 import uuid
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status, Query
@@ -11,12 +11,115 @@ from sqlalchemy.orm import joinedload
 from backend.models.category import Category
 from backend.models.exchanges import Exchange
 from ..models.items import CategoryInfo, Item, ItemCreate, ItemRead, PaginatedItemResponse, thailand_now
-from ..db import get_session
-from ..utils.auth import get_current_user
+from ..db import get_read_session, get_session
+from ..utils.auth import get_current_user, get_current_user_for_read
+from ..storage import get_storage, image_key, item_image_key
+from ..storage.deletions import schedule_deletion
 from ..models.user import OwnerInfo, User
 from sqlalchemy.orm import selectinload
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+async def store_item_images(images: Optional[List[UploadFile]], owner_id: int, item_id: int) -> List[dict]:
+    storage = get_storage()
+    images_data = []
+    for image in images or []:
+        image_id = str(uuid.uuid4())
+        key = item_image_key(owner_id, item_id, image_id, image.filename)
+        await storage.save(key, image.file, image.content_type)
+        images_data.append({"id": image_id, "key": key})
+    return images_data
+
+async def delete_stored_images(images: List[dict]):
+    # ลบแบบ best effort: ไฟล์ที่ลบไม่สำเร็จ reconciler จะเก็บกวาดภายหลัง
+    storage = get_storage()
+    for image in images:
+        key = image_key(image)
+        if not key:
+            continue
+        try:
+            await storage.delete(key)
+        except Exception:
+            logger.exception("Failed to delete image %s", key)
+
+async def preferred_categories_by_id(session: AsyncSession, items) -> dict:
+    # โหลดหมวดหมู่ที่ต้องการของทุกรายการใน query เดียว แทนการ query ทีละรายการ (N+1)
+    category_ids = {category_id for item in items for category_id in (item.preferred_category_ids or [])}
+    if not category_ids:
+        return {}
+    result = await session.execute(select(Category).where(Category.id.in_(category_ids)))
+    return {category.id: category for category in result.scalars().all()}
+
+def item_read(item: Item, categories: dict, owner: Optional[OwnerInfo] = None) -> ItemRead:
+    """``ItemRead`` for an item loaded with its owner and category.
+
+    ``categories`` maps id to ``Category`` for the preferred categories, as
+    returned by ``preferred_categories_by_id``. ``owner`` replaces the
+    default owner summary (id, name, phone, profile image).
+    """
+    return ItemRead(
+        **{k: v for k, v in item.__dict__.items() if k not in ['owner', 'category']},
+        owner=owner or OwnerInfo(
+            id=item.owner.id,
+            name=item.owner.name,
+            phone=item.owner.phone,
+            profile_image=item.owner.profile_image
+        ),
+        category=CategoryInfo(
+            id=item.category.id,
+            name=item.category.name
+        ) if item.category else None,
+        preferred_category=[
+            CategoryInfo(id=categories[category_id].id, name=categories[category_id].name)
+            for category_id in (item.preferred_category_ids or [])
+            if category_id in categories
+        ]
+    )
+
+def owner_items_statement(owner_id: int):
+    return (
+        select(Item)
+        .options(selectinload(Item.owner), selectinload(Item.category))
+        .where(Item.owner_id == owner_id)
+    )
+
+def requested_item_ids_statement(user_id: int):
+    """Items the user already asked to exchange for, which the feed leaves out."""
+    return select(Exchange.requested_item_id).where(Exchange.requester_id == user_id)
+
+def feed_statements(user_id: int, requested_item_ids: List[int], query: Optional[str] = None,
+                    sort_by: str = "created_at", sort_order: str = "desc"):
+    """Unpaginated feed query and its count query for ``get_items``."""
+    statement = select(Item).options(selectinload(Item.owner), selectinload(Item.category))
+    if query:
+        statement = statement.where(Item.title.ilike(f"%{query}%"))
+
+    # Modify the main query to exclude exchanged items
+    statement = statement.where(
+        not_(or_(
+            Item.id.in_(requested_item_ids),
+            Item.owner_id == user_id,
+            Item.is_exchanged == True  # Add this condition
+        ))
+    )
+
+    # Add sorting
+    if hasattr(Item, sort_by):
+        order_func = desc if sort_order.lower() == "desc" else asc
+        statement = statement.order_by(order_func(getattr(Item, sort_by)))
+
+    # Count total items (with the same filters)
+    count_statement = select(func.count()).select_from(Item)
+    if query:
+        count_statement = count_statement.where(Item.title.ilike(f"%{query}%"))
+    count_statement = count_statement.where(
+        not_(or_(
+            Item.id.in_(requested_item_ids),
+            Item.owner_id == user_id
+        ))
+    )
+    return statement, count_statement
 
 @router.post("/", response_model=ItemRead)
 async def create_item(
@@ -74,24 +177,14 @@ async def create_item(
     session.add(db_item)
     await session.flush()
 
-    item_directory = f"images/{current_user.id}/items/{db_item.id}"
-    os.makedirs(item_directory, exist_ok=True)
-
-    images_data = []
-    if images:
-        for image in images:
-            image_id = str(uuid.uuid4())
-            file_extension = os.path.splitext(image.filename)[1]
-            file_name = f"{image_id}{file_extension}"
-            file_location = f"{item_directory}/{file_name}"
-            
-            with open(file_location, "wb") as f:
-                f.write(await image.read())
-            
-            images_data.append({"id": image_id, "url": file_location})
-
+    images_data = await store_item_images(images, current_user.id, db_item.id)
     db_item.images = images_data
-    await session.commit()
+    try:
+        await session.commit()
+    except Exception:
+        # item ไม่ถูกบันทึก จึงไม่ทิ้งไฟล์ของมันไว้ใน storage
+        await delete_stored_images(images_data)
+        raise
     await session.refresh(db_item)
     # Fetch preferred categories
     preferred_categories = await session.execute(
@@ -124,39 +217,17 @@ async def get_user_items(
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    result = await session.execute(
-        select(Item)
-        .options(selectinload(Item.owner), selectinload(Item.category))
-        .where(Item.owner_id == current_user.id)
-    )
+    result = await session.execute(owner_items_statement(current_user.id))
     items = result.scalars().all()
 
-    item_reads = []
-    for item in items:
-        preferred_categories = await session.execute(
-            select(Category).where(Category.id.in_(item.preferred_category_ids))
-        )
-        preferred_categories = preferred_categories.scalars().all()
-
-        item_reads.append(ItemRead(
-            **{k: v for k, v in item.__dict__.items() if k not in ['owner', 'category']},
-            owner=item.owner.owner_info,
-            category=CategoryInfo(
-                id=item.category.id,
-                name=item.category.name
-            ) if item.category else None,
-            preferred_category=[
-                CategoryInfo(id=cat.id, name=cat.name)
-                for cat in preferred_categories
-            ]
-        ))
-
-    return item_reads
+    categories = await preferred_categories_by_id(session, items)
+    # รายการของตัวเองส่ง owner แบบเดิม (มี email ไม่มี name)
+    return [item_read(item, categories, owner=item.owner.owner_info) for item in items]
 # Get all items (optionally with search query)
 @router.get("/", response_model=PaginatedItemResponse)
 async def get_items(
-    session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
+    current_user: User = Depends(get_current_user_for_read),
     query: str = Query(None, min_length=0, description="Search query for items"),
     page: int = Query(1, ge=1, description="Page number"),
     items_per_page: int = Query(10, ge=1, le=100, description="Items per page"),
@@ -164,42 +235,10 @@ async def get_items(
     sort_order: str = Query("desc", description="Sort order (asc or desc)")
 ):
     # Get the IDs of items that the user has requested to exchange
-    requested_items = await session.execute(
-        select(Exchange.requested_item_id)
-        .where(Exchange.requester_id == current_user.id)
-    )
+    requested_items = await session.execute(requested_item_ids_statement(current_user.id))
     requested_item_ids = [item[0] for item in requested_items.fetchall()]
 
-    # Modify the main query to exclude these items
-    statement = select(Item).options(selectinload(Item.owner), selectinload(Item.category))
-    
-    if query:
-        statement = statement.where(Item.title.ilike(f"%{query}%"))
-    
-    # Modify the main query to exclude exchanged items
-    statement = statement.where(
-        not_(or_(
-            Item.id.in_(requested_item_ids),
-            Item.owner_id == current_user.id,
-            Item.is_exchanged == True  # Add this condition
-        ))
-    )
-
-    # Add sorting
-    if hasattr(Item, sort_by):
-        order_func = desc if sort_order.lower() == "desc" else asc
-        statement = statement.order_by(order_func(getattr(Item, sort_by)))
-
-    # Count total items (with the same filters)
-    count_statement = select(func.count()).select_from(Item)
-    if query:
-        count_statement = count_statement.where(Item.title.ilike(f"%{query}%"))
-    count_statement = count_statement.where(
-        not_(or_(
-            Item.id.in_(requested_item_ids),
-            Item.owner_id == current_user.id
-        ))
-    )
+    statement, count_statement = feed_statements(current_user.id, requested_item_ids, query, sort_by, sort_order)
     total_items = await session.execute(count_statement)
     total_items = total_items.scalar_one()
 
@@ -209,30 +248,8 @@ async def get_items(
     result = await session.execute(statement)
     items = result.scalars().all()
 
-    items_with_preferred_categories = []
-    for item in items:
-        preferred_categories = await session.execute(
-            select(Category).where(Category.id.in_(item.preferred_category_ids))
-        )
-        preferred_categories = preferred_categories.scalars().all()
-
-        items_with_preferred_categories.append(ItemRead(
-            **{k: v for k, v in item.__dict__.items() if k not in ['owner', 'category']},
-            owner=OwnerInfo(
-                id=item.owner.id,
-                name=item.owner.name,
-                phone=item.owner.phone,
-                profile_image=item.owner.profile_image
-            ),
-            category=CategoryInfo(
-                id=item.category.id,
-                name=item.category.name
-            ) if item.category else None,
-            preferred_category=[
-                CategoryInfo(id=cat.id, name=cat.name)
-                for cat in preferred_categories
-            ]
-        ))
+    categories = await preferred_categories_by_id(session, items)
+    items_with_preferred_categories = [item_read(item, categories) for item in items]
 
     return PaginatedItemResponse(
         items=items_with_preferred_categories,
@@ -245,7 +262,7 @@ async def get_items(
 @router.get("/{item_id}", response_model=ItemRead)
 async def get_item(
     item_id: int,
-    session: AsyncSession = Depends(get_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
     stmt = select(Item).options(selectinload(Item.owner), selectinload(Item.category)).where(Item.id == item_id)
     result = await session.execute(stmt)
@@ -318,20 +335,21 @@ async def update_item(
     db_item.lat = lat
     db_item.updated_at = thailand_now() 
 
-    # จัดการกับรูปภาพใหม่
+    # จัดการกับรูปภาพใหม่: รูปเดิมถูกแทนที่ทั้งหมด
+    new_images = []
     if images:
-        images_data = []
-        for image in images:
-            image_id = str(uuid.uuid4())
-            file_location = f"images/{current_user.id}/items/{db_item.id}/{image_id}{os.path.splitext(image.filename)[1]}"
-            os.makedirs(os.path.dirname(file_location), exist_ok=True)
-            with open(file_location, "wb+") as file_object:
-                file_object.write(await image.read())
-            images_data.append({"id": image_id, "url": file_location})
-        db_item.images = images_data
+        # ไฟล์เดิมถูกลบหลัง commit แล้วเท่านั้น ถ้า commit ล้มเหลวรูปเดิมยังใช้งานได้
+        for key in filter(None, map(image_key, db_item.images or [])):
+            schedule_deletion(session, key)
+        new_images = await store_item_images(images, current_user.id, db_item.id)
+        db_item.images = new_images
 
     session.add(db_item)
-    await session.commit()
+    try:
+        await session.commit()
+    except Exception:
+        await delete_stored_images(new_images)
+        raise
     await session.refresh(db_item)
 
     # Fetch preferred categories
@@ -363,22 +381,20 @@ async def update_item(
 @router.get("/user/{user_id}", response_model=List[ItemRead])
 async def get_items_by_user_id(
     user_id: int,
-    session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_read_session),
+    current_user: User = Depends(get_current_user_for_read)
 ):
-    result = await session.execute(
-        select(Item)
-        .options(selectinload(Item.owner), selectinload(Item.category))
-        .where(Item.owner_id == user_id)
-    )
+    result = await session.execute(owner_items_statement(user_id))
     items = result.scalars().all()
 
+    categories = await preferred_categories_by_id(session, items)
     item_reads = []
     for item in items:
-        preferred_categories = await session.execute(
-            select(Category).where(Category.id.in_(item.preferred_category_ids))
-        )
-        preferred_categories = preferred_categories.scalars().all()
+        preferred_categories = [
+            categories[category_id]
+            for category_id in (item.preferred_category_ids or [])
+            if category_id in categories
+        ]
 
         item_reads.append(ItemRead(
             **{k: v for k, v in item.__dict__.items() if k not in ['owner', 'category']},
@@ -412,9 +428,8 @@ async def delete_item(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found or you do not have permission to delete it")
     
 
-    # Delete the item's image directory
-    item_directory = f"images/{current_user.id}/items/{item_id}"
-    shutil.rmtree(item_directory, ignore_errors=True)
+    # Delete the item's image directory in the background once the item is gone
+    schedule_deletion(session, f"{current_user.id}/items/{item_id}", prefix=True)
     await session.delete(db_item)
     await session.commit()
     return {"message": "Item deleted successfully"}
@@ -431,20 +446,18 @@ async def delete_item_image(
     if not db_item or db_item.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found or you do not have permission to delete images for this item")
 
-    # Construct the file path
-    file_path = f"images/{current_user.id}/items/{item_id}/{image_filename}"
-    
-    # Check if the file exists and delete it
-    if os.path.exists(file_path):
-        os.remove(file_path)
-        print(f"Deleted image: {file_path}")
-    else:
+    # Construct the storage key
+    key = f"{current_user.id}/items/{item_id}/{os.path.basename(image_filename)}"
+
+    # Remove the image from the item's images list
+    images = db_item.images or []
+    remaining = [image for image in images if image_key(image) != key]
+    if len(remaining) == len(images):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
+    # กำหนด list ใหม่ให้ SQLAlchemy เห็นว่า JSON column เปลี่ยน ไฟล์ถูกลบหลัง commit
+    db_item.images = remaining
+    schedule_deletion(session, key)
+    await session.commit()
 
-    # Remove the image URL from the item's image_urls list
-    if file_path in db_item.image_urls:
-        db_item.image_urls.remove(file_path)
-        await session.commit()
-    
     return {"message": "Image deleted successfully"}
 
@@ -1,7 +1,19 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from ..warmup import readiness
 
 router = APIRouter()
 
 @router.get("/")
 async def index() -> dict:
-    return dict(message = "Welcome to HandByHand API")
\ No newline at end of file
+    return dict(message = "Welcome to HandByHand API")
+
+@router.get("/health/live")
+async def liveness() -> dict:
+    return {"status": "ok"}
+
+@router.get("/health/ready")
+async def readiness_check():
+    # 503 ระหว่าง warm-up และระหว่างปิดตัว load balancer จะได้ไม่ส่ง request มา
+    return JSONResponse(readiness.snapshot(), status_code=200 if readiness.ready else 503)
@@ -10,13 +10,37 @@ from typing import List, Optional
 from backend.models.exchanges import Exchange
 from backend.models.items import Item
 from backend.models.rating import Rating, RatingCreate
-from backend.utils.utils import create_user_directory
 
 from ..models.user import User, UserRead, UserCreate
-from ..utils.auth import get_current_user, get_password_hash
-from ..db import get_session
+from ..utils.auth import get_current_user, get_current_user_for_read, get_password_hash
+from ..db import get_read_session, get_session
+from ..storage import get_storage, image_key
+from ..storage.deletions import schedule_deletion
 
 router = APIRouter()
+
+def user_with_post_count_statement(user_id: int):
+    return (
+        select(User, func.count(Item.id).label('post_count'))
+        .outerjoin(Item, User.id == Item.owner_id)
+        .where(User.id == user_id)
+        .group_by(User.id)
+    )
+
+def completed_exchange_count_statement(user_id: int):
+    """Completed exchanges the user took part in, on either side."""
+    return (
+        select(func.count(Exchange.id))
+        .join(Item, Exchange.requested_item_id == Item.id)
+        .where(or_(
+            Exchange.requester_id == user_id,
+            Item.owner_id == user_id
+        ))
+        .where(Exchange.status == "completed")
+    )
+
+def rating_scores_statement(user_id: int):
+    return select(Rating.score).where(Rating.user_id == user_id)
 # @router.delete("/{user_id}")
 # async def delete_user(user_id: int, session: AsyncSession = Depends(get_session)):
 #     db_user = await session.get(User, user_id)
@@ -33,27 +57,14 @@ async def get_me(
     session: AsyncSession = Depends(get_session)
 ):
     # Query the current user with their post count
-    result = await session.execute(
-        select(User, func.count(Item.id).label('post_count'))
-        .outerjoin(Item, User.id == Item.owner_id)
-        .where(User.id == current_user.id)
-        .group_by(User.id)
-    )
+    result = await session.execute(user_with_post_count_statement(current_user.id))
     user, post_count = result.first()
 
     # Update the user object with the post count
     user.post_count = post_count
 
     # Get exchange complete count
-    exchange_complete_count = await session.execute(
-        select(func.count(Exchange.id))
-        .join(Item, Exchange.requested_item_id == Item.id)
-        .where(or_(
-            Exchange.requester_id == user.id,
-            Item.owner_id == user.id
-        ))
-        .where(Exchange.status == "completed")
-    )
+    exchange_complete_count = await session.execute(completed_exchange_count_statement(user.id))
     user.exchange_complete_count = exchange_complete_count.scalar_one()
 
     # Refresh the user to ensure we have the latest data
@@ -85,9 +96,7 @@ async def create_rating(
     session.add(new_rating)
 
     # Calculate the new average rating
-    all_ratings = await session.execute(
-        select(Rating.score).where(Rating.user_id == rating.user_id)
-    )
+    all_ratings = await session.execute(rating_scores_statement(rating.user_id))
     all_ratings = all_ratings.scalars().all()
     
     user.rating = sum(all_ratings) / len(all_ratings)
@@ -144,22 +153,19 @@ async def update_me(
 
     # Handle profile image upload if provided
     if profile_image:
-        user_directory = f"images/{current_user.id}"
-        create_user_directory(current_user.id)
+        storage = get_storage()
         profile_image_id = str(uuid.uuid4())
         file_extension = os.path.splitext(profile_image.filename)[1]
-        file_name = f"{profile_image_id}{file_extension}"
-        file_location = f"{user_directory}/{file_name}"
+        key = f"{current_user.id}/{profile_image_id}{file_extension}"
 
-        # Delete the old profile image if it exists
-        if db_user.profile_image and os.path.exists(db_user.profile_image["url"]):
-            os.remove(db_user.profile_image["url"])
+        # Delete the old profile image after the new one is committed
+        if db_user.profile_image and image_key(db_user.profile_image):
+            schedule_deletion(session, image_key(db_user.profile_image))
 
         # Save the new profile image
-        with open(file_location, "wb") as f:
-            f.write(await profile_image.read())
+        await storage.save(key, profile_image.file, profile_image.content_type)
 
-        db_user.profile_image = {"id": profile_image_id, "url": file_location}
+        db_user.profile_image = {"id": profile_image_id, "key": key}
     
     session.add(db_user)
     await session.commit()
@@ -168,16 +174,11 @@ async def update_me(
 @router.get("/{user_id}", response_model=UserRead)
 async def get_user_by_id(
     user_id: int,
-    session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_read_session),
+    current_user: User = Depends(get_current_user_for_read)
 ):
     # Query the user with their post count
-    result = await session.execute(
-        select(User, func.count(Item.id).label('post_count'))
-        .outerjoin(Item, User.id == Item.owner_id)
-        .where(User.id == user_id)
-        .group_by(User.id)
-    )
+    result = await session.execute(user_with_post_count_statement(user_id))
     user_and_post_count = result.first()
 
     if not user_and_post_count:
@@ -189,15 +190,7 @@ async def get_user_by_id(
     user.post_count = post_count
 
     # Get exchange complete count
-    exchange_complete_count = await session.execute(
-        select(func.count(Exchange.id))
-        .join(Item, Exchange.requested_item_id == Item.id)
-        .where(or_(
-            Exchange.requester_id == user.id,
-            Item.owner_id == user.id
-        ))
-        .where(Exchange.status == "completed")
-    )
+    exchange_complete_count = await session.execute(completed_exchange_count_statement(user.id))
     user.exchange_complete_count = exchange_complete_count.scalar_one()
 
     # Refresh the user to ensure we have the latest data
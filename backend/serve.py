@@ -0,0 +1,182 @@
+"""Production entry point: ``python -m backend.serve``.
+
+The master process binds the listening socket and imports the application
+once, then forks the workers. Each worker builds its own app (database
+pools, Mongo client and background tasks are not fork-safe) and runs
+uvicorn on uvloop and httptools. On SIGTERM/SIGINT the master asks every
+worker to shut down gracefully: stop accepting, finish in-flight requests,
+close sockets, then run the lifespan shutdown that drains the message
+writer and closes the DB pools. Workers still alive after the grace period
+are killed. A worker that crashes is replaced; one that fails to start
+stops the whole server, since the next one would fail the same way.
+"""
+import argparse
+import importlib
+import logging
+import os
+import signal
+import sys
+import time
+from typing import Dict, Iterable
+
+import uvicorn
+
+from .core import config
+from .core.workers import WORKER_ID_ENV
+
+# uvicorn ตั้ง handler ให้ logger นี้แล้ว ข้อความของ master จึงออกรูปแบบเดียวกับของ worker
+logger = logging.getLogger("uvicorn.error")
+
+APP = "backend.main:create_app"
+STARTUP_FAILURE = 3  # uvicorn's exit code when the lifespan startup fails
+SHUTDOWN_MARGIN = 10  # seconds for the lifespan shutdown after connections are drained
+# แอป import โมดูลเหล่านี้แบบ lazy แต่ทุก worker ต้องใช้ตอน lifespan จึงโหลดใน master ครั้งเดียวก่อน fork
+PRELOAD = ("backend.main", "motor.motor_asyncio", "jinja2", "fastapi.templating")
+
+def worker_count(workers: int) -> int:
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+def check_socketio(settings, workers: int):
+    # ห้องของ Socket.IO อยู่ในหน่วยความจำของแต่ละ worker ต้องมี broker กลางให้ emit ข้าม worker ได้
+    queue = settings.SOCKETIO_MESSAGE_QUEUE
+    if workers > 1 and (not queue or queue.startswith("local://")):
+        raise SystemExit(
+            "Running several workers needs SOCKETIO_MESSAGE_QUEUE (e.g. redis://redis:6379/0), "
+            "otherwise chat events only reach clients connected to the same worker"
+        )
+
+class Supervisor:
+    """Pre-fork process manager around ``uvicorn.Server``."""
+
+    def __init__(self, server_config: uvicorn.Config, workers: int, graceful_timeout: float,
+                 preload: Iterable[str] = PRELOAD):
+        self.config = server_config
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.preload = preload
+        self.children: Dict[int, int] = {}  # pid -> worker id
+        self.stopping = False
+        self.exit_code = 0
+        self.socket = None
+
+    def run(self) -> int:
+        self.socket = self.config.bind_socket()
+        # import ก่อน fork: worker ใช้โมดูลที่โหลดแล้วร่วมกันแบบ copy-on-write และเริ่มได้เร็วขึ้น
+        for module in self.preload:
+            importlib.import_module(module)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGQUIT):
+            signal.signal(signum, self.handle_stop)
+        signal.signal(signal.SIGALRM, self.handle_timeout)
+
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            worker_id = self.children.pop(pid, None)
+            if worker_id is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                continue
+            if code == STARTUP_FAILURE:
+                logger.error("Worker %d failed to start, shutting down", worker_id)
+                self.exit_code = STARTUP_FAILURE
+                self.stop()
+                continue
+            logger.warning("Worker %d (pid %d) exited with %d, restarting", worker_id, pid, code)
+            time.sleep(1)
+            self.spawn(worker_id)
+        self.socket.close()
+        return self.exit_code
+
+    def spawn(self, worker_id: int):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = worker_id
+            return
+        # ----- worker -----
+        # กลุ่ม process ของตัวเอง: Ctrl-C ที่ terminal ไปถึง master เท่านั้น แล้ว master ส่ง SIGTERM ต่อ
+        # (ถ้า worker ได้สัญญาณซ้ำสองครั้ง uvicorn จะข้ามการรอ request ที่ค้างอยู่)
+        os.setpgid(0, 0)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGQUIT, signal.SIGALRM):
+            signal.signal(signum, signal.SIG_DFL)
+        os.environ[WORKER_ID_ENV] = str(worker_id)
+        code = 0
+        try:
+            server = uvicorn.Server(self.config)
+            server.run(sockets=[self.socket])
+            if not server.started:
+                code = STARTUP_FAILURE
+        except SystemExit as e:
+            # uvicorn ออกด้วย sys.exit(3) เมื่อ lifespan startup ล้มเหลว
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            logger.exception("Worker %d crashed", worker_id)
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def stop(self):
+        if self.stopping:
+            return
+        self.stopping = True
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+        signal.alarm(int(self.graceful_timeout + SHUTDOWN_MARGIN))
+
+    def handle_stop(self, signum, frame):
+        if not self.stopping:
+            logger.info("Received %s, stopping %d workers", signal.Signals(signum).name, len(self.children))
+        self.stop()
+
+    def handle_timeout(self, signum, frame):
+        for pid in self.children:
+            logger.warning("Worker pid %d did not stop in time, killing it", pid)
+            os.kill(pid, signal.SIGKILL)
+
+def build_config(settings, host: str, port: int) -> uvicorn.Config:
+    return uvicorn.Config(
+        APP,
+        factory=True,
+        host=host,
+        port=port,
+        loop=settings.SERVE_LOOP,
+        http=settings.SERVE_HTTP,
+        lifespan="on",
+        backlog=settings.SERVE_BACKLOG,
+        timeout_keep_alive=settings.SERVE_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVE_GRACEFUL_TIMEOUT_SECONDS,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.SERVE_FORWARDED_ALLOW_IPS,
+        access_log=settings.SERVE_ACCESS_LOG,
+    )
+
+def main(argv=None) -> int:
+    settings = config.get_settings()
+    parser = argparse.ArgumentParser(description="Run the API server.")
+    parser.add_argument("--host", default=settings.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVE_WORKERS, help="0 = one per CPU core")
+    parser.add_argument("--reload", action="store_true", help="development only: single process, restart on changes")
+    args = parser.parse_args(argv)
+
+    if args.reload:
+        uvicorn.run(APP, factory=True, host=args.host, port=args.port, reload=True)
+        return 0
+
+    workers = worker_count(args.workers)
+    check_socketio(settings, workers)
+    server_config = build_config(settings, args.host, args.port)
+    if workers == 1:
+        server = uvicorn.Server(server_config)
+        server.run()
+        return 0 if server.started else STARTUP_FAILURE
+    logger.info("Starting %d workers on %s:%d", workers, args.host, args.port)
+    return Supervisor(server_config, workers, settings.SERVE_GRACEFUL_TIMEOUT_SECONDS).run()
+
+if __name__ == "__main__":
+    sys.exit(main())
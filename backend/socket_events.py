@@ -1,30 +1,266 @@
+import functools
+import logging
+from typing import Dict, get_args
+from urllib.parse import parse_qs
 import socketio
+from bson import ObjectId
+
+from .db import get_session
+from .db.message_writer import get_message_writer
+from .models.chats import SendMessageRequest
+from .socket_manager import build_client_manager, socket_transports
+from .utils.auth import authenticate_token
+from .utils.chat_messages import build_message, get_chat_participants, other_participant
+from .utils.pending_events import take_digest
+from .utils.presence import PresenceTracker, chat_partners, get_presence, live_sockets, presence_info
+from .utils.throttle import Coalescer, TokenBucket
+
+logger = logging.getLogger(__name__)
 
 sio = socketio.AsyncServer(async_mode="asgi")
 
+MESSAGE_TYPES = get_args(SendMessageRequest.model_fields["message_type"].annotation)
+RATE_LIMITED = {"ok": False, "error": "Rate limit exceeded"}
+
+async def emit_coalesced(event: str, room: str, updates: dict):
+    if event == "typing":
+        chat_id = room.split(":", 1)[1]
+        await sio.emit("typing", {"chat_id": chat_id, "users": updates}, to=room)
+    else:
+        await sio.emit(event, {"users": updates}, to=room)
+
+# ค่าเริ่มต้น ถูกปรับตาม Settings ใน init_socketio
+rate_limit = {"rate": 20.0, "burst": 40}
+rate_limiters: Dict[str, TokenBucket] = {}
+ephemeral = Coalescer(emit_coalesced, window=0.25, max_pending=100)
+presence = PresenceTracker()
+
+def init_socketio(settings):
+    # Handlers are registered on ``sio`` at import time, so the manager is
+    # swapped in here, before the first client connects.
+    client_manager = build_client_manager(settings)
+    if client_manager is not None:
+        client_manager.set_server(sio)
+        sio.manager = client_manager
+        sio.manager_initialized = False
+    sio.eio.transports = socket_transports(settings)
+    rate_limit.update(rate=settings.SOCKET_RATE_LIMIT_PER_SECOND, burst=settings.SOCKET_RATE_LIMIT_BURST)
+    ephemeral.window = settings.SOCKET_COALESCE_WINDOW_MS / 1000
+    ephemeral.max_pending = settings.SOCKET_COALESCE_MAX_PENDING
+    presence.ttl = settings.PRESENCE_TTL_SECONDS
+    presence.heartbeat_interval = settings.PRESENCE_HEARTBEAT_SECONDS
+
+async def close_socketio():
+    await ephemeral.close()
+    await presence.close()
+    # ตัดการเชื่อมต่อที่เหลือ (รวม long-polling) ให้ client ต่อใหม่ไปที่ worker อื่น
+    await sio.shutdown()
+
+def rate_limited(handler):
+    """Drop client events beyond the socket's token bucket.
+
+    Handlers with acks get ``RATE_LIMITED`` back instead of running.
+    """
+    @functools.wraps(handler)
+    async def wrapper(sid, *args):
+        bucket = rate_limiters.get(sid)
+        if bucket is None:
+            bucket = rate_limiters[sid] = TokenBucket(**rate_limit)
+        if not bucket.allow():
+            logger.debug("Rate limited %s on %s", sid, handler.__name__)
+            return RATE_LIMITED
+        return await handler(sid, *args)
+    return wrapper
+
+def user_room(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def chat_room(chat_id) -> str:
+    return f"chat:{chat_id}"
+
+def get_connect_token(environ, auth):
+    # socket.io client ส่ง token มาได้ทั้งใน auth payload, header หรือ query string
+    if isinstance(auth, dict) and auth.get("token"):
+        return auth["token"]
+    authorization = environ.get("HTTP_AUTHORIZATION", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    token = parse_qs(environ.get("QUERY_STRING", "")).get("token")
+    return token[0] if token else None
+
+async def cached_chat_participants(sid, chat_id: str):
+    """Participants of ``chat_id`` if the socket's user is one of them.
+
+    Membership is cached in the socket session, so after the first check
+    (usually ``join_room``) sending into a chat needs no database read.
+    """
+    async with sio.session(sid) as session:
+        chats = session.setdefault("chats", {})
+        if chat_id in chats:
+            return chats[chat_id]
+        user_id = session["user_id"]
+
+    try:
+        chat_object_id = ObjectId(chat_id)
+    except Exception:
+        return None
+    participants = await get_chat_participants(chat_object_id, user_id)
+    if participants is not None:
+        async with sio.session(sid) as session:
+            session.setdefault("chats", {})[chat_id] = participants
+    return participants
+
+def message_payload(message_data: dict) -> dict:
+    return {
+        "_id": str(message_data["_id"]),
+        "chat_id": str(message_data["chat_id"]),
+        "sender": message_data["sender"],
+        "receiver": message_data["receiver"],
+        "message": message_data["message"],
+        "timestamp": message_data["timestamp"].isoformat(),
+        "message_type": message_data["message_type"],
+    }
+
+async def emit_chat_message(message_data: dict, participants, skip_sid=None):
+    """Push a message to its chat room and the participants' own rooms.
+
+    Rooms are de-duplicated by the manager, so each socket gets it once.
+    """
+    payload = message_payload(message_data)
+    rooms = [chat_room(payload["chat_id"])] + [user_room(user_id) for user_id in set(participants)]
+    await sio.emit("new_message", payload, to=rooms, skip_sid=skip_sid)
+    return payload
+
+async def emit_exchange_event(event_type: str, exchange, owner_id: int):
+    """Tell both sides of an exchange about a state change, on every device."""
+    payload = {
+        "type": event_type,
+        "exchange_id": exchange.id,
+        "status": exchange.status,
+        "requested_item_id": exchange.requested_item_id,
+        "offered_item_id": exchange.offered_item_id,
+        "requester_id": exchange.requester_id,
+        "owner_id": owner_id,
+        "updated_at": exchange.updated_at.isoformat() if exchange.updated_at else None,
+    }
+    await sio.emit("exchange", payload, to=[user_room(exchange.requester_id), user_room(owner_id)])
+
+async def publish_chat_message(chat_object_id, sender_id: int, participants, message: str, message_type: str, skip_sid=None):
+    """Deliver a new message to its sockets now and queue it for persistence.
+
+    Shared by the socket ``send_message`` event and the HTTP endpoint.
+    """
+    message_data = build_message(chat_object_id, sender_id, participants, message, message_type)
+    payload = await emit_chat_message(message_data, participants, skip_sid=skip_sid)
+    get_message_writer().submit(message_data)
+    return message_data, payload
+
+async def broadcast_presence(user_id: int, doc: dict):
+    # แจ้งเฉพาะคนที่มีแชทร่วมกัน ผ่านห้องส่วนตัวของแต่ละคน
+    info = presence_info(doc)
+    for partner_id in await chat_partners(user_id):
+        ephemeral.push("presence", user_room(partner_id), user_id, info)
+
 # Define the event handlers
 @sio.event
-async def connect(sid, environ):
-    print(f"Client connected: {sid}")
+async def connect(sid, environ, auth=None):
+    token = get_connect_token(environ, auth)
+    if not token:
+        raise socketio.exceptions.ConnectionRefusedError("Authentication required")
+
+    user = None
+    async for session in get_session():
+        user = await authenticate_token(token, session)
+    if user is None:
+        raise socketio.exceptions.ConnectionRefusedError("Could not validate credentials")
+
+    await sio.save_session(sid, {"user_id": user.id})
+    await sio.enter_room(sid, user_room(user.id))
+    rate_limiters[sid] = TokenBucket(**rate_limit)
+    logger.debug("Client connected: %s (user %s)", sid, user.id)
     await sio.emit("message", {"data": "Connected!"}, to=sid)
 
+    doc, previous = await presence.connect(user.id, sid)
+    if not live_sockets(previous):
+        await broadcast_presence(user.id, doc)
+        # สิ่งที่เกิดขึ้นระหว่างออฟไลน์ ส่งรวมเป็นก้อนเดียวแทนการให้แอป poll ทุกหน้า
+        digest = await take_digest(user.id, since=previous.get("last_seen"))
+        if digest:
+            await sio.emit("digest", digest, to=sid)
+
 @sio.event
 async def disconnect(sid):
-    print(f"Client disconnected: {sid}")
+    rate_limiters.pop(sid, None)
+    session = await sio.get_session(sid)
+    logger.debug("Client disconnected: %s", sid)
+    if not session or "user_id" not in session:
+        return
+
+    user_id = session["user_id"]
+    # หยุดสถานะกำลังพิมพ์ในแชทที่ยังค้างอยู่
+    for chat_id in session.get("chats", {}):
+        ephemeral.push("typing", chat_room(chat_id), user_id, False)
+    doc = await presence.disconnect(user_id, sid)
+    if not live_sockets(doc):
+        await broadcast_presence(user_id, doc)
 
 @sio.event
+@rate_limited
 async def message(sid, data):
-    print(f"Message from {sid}: {data}")
     await sio.emit("response", {"data": f"Message received: {data}"}, to=sid)
 
+@sio.on('join_room')
+@rate_limited
+async def handle_join_room(sid, data):
+    if not isinstance(data, dict) or not isinstance(data.get("room"), str) or not data["room"]:
+        return {"ok": False, "error": "room is required"}
+    room = data["room"]
+    participants = await cached_chat_participants(sid, room)
+    if participants is None:
+        return {"ok": False, "error": "Not authorized to join this chat"}
+    await sio.enter_room(sid, chat_room(room))
+    session = await sio.get_session(sid)
+    partner_id = other_participant(participants, session["user_id"])
+    partner_presence = await get_presence([partner_id])
+    return {"ok": True, "room": room, "presence": {partner_id: partner_presence[partner_id]}}
+
+@sio.on('leave_room')
+@rate_limited
+async def handle_leave_room(sid, data):
+    if not isinstance(data, dict) or not isinstance(data.get("room"), str) or not data["room"]:
+        return {"ok": False, "error": "room is required"}
+    await sio.leave_room(sid, chat_room(data["room"]))
+    return {"ok": True, "room": data["room"]}
+
+@sio.on('typing')
+@rate_limited
+async def handle_typing(sid, data):
+    # ไม่มี ack: สถานะพิมพ์เป็นข้อมูลชั่วคราว ส่งรวมกันทีละรอบ
+    if not isinstance(data, dict) or not data.get("chat_id"):
+        return
+    if await cached_chat_participants(sid, data["chat_id"]) is None:
+        return
+    session = await sio.get_session(sid)
+    ephemeral.push("typing", chat_room(data["chat_id"]), session["user_id"], bool(data.get("typing", True)))
+
 @sio.on('send_message')
+@rate_limited
 async def handle_send_message(sid, data):
-    room = data['room']
-    await sio.emit('new_message', {'room' : room})
+    # ผลลัพธ์ที่ return จะถูกส่งกลับเป็น ack ให้ผู้ส่ง ส่วนคนอื่นในห้องได้ new_message
+    if not isinstance(data, dict) or not data.get("chat_id") or not isinstance(data.get("message"), str):
+        return {"ok": False, "error": "chat_id and message are required"}
+    message_type = data.get("message_type", "text")
+    if message_type not in MESSAGE_TYPES:
+        return {"ok": False, "error": f"Unsupported message_type: {message_type}"}
 
-@sio.on('join_room')
-async def handle_join_room(sid, data):
-    room = data['room']
-    sio.enter_room(sid, room)
-    print(F"{sid} joined {room}")
-    await sio.emit('new_message', {'msg': f'{sid} has joined room {room}'}, room=room)
\ No newline at end of file
+    participants = await cached_chat_participants(sid, data["chat_id"])
+    if participants is None:
+        return {"ok": False, "error": "Not authorized to send message in this chat"}
+
+    session = await sio.get_session(sid)
+    _, payload = await publish_chat_message(
+        ObjectId(data["chat_id"]), session["user_id"], participants,
+        data["message"], message_type, skip_sid=sid,
+    )
+    ephemeral.push("typing", chat_room(data["chat_id"]), session["user_id"], False)
+    return {"ok": True, "message": payload}
@@ -0,0 +1,79 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Optional, Set
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+class LocalBus:
+    """In-process stand-in for a message broker: fan-out per channel."""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self.subscribers[channel].add(queue)
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        self.subscribers[channel].discard(queue)
+
+    async def publish(self, channel: str, message: dict):
+        for queue in list(self.subscribers[channel]):
+            queue.put_nowait(message)
+
+local_bus = LocalBus()
+
+class AsyncLocalPubSubManager(AsyncPubSubManager):
+    """Client manager that shares emits between servers in one process.
+
+    Each ``AsyncServer`` attached to the same bus and channel behaves like a
+    separate worker behind a broker, which makes cross-worker delivery
+    testable without Redis.
+    """
+    name = 'asynclocal'
+
+    def __init__(self, channel='socketio', write_only=False, logger=None, bus: Optional[LocalBus] = None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.bus = bus or local_bus
+        self.queue = None
+
+    async def _publish(self, data):
+        await self.bus.publish(self.channel, data)
+
+    async def _listen(self):
+        self.queue = self.bus.subscribe(self.channel)
+        try:
+            while True:
+                yield await self.queue.get()
+        finally:
+            self.bus.unsubscribe(self.channel, self.queue)
+
+def build_client_manager(settings):
+    """Pick the Socket.IO client manager from ``SOCKETIO_MESSAGE_QUEUE``.
+
+    Without a queue URL each worker keeps rooms in its own memory (the
+    socketio default). ``redis://``/``rediss://`` and ``amqp://`` select the
+    broker-backed managers; ``local://`` the in-process bus.
+    """
+    url = settings.SOCKETIO_MESSAGE_QUEUE
+    if not url:
+        return None
+
+    channel = settings.SOCKETIO_CHANNEL
+    scheme = url.split("://", 1)[0]
+    if scheme in ("redis", "rediss"):
+        return socketio.AsyncRedisManager(url, channel=channel)
+    if scheme in ("amqp", "amqps"):
+        return socketio.AsyncAioPikaManager(url, channel=channel)
+    if scheme == "local":
+        return AsyncLocalPubSubManager(channel=channel)
+    raise ValueError(f"Unsupported SOCKETIO_MESSAGE_QUEUE scheme: {scheme}")
+
+def socket_transports(settings):
+    # Long-polling sends each request separately, so every request of a session
+    # has to reach the same worker. Without sticky sessions in front of
+    # several workers only websocket is safe.
+    if settings.SOCKETIO_MESSAGE_QUEUE and not settings.SOCKETIO_STICKY_SESSIONS:
+        return ["websocket"]
+    return ["polling", "websocket"]
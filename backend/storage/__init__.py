@@ -0,0 +1,52 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from .base import Storage
+
+LOCAL_PREFIX = "images/"
+
+storage: Optional[Storage] = None
+
+def init_storage(settings) -> Storage:
+    global storage
+    if settings.STORAGE_BACKEND == "s3":
+        # import เฉพาะตอนใช้ S3 จะได้ไม่ต้องโหลด boto3 ถ้าเก็บไฟล์ในเครื่อง
+        from .s3 import S3Storage
+        storage = S3Storage.from_settings(settings)
+    elif settings.STORAGE_BACKEND == "local":
+        from .local import LocalStorage
+        storage = LocalStorage("images")
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+    return storage
+
+def get_storage() -> Storage:
+    if storage is None:
+        raise Exception("Storage is not initialized")
+    return storage
+
+def image_key(image: Dict[str, str]) -> Optional[str]:
+    """Storage key of a stored image; older rows only have a local ``url``."""
+    if image.get("key"):
+        return image["key"]
+    url = image.get("url")
+    if url and url.startswith(LOCAL_PREFIX):
+        return url[len(LOCAL_PREFIX):]
+    return None
+
+def item_image_key(user_id: int, item_id: int, image_id: str, filename: Optional[str]) -> str:
+    return f"{user_id}/items/{item_id}/{image_id}{os.path.splitext(filename or '')[1]}"
+
+def resolve_image(image: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    """Fill in the URL clients should fetch ``image`` from."""
+    if not image or storage is None:
+        return image
+    key = image_key(image)
+    if key is None:
+        return image
+    return {**image, "url": storage.url(key)}
+
+def resolve_images(images: Optional[List[Dict[str, str]]]) -> Any:
+    if not images:
+        return images
+    return [resolve_image(image) for image in images]
@@ -0,0 +1,57 @@
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, BinaryIO, List, NamedTuple, Optional
+
+import anyio
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    modified: float  # unix timestamp
+
+class Storage(ABC):
+    """Where uploaded images live.
+
+    Keys are relative paths such as ``"3/items/12/<uuid>.jpg"``; only the key
+    is stored in the database and ``url`` turns it into something a client
+    can fetch.
+    """
+
+    @abstractmethod
+    async def save(self, key: str, file: BinaryIO, content_type: Optional[str] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove ``key``; a missing key is not an error."""
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str) -> None:
+        """Remove every key under ``prefix`` (a "directory")."""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        ...
+
+    async def warm_up(self) -> None:
+        """Open connections ahead of the first request (nothing to do locally)."""
+
+    @abstractmethod
+    def _list_pages(self, batch_size: int):
+        """Blocking generator of ``StoredObject`` pages, consumed by ``list_pages``."""
+
+    async def list_pages(self, batch_size: int = 1000) -> AsyncIterator[List[StoredObject]]:
+        """Every stored object, ``batch_size`` at a time, without listing the whole store in memory."""
+        pages = self._list_pages(batch_size)
+        while True:
+            page = await anyio.to_thread.run_sync(next, pages, None)
+            if page is None:
+                return
+            yield page
+
+    async def prune(self, older_than: float) -> int:
+        """Drop empty containers (directories) last touched before ``older_than``; returns how many."""
+        return 0
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlmodel import select
+
+from ..models.storage_deletion import StorageDeletion
+from .base import Storage
+
+logger = logging.getLogger(__name__)
+
+PENDING = "storage_deletions_pending"
+
+def schedule_deletion(session, key: str, prefix: bool = False):
+    """Delete ``key`` (or everything under it) once ``session`` commits.
+
+    The tombstone is part of the caller's transaction: a rollback keeps the
+    files, a commit wakes the deletion queue.
+    """
+    session.add(StorageDeletion(key=key.rstrip("/") if prefix else key, is_prefix=prefix))
+    session.sync_session.info[PENDING] = True
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop(PENDING, False) and deletion_queue is not None:
+        deletion_queue.notify()
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop(PENDING, None)
+
+class DeletionQueue:
+    """Background worker that removes files recorded by ``schedule_deletion``.
+
+    Tombstones live in the database, so nothing is lost on restart and any
+    instance may process them; deletes are idempotent and rows are claimed
+    with ``SKIP LOCKED`` on Postgres. Failures back off exponentially and are
+    given up after ``max_attempts`` (the reconciler still collects the files).
+    """
+
+    def __init__(self, storage: Storage, session_maker, batch_size: int, poll_interval: float,
+                 max_attempts: int, retry_backoff: float, clock=datetime.utcnow):
+        self.storage = storage
+        self.session_maker = session_maker
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.clock = clock
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+
+    def notify(self):
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # ไม่ cancel ระหว่างลบ tombstone ที่เหลือจะถูกทำต่อตอนเริ่มครั้งถัดไป
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                while await self.process() == self.batch_size and not self._closing:
+                    pass
+            except Exception:
+                logger.exception("Processing storage deletions failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def process(self) -> int:
+        """Handle one batch of due tombstones; returns how many were picked up."""
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(StorageDeletion)
+                .where(StorageDeletion.next_attempt_at <= self.clock())
+                .order_by(StorageDeletion.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            tombstones = result.scalars().all()
+            for tombstone in tombstones:
+                await self._delete(session, tombstone)
+            await session.commit()
+            return len(tombstones)
+
+    async def _delete(self, session, tombstone: StorageDeletion):
+        try:
+            if tombstone.is_prefix:
+                await self.storage.delete_prefix(tombstone.key)
+            else:
+                await self.storage.delete(tombstone.key)
+        except Exception as e:
+            tombstone.attempts += 1
+            if tombstone.attempts >= self.max_attempts:
+                logger.exception("Giving up deleting %s after %d attempts", tombstone.key, tombstone.attempts)
+                await session.delete(tombstone)
+                return
+            logger.warning("Deleting %s failed (attempt %d): %s", tombstone.key, tombstone.attempts, e)
+            tombstone.last_error = str(e)[:500]
+            tombstone.next_attempt_at = self.clock() + timedelta(seconds=self.retry_backoff * 2 ** (tombstone.attempts - 1))
+            return
+        await session.delete(tombstone)
+
+# Global DeletionQueue instance
+deletion_queue: Optional[DeletionQueue] = None
+
+def init_deletion_queue(settings, storage: Storage, session_maker) -> DeletionQueue:
+    global deletion_queue
+    deletion_queue = DeletionQueue(
+        storage,
+        session_maker,
+        batch_size=settings.STORAGE_DELETE_BATCH_SIZE,
+        poll_interval=settings.STORAGE_DELETE_POLL_SECONDS,
+        max_attempts=settings.STORAGE_DELETE_MAX_ATTEMPTS,
+        retry_backoff=settings.STORAGE_DELETE_RETRY_BACKOFF_SECONDS,
+    )
+    return deletion_queue
+
+def start_deletion_queue():
+    if deletion_queue is None:
+        raise Exception("DeletionQueue is not initialized")
+    deletion_queue.start()
+
+async def stop_deletion_queue():
+    if deletion_queue is not None:
+        await deletion_queue.stop()
+
+def get_deletion_queue() -> DeletionQueue:
+    if deletion_queue is None:
+        raise Exception("DeletionQueue is not initialized")
+    return deletion_queue
@@ -0,0 +1,106 @@
+import os
+import shutil
+from typing import BinaryIO, Optional
+
+import anyio
+
+from .base import Storage, StoredObject
+
+class LocalStorage(Storage):
+    """Files under a local directory, served by ``ImageFiles`` at ``/images``."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if os.path.commonpath([os.path.abspath(path), os.path.abspath(self.root)]) != os.path.abspath(self.root):
+            raise ValueError(f"Key escapes the storage root: {key}")
+        return path
+
+    async def save(self, key: str, file: BinaryIO, content_type: Optional[str] = None) -> None:
+        await anyio.to_thread.run_sync(self._save, self.path(key), file)
+
+    @staticmethod
+    def _save(path: str, file: BinaryIO):
+        for attempt in range(2):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                destination = open(path, "wb")
+            except FileNotFoundError:
+                # โฟลเดอร์ว่างถูกลบไประหว่างนี้ (ลบรูปสุดท้ายพร้อมกัน) ให้สร้างใหม่อีกครั้ง
+                if attempt:
+                    raise
+                continue
+            with destination:
+                shutil.copyfileobj(file, destination)
+            return
+
+    async def exists(self, key: str) -> bool:
+        return await anyio.to_thread.run_sync(os.path.isfile, self.path(key))
+
+    async def delete(self, key: str) -> None:
+        await anyio.to_thread.run_sync(self._delete, self.path(key))
+
+    def _delete(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        # ลบโฟลเดอร์ที่ว่างแล้วไล่ขึ้นไปจนถึง root
+        root = os.path.abspath(self.root)
+        directory = os.path.dirname(os.path.abspath(path))
+        while directory != root and directory.startswith(root + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        await anyio.to_thread.run_sync(lambda: shutil.rmtree(self.path(prefix), ignore_errors=True))
+
+    def url(self, key: str) -> str:
+        # รูปแบบเดิมที่แอปใช้อยู่: path แบบ relative ต่อจาก BASE_URL
+        return f"{self.root}/{key}"
+
+    def _list_pages(self, batch_size: int):
+        page = []
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    info = entry.stat()
+                    key = os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+                    page.append(StoredObject(key, info.st_size, info.st_mtime))
+                    if len(page) >= batch_size:
+                        yield page
+                        page = []
+        if page:
+            yield page
+
+    async def prune(self, older_than: float) -> int:
+        return await anyio.to_thread.run_sync(self._prune, older_than)
+
+    def _prune(self, older_than: float) -> int:
+        removed = set()
+        for directory, subdirectories, files in os.walk(self.root, topdown=False):
+            if directory == self.root or files:
+                continue
+            # การลบโฟลเดอร์ลูกทำให้ mtime ของโฟลเดอร์แม่เป็นเวลาปัจจุบัน จึงนับว่าเก่าถ้าลูกทุกตัวถูกลบในรอบนี้
+            emptied = bool(subdirectories) and all(os.path.join(directory, name) in removed for name in subdirectories)
+            try:
+                if emptied or os.stat(directory).st_mtime < older_than:
+                    os.rmdir(directory)
+                    removed.add(directory)
+            except OSError:
+                # ยังมีโฟลเดอร์ย่อยที่ไม่ได้ลบ หรือมีไฟล์เพิ่งถูกเขียนลงมา
+                pass
+        return len(removed)
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlmodel import select
+
+from . import image_key
+from .base import Storage, StoredObject
+
+logger = logging.getLogger(__name__)
+
+ITEM_KEY = re.compile(r"^\d+/items/(\d+)/[^/]+$")
+PROFILE_KEY = re.compile(r"^(\d+)/[^/]+$")
+CATEGORY_KEY = re.compile(r"^categories/(\d+)/[^/]+$")
+# ไฟล์ที่ ImageFiles เลือกส่งแทนต้นฉบับ (.webp/.avif, .br/.gz) นับว่าใช้งานอยู่ถ้าต้นฉบับยังถูกอ้างถึง
+ENCODED_SUFFIXES = (".br", ".gz")
+
+def image_stem(key: str) -> str:
+    """``3/items/5/<uuid>`` for the original and all its variants."""
+    for suffix in ENCODED_SUFFIXES:
+        if key.endswith(suffix):
+            key = key[: -len(suffix)]
+            break
+    return os.path.splitext(key)[0]
+
+class ImageReconciler:
+    """Deletes stored images that no row references any more.
+
+    The store is listed one page at a time and each page is checked with
+    at most three primary-key lookups (items, users, categories) for the
+    rows its keys belong to, so memory stays bounded by the page size.
+    Objects younger than the grace period are left alone: an upload is
+    written before its row is committed.
+    """
+
+    def __init__(self, storage: Storage, session_maker, grace_seconds: float, batch_size: int, clock=time.time):
+        self.storage = storage
+        self.session_maker = session_maker
+        self.grace_seconds = grace_seconds
+        self.batch_size = batch_size
+        self.clock = clock
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    async def referenced_stems(self, session, keys: Iterable[str]) -> Set[str]:
+        # import ตรงนี้เพื่อไม่ให้ storage ผูกกับ models ตอน import (models ใช้ resolve_image จาก storage)
+        from ..models.category import Category
+        from ..models.items import Item
+        from ..models.user import User
+
+        item_ids, user_ids, category_ids = set(), set(), set()
+        for key in keys:
+            if match := ITEM_KEY.match(key):
+                item_ids.add(int(match.group(1)))
+            elif match := CATEGORY_KEY.match(key):
+                category_ids.add(int(match.group(1)))
+            elif match := PROFILE_KEY.match(key):
+                user_ids.add(int(match.group(1)))
+
+        images: List[Dict[str, str]] = []
+        if item_ids:
+            result = await session.execute(select(Item.images).where(Item.id.in_(item_ids)))
+            images.extend(image for item_images in result.scalars() for image in (item_images or []))
+        if user_ids:
+            result = await session.execute(select(User.profile_image).where(User.id.in_(user_ids)))
+            images.extend(image for image in result.scalars() if image)
+        if category_ids:
+            result = await session.execute(select(Category.image).where(Category.id.in_(category_ids)))
+            images.extend(image for image in result.scalars() if image)
+        return {image_stem(key) for key in map(image_key, images) if key}
+
+    async def run(self, dry_run: bool = False) -> Dict[str, Any]:
+        async with self._lock:
+            started = self.clock()
+            cutoff = started - self.grace_seconds
+            report = {
+                "dry_run": dry_run,
+                "scanned": 0,
+                "scanned_bytes": 0,
+                "orphans": 0,
+                "deleted": 0,
+                "reclaimed_bytes": 0,
+                "in_grace_period": 0,
+                "unrecognized": 0,
+                "errors": 0,
+                "pruned_directories": 0,
+            }
+            async for page in self.storage.list_pages(self.batch_size):
+                await self._reconcile_page(page, cutoff, dry_run, report)
+            if not dry_run:
+                report["pruned_directories"] = await self.storage.prune(cutoff)
+            report["duration_seconds"] = round(self.clock() - started, 3)
+            report["finished_at"] = self.clock()
+            self.last_report = report
+            logger.info("Image reconciliation: %s", report)
+            return report
+
+    async def _reconcile_page(self, page: List[StoredObject], cutoff: float, dry_run: bool, report: Dict[str, Any]):
+        report["scanned"] += len(page)
+        report["scanned_bytes"] += sum(obj.size for obj in page)
+        recognized = [
+            obj for obj in page
+            if ITEM_KEY.match(obj.key) or CATEGORY_KEY.match(obj.key) or PROFILE_KEY.match(obj.key)
+        ]
+        report["unrecognized"] += len(page) - len(recognized)
+        # อ่านจาก primary เสมอ replica ที่ตามไม่ทันอาจทำให้ลบรูปที่เพิ่งบันทึก
+        async with self.session_maker() as session:
+            referenced = await self.referenced_stems(session, (obj.key for obj in recognized))
+
+        for obj in recognized:
+            if image_stem(obj.key) in referenced:
+                continue
+            if obj.modified > cutoff:
+                report["in_grace_period"] += 1
+                continue
+            report["orphans"] += 1
+            if dry_run:
+                report["reclaimed_bytes"] += obj.size
+                continue
+            try:
+                await self.storage.delete(obj.key)
+            except Exception:
+                report["errors"] += 1
+                logger.exception("Failed to delete orphaned image %s", obj.key)
+                continue
+            report["deleted"] += 1
+            report["reclaimed_bytes"] += obj.size
+
+    async def _run_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("Image reconciliation failed")
+
+    def start(self, interval: float):
+        if self._task is None and interval > 0:
+            self._task = asyncio.create_task(self._run_periodically(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+reconciler: Optional[ImageReconciler] = None
+reconcile_interval = 0
+
+def init_reconciler(settings, storage: Storage, session_maker) -> ImageReconciler:
+    global reconciler, reconcile_interval
+    reconciler = ImageReconciler(storage, session_maker, settings.IMAGE_GC_GRACE_SECONDS, settings.IMAGE_GC_BATCH_SIZE)
+    reconcile_interval = settings.IMAGE_GC_INTERVAL_SECONDS
+    return reconciler
+
+def get_reconciler() -> ImageReconciler:
+    if reconciler is None:
+        raise Exception("ImageReconciler is not initialized")
+    return reconciler
+
+def start_reconciler():
+    if reconciler is not None:
+        reconciler.start(reconcile_interval)
+
+async def stop_reconciler():
+    if reconciler is not None:
+        await reconciler.stop()
@@ -0,0 +1,150 @@
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Optional, Tuple
+
+import anyio
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from .base import Storage, StoredObject
+
+# S3 กำหนดให้ทุก part ยกเว้น part สุดท้ายมีขนาดอย่างน้อย 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_CACHED_URLS = 10000
+
+class S3Storage(Storage):
+    """Images in an S3-compatible bucket (AWS S3, MinIO, ...).
+
+    boto3 is synchronous, so calls run in worker threads; the client is
+    shared and keeps a pool of up to ``max_pool_connections`` connections.
+    Uploads bigger than one part are streamed as a multipart upload, one
+    part in memory at a time.
+    """
+
+    def __init__(self, client, bucket: str, part_size: int = 8 * 1024 * 1024,
+                 url_expires: int = 3600, public_base_url: Optional[str] = None, clock=time.time):
+        self.client = client
+        self.bucket = bucket
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.url_expires = url_expires
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        self.clock = clock
+        self._urls: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    @classmethod
+    def from_settings(cls, settings) -> "S3Storage":
+        client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            config=Config(
+                max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": 3, "mode": "standard"},
+                # MinIO และ S3-compatible ส่วนใหญ่ต้องใช้ path-style
+                s3={"addressing_style": "path" if settings.S3_ENDPOINT_URL else "auto"},
+                signature_version="s3v4",
+            ),
+        )
+        return cls(
+            client,
+            settings.S3_BUCKET,
+            part_size=settings.S3_MULTIPART_CHUNK_SIZE,
+            url_expires=settings.S3_PRESIGNED_URL_EXPIRES,
+            public_base_url=settings.S3_PUBLIC_BASE_URL,
+        )
+
+    async def save(self, key: str, file: BinaryIO, content_type: Optional[str] = None) -> None:
+        extra = {"ContentType": content_type} if content_type else {}
+        first = await anyio.to_thread.run_sync(file.read, self.part_size)
+        if len(first) < self.part_size:
+            await anyio.to_thread.run_sync(lambda: self.client.put_object(Bucket=self.bucket, Key=key, Body=first, **extra))
+            return
+
+        upload = await anyio.to_thread.run_sync(
+            lambda: self.client.create_multipart_upload(Bucket=self.bucket, Key=key, **extra)
+        )
+        upload_id = upload["UploadId"]
+        parts = []
+        try:
+            chunk = first
+            while chunk:
+                part_number = len(parts) + 1
+                response = await anyio.to_thread.run_sync(lambda: self.client.upload_part(
+                    Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=chunk,
+                ))
+                parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+                chunk = await anyio.to_thread.run_sync(file.read, self.part_size)
+            await anyio.to_thread.run_sync(lambda: self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts},
+            ))
+        except BaseException:
+            # ไม่ปล่อย part ที่อัปโหลดค้างไว้ใน bucket (S3 คิดค่าพื้นที่ part เหล่านี้ด้วย)
+            await anyio.to_thread.run_sync(lambda: self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+            ))
+            raise
+
+    async def warm_up(self) -> None:
+        # TLS handshake และ credential lookup เกิดตอนเรียกครั้งแรก และยืนยันว่า bucket มีอยู่จริง
+        await anyio.to_thread.run_sync(lambda: self.client.head_bucket(Bucket=self.bucket))
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await anyio.to_thread.run_sync(lambda: self.client.head_object(Bucket=self.bucket, Key=key))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    async def delete(self, key: str) -> None:
+        await anyio.to_thread.run_sync(lambda: self.client.delete_object(Bucket=self.bucket, Key=key))
+
+    async def delete_prefix(self, prefix: str) -> None:
+        await anyio.to_thread.run_sync(self._delete_prefix, prefix.rstrip("/") + "/")
+
+    def _delete_prefix(self, prefix: str):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            objects = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+            if not objects:
+                continue
+            # Quiet ตัดรายการที่ลบสำเร็จออก แต่ object ที่ลบไม่ได้ยังอยู่ใน Errors
+            response = self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True})
+            errors = response.get("Errors", [])
+            if errors:
+                first = errors[0]
+                raise OSError(
+                    f"Could not delete {len(errors)} of {len(objects)} objects under {prefix}: "
+                    f"{first.get('Key')}: {first.get('Code')} {first.get('Message')}"
+                )
+
+    def url(self, key: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url}/{key}"
+        # ใช้ URL เดิมซ้ำครึ่งหนึ่งของอายุ เพื่อให้ browser cache รูปได้ (URL ใหม่ = cache miss)
+        now = self.clock()
+        cached = self._urls.get(key)
+        if cached and now - cached[1] < self.url_expires / 2:
+            return cached[0]
+        url = self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=self.url_expires,
+        )
+        self._urls[key] = (url, now)
+        self._urls.move_to_end(key)
+        if len(self._urls) > MAX_CACHED_URLS:
+            self._urls.popitem(last=False)
+        return url
+
+    def _list_pages(self, batch_size: int):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, PaginationConfig={"PageSize": min(batch_size, 1000)}):
+            objects = [
+                StoredObject(obj["Key"], obj["Size"], obj["LastModified"].timestamp())
+                for obj in page.get("Contents", [])
+            ]
+            if objects:
+                yield objects
@@ -2,6 +2,23 @@ import sys
 import pathlib
 sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent.parent))
 
+import os
+# ค่าตั้งต้นสำหรับรันเทสต์โดยไม่ต้องมีไฟล์ .env (routers อ่าน settings ตอน import)
+for key, value in {
+    "DATABASE_URL": "sqlite+aiosqlite:///./test-data/test-sqlalchemy.db",
+    "MONGO_URI": "mongodb://localhost:27017",
+    "SECRET_KEY": "test-secret",
+    "SMTP_SERVER": "localhost",
+    "SMTP_PORT": "1025",
+    "SMTP_USER": "test",
+    "SMTP_PASSWORD": "test",
+    "EMAILS_FROM_EMAIL": "noreply@example.com",
+    "EMAILS_FROM_NAME": "HandByHand",
+    "PROD": "false",
+    "BASE_URL": "http://localhost:8000",
+}.items():
+    os.environ.setdefault(key, value)
+
 import pytest
 import pytest_asyncio
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
@@ -10,6 +27,8 @@ from sqlmodel import SQLModel
 from backend.models.user import User
 from backend.models.items import Item
 from backend.models.exchanges import Exchange
+from backend.models.category import Category
+from backend.models.storage_deletion import StorageDeletion
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -30,3 +49,62 @@ async def async_session(async_engine):
     )
     async with async_session_maker() as session:
         yield session
+
+@pytest.fixture
+def session_maker(async_engine):
+    return sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+@pytest.fixture
+def local_storage(tmp_path):
+    from backend import storage as storage_module
+    from backend.storage.local import LocalStorage
+
+    previous = storage_module.storage
+    storage_module.storage = LocalStorage(str(tmp_path))
+    yield storage_module.storage
+    storage_module.storage = previous
+
+@pytest.fixture
+def seed_item(async_session):
+    """``await seed_item(storage, ["a.jpg"])`` adds an owner and an item.
+
+    Each file is saved to ``storage`` under the item's prefix and listed in
+    ``item.images``; without files the item has no images.
+    """
+    import io
+
+    async def seed(storage=None, filenames=()):
+        user = User(name="Owner", email="owner@example.com", hashed_password="hashedpassword")
+        async_session.add(user)
+        await async_session.commit()
+        item = Item(title="Item", owner_id=user.id, images=[])
+        async_session.add(item)
+        await async_session.commit()
+        for filename in filenames:
+            key = f"{user.id}/items/{item.id}/{filename}"
+            await storage.save(key, io.BytesIO(b"jpeg"))
+            item.images = [*item.images, {"id": filename, "key": key}]
+        await async_session.commit()
+        return user, item
+    return seed
+
+@pytest.fixture
+def settings():
+    from backend.core.config import Settings
+    # ไม่อ่าน .env ของเครื่องที่รันเทสต์ ใช้แค่ค่าที่ตั้งไว้ข้างบน
+    return Settings(_env_file=None)
+
+@pytest.fixture
+def assert_max_queries():
+    """``with assert_max_queries(n):`` fails if the block runs more than n queries."""
+    from contextlib import contextmanager
+    from backend.utils.query_stats import count_queries
+
+    @contextmanager
+    def check(limit: int):
+        with count_queries() as stats:
+            yield stats
+        assert stats.total_count <= limit, (
+            f"expected at most {limit} queries, got {stats.total_count}:\n" + "\n".join(stats.statements)
+        )
+    return check
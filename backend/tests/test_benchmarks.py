@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from benchmarks import harness
+from benchmarks.dataset import DatabaseNotEmpty, item_count, seed_dataset
+from benchmarks.run import parse_size, run, size_label
+
+def test_sizes_round_trip():
+    assert [parse_size(text) for text in ("1k", "100k", "1m", "250")] == [1_000, 100_000, 1_000_000, 250]
+    assert [size_label(size) for size in (1_000, 100_000, 1_000_000, 250)] == ["1k", "100k", "1m", "250"]
+
+@pytest.mark.asyncio
+async def test_suite_runs_on_a_small_dataset(tmp_path):
+    results = await run([60], url=f"sqlite+aiosqlite:///{tmp_path / 'bench.db'}", min_time=0.001, repeats=1, log=lambda _: None)
+    assert {"item_read[page=20]", "exchange_reads[20+20]", "create_access_token", "feed_statements",
+            "get_current_user[60]", "get_items[60]", "get_items[search][60]"} <= set(results)
+    assert all(result["median_us"] > 0 for result in results.values())
+
+@pytest.mark.asyncio
+async def test_seeding_refuses_a_database_with_other_data(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        with pytest.raises(DatabaseNotEmpty, match="--reseed"):
+            await seed_dataset(engine, 40)
+        assert await item_count(engine) == 0
+
+        await seed_dataset(engine, 40, reseed=True)
+        assert await item_count(engine) == 40
+        await seed_dataset(engine, 40)  # จำนวนตรงแล้ว ใช้ซ้ำได้โดยไม่ต้อง reseed
+    finally:
+        await engine.dispose()
+
+def test_compare_splits_regressions_and_improvements():
+    baseline = {"a": {"median_us": 100}, "b": {"median_us": 100}, "c": {"median_us": 100}, "gone": {"median_us": 1}}
+    current = {"a": {"median_us": 130}, "b": {"median_us": 110}, "c": {"median_us": 50}}
+    regressions, improvements = harness.compare(baseline, current, tolerance=0.15)
+    assert regressions == ["a: 100.0 us -> 130.0 us (+30%)"]
+    assert improvements == ["c: 100.0 us -> 50.0 us (-50%)"]
@@ -0,0 +1,210 @@
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+from backend.db import message_writer, mongodb
+from backend.db.message_writer import MessageWriter, chat_updates
+from backend.db.mongodb import MongoDB
+from backend.models.user import User
+from backend.router.chat import chat_pair_key, get_chat_sessions, mark_chat_read, message_page_query
+from backend.utils.chat_messages import build_message, other_participant
+
+@pytest.mark.asyncio
+async def test_mongodb_client_uses_configured_pool(settings):
+    settings.MONGO_MAX_POOL_SIZE = 20
+    settings.MONGO_MIN_POOL_SIZE = 2
+    settings.MONGO_SOCKET_TIMEOUT_MS = 3000
+
+    mongodb = MongoDB(settings)
+    mongodb.connect()
+    try:
+        pool_options = mongodb.client.options.pool_options
+        assert pool_options.max_pool_size == 20
+        assert pool_options.min_pool_size == 2
+        assert pool_options.socket_timeout == 3.0
+        assert mongodb.get_collection("chats").name == "chats"
+    finally:
+        mongodb.disconnect()
+
+    assert mongodb.db is None
+
+def test_message_page_query_defaults_to_latest_page():
+    chat_id = ObjectId()
+
+    query, sort = message_page_query(chat_id, None, None)
+    assert query == {"chat_id": chat_id}
+    assert sort == [("timestamp", DESCENDING), ("_id", DESCENDING)]
+
+def test_message_page_query_cursors():
+    chat_id = ObjectId()
+    cursor = datetime(2024, 10, 1, 12, 0, 0)
+
+    query, sort = message_page_query(chat_id, cursor, None)
+    assert query == {"chat_id": chat_id, "timestamp": {"$lt": cursor}}
+    assert sort == [("timestamp", DESCENDING), ("_id", DESCENDING)]
+
+    query, sort = message_page_query(chat_id, None, cursor)
+    assert query == {"chat_id": chat_id, "timestamp": {"$gt": cursor}}
+    assert sort == [("timestamp", ASCENDING), ("_id", ASCENDING)]
+
+def test_message_page_query_breaks_timestamp_ties_by_id():
+    chat_id, before_id, after_id = ObjectId(), ObjectId(), ObjectId()
+    cursor = datetime(2024, 10, 1, 12, 0, 0)
+
+    query, _ = message_page_query(chat_id, cursor, None, before_id=before_id)
+    assert query == {"chat_id": chat_id, "$or": [
+        {"timestamp": {"$lt": cursor}},
+        {"timestamp": cursor, "_id": {"$lt": before_id}},
+    ]}
+
+    query, sort = message_page_query(chat_id, cursor, cursor, before_id=before_id, after_id=after_id)
+    assert query["$and"] == [
+        {"$or": [{"timestamp": {"$lt": cursor}}, {"timestamp": cursor, "_id": {"$lt": before_id}}]},
+        {"$or": [{"timestamp": {"$gt": cursor}}, {"timestamp": cursor, "_id": {"$gt": after_id}}]},
+    ]
+    assert sort[0] == ("timestamp", DESCENDING)
+
+def test_live_message_timestamp_round_trips_as_a_cursor():
+    from backend.socket_events import message_payload
+
+    message_data = build_message(ObjectId(), 1, [1, 2], "hi", "text")
+    # Mongo ตัดเวลาเหลือระดับมิลลิวินาที ค่าที่ส่งสดต้องตรงกับค่าที่เก็บไว้
+    assert message_data["timestamp"].microsecond % 1000 == 0
+    payload = message_payload(message_data)
+    cursor = datetime.fromisoformat(payload["timestamp"])
+    query, _ = message_page_query(message_data["chat_id"], cursor, None, before_id=ObjectId(payload["_id"]))
+    assert query["$or"][1] == {"timestamp": message_data["timestamp"], "_id": {"$lt": message_data["_id"]}}
+
+def test_chat_pair_key_is_order_independent():
+    assert chat_pair_key(7, 3) == chat_pair_key(3, 7) == "3:7"
+    assert other_participant([3, 7], 3) == 7
+    assert other_participant([5, 5], 5) == 5
+
+class ChatsCollection:
+    def __init__(self, *chats):
+        self.chats = {chat["_id"]: chat for chat in chats}
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+        chat = self.chats.get(query["_id"])
+        matched = chat is not None and query["participants"] in chat["participants"]
+        return SimpleNamespace(matched_count=int(matched))
+
+@pytest.fixture
+def chats_db(monkeypatch, settings):
+    chat = {"_id": ObjectId(), "participants": [1, 2], "message_count": 3}
+    collection = ChatsCollection(chat)
+    monkeypatch.setattr(mongodb, "mongodb", SimpleNamespace(get_collection=lambda name: collection))
+    writer = MessageWriter(settings)
+    monkeypatch.setattr(message_writer, "message_writer", writer)
+    return chat, collection, writer
+
+@pytest.mark.asyncio
+async def test_mark_chat_read_counts_buffered_messages(chats_db):
+    chat, collection, writer = chats_db
+    writer.submit(build_message(chat["_id"], 2, [1, 2], "not flushed yet", "text"))
+    writer.submit(build_message(chat["_id"], 1, [1, 2], "my own", "text"))
+    writer.submit(build_message(ObjectId(), 2, [1, 2], "other chat", "text"))
+
+    await mark_chat_read(str(chat["_id"]), current_user=User(id=1))
+
+    [(query, [stage])] = collection.updates
+    assert query == {"_id": chat["_id"], "participants": 1}
+    # ข้อความของอีกฝ่ายที่ยังค้างใน writer นับว่าอ่านแล้ว ของตัวเองจะถูกนับตอน flush
+    assert stage["$set"]["read_counts.1"] == {"$add": [{"$ifNull": ["$message_count", 0]}, 1]}
+
+@pytest.mark.asyncio
+async def test_mark_chat_read_rejects_outsiders_and_bad_ids(chats_db):
+    chat, _, _ = chats_db
+    for chat_id, user_id, status_code in ((str(chat["_id"]), 3, 404), (str(ObjectId()), 1, 404), ("nope", 1, 400)):
+        with pytest.raises(HTTPException) as error:
+            await mark_chat_read(chat_id, current_user=User(id=user_id))
+        assert error.value.status_code == status_code
+
+def evaluate(expression, doc):
+    """The few aggregation operators the inbox projection uses."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = doc
+        for part in expression[1:].split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+    if isinstance(expression, dict):
+        [(operator, arguments)] = expression.items()
+        values = [evaluate(argument, doc) for argument in arguments]
+        if operator == "$ifNull":
+            return values[0] if values[0] is not None else values[1]
+        if operator == "$subtract":
+            return values[0] - values[1]
+        if operator == "$max":
+            return max(values)
+        if operator == "$add":
+            return sum(values)
+        raise NotImplementedError(operator)
+    return expression
+
+class InboxCollection:
+    def __init__(self, *chats):
+        self.chats = list(chats)
+
+    def aggregate(self, pipeline):
+        match, sort, limit, project = (stage for stage in pipeline)
+        chats = [chat for chat in self.chats if match["$match"]["participants"] in chat["participants"]]
+        chats.sort(key=lambda chat: chat["last_message_at"], reverse=True)
+        projected = [
+            {"_id": chat["_id"], **{
+                key: chat.get(key) if value == 1 else evaluate(value, chat)
+                for key, value in project["$project"].items()
+            }}
+            for chat in chats[:limit["$limit"]]
+        ]
+        async def to_list(length):
+            return projected
+        return SimpleNamespace(to_list=to_list)
+
+    async def update_one(self, query, pipeline):
+        matched = [chat for chat in self.chats if chat["_id"] == query["_id"] and query["participants"] in chat["participants"]]
+        for chat in matched:
+            for path, expression in pipeline[0]["$set"].items():
+                parent, key = path.split(".")
+                chat.setdefault(parent, {})[key] = evaluate(expression, chat)
+        return SimpleNamespace(matched_count=len(matched))
+
+def apply_increments(doc, operation):
+    for path, amount in operation._doc["$inc"].items():
+        *parents, key = path.split(".")
+        target = doc
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[key] = target.get(key, 0) + amount
+
+class NoUsers:
+    async def load_map(self, user_ids):
+        return {}
+
+@pytest.mark.asyncio
+async def test_inbox_unread_counts_are_per_participant(monkeypatch, settings):
+    now = datetime(2024, 10, 1, 12, 0, 0)
+    chat = {"_id": ObjectId(), "participants": [1, 2], "last_message_at": now}
+    legacy = {"_id": ObjectId(), "participants": [1, 3], "last_message_at": datetime(2024, 9, 1)}
+    others = {"_id": ObjectId(), "participants": [2, 3], "last_message_at": now}
+    batch = [build_message(chat["_id"], sender, [1, 2], "hi", "text") for sender in (1, 1, 2, 2, 2)]
+    [operation] = chat_updates(batch, ObjectId())
+    apply_increments(chat, operation)
+    collection = InboxCollection(chat, legacy, others)
+    monkeypatch.setattr(mongodb, "mongodb", SimpleNamespace(get_collection=lambda name: collection))
+    monkeypatch.setattr(message_writer, "message_writer", MessageWriter(settings))
+
+    async def inbox(user_id):
+        sessions = await get_chat_sessions(before=None, limit=20, current_user=User(id=user_id), user_loader=NoUsers())
+        return {session["_id"]: session["unread_count"] for session in sessions}
+
+    # ข้อความที่ตัวเองส่งไม่นับเป็น unread ของตัวเอง
+    assert await inbox(1) == {str(chat["_id"]): 3, str(legacy["_id"]): 0}
+    assert await inbox(2) == {str(chat["_id"]): 2, str(others["_id"]): 0}
+
+    await mark_chat_read(str(chat["_id"]), current_user=User(id=2))
+    assert await inbox(2) == {str(chat["_id"]): 0, str(others["_id"]): 0}
+    assert (await inbox(1))[str(chat["_id"])] == 3
@@ -0,0 +1,33 @@
+import pytest
+from backend import db
+
+def test_engine_options_from_settings(settings):
+    settings.DATABASE_URL = "postgresql+asyncpg://user:pass@db:5432/app"
+    settings.DB_POOL_SIZE = 5
+    settings.DB_STATEMENT_TIMEOUT_MS = 2000
+    settings.DB_STATEMENT_CACHE_SIZE = 0
+
+    options = db.engine_options(settings)
+
+    assert options["echo"] is False
+    assert options["pool_size"] == 5
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {
+        "statement_cache_size": 0,
+        "server_settings": {"statement_timeout": "2000"},
+    }
+
+def test_engine_options_skip_asyncpg_args_for_sqlite(settings):
+    assert "connect_args" not in db.engine_options(settings)
+
+@pytest.mark.asyncio
+async def test_init_db_builds_session_factory_once(settings):
+    db.init_db(settings)
+    try:
+        factory = db.async_session_maker
+        async for session in db.get_session():
+            assert session.bind is db.engine
+        assert db.async_session_maker is factory
+        assert db.pool_stats()["checked_out"] == 0
+    finally:
+        await db.close_session()
@@ -0,0 +1,94 @@
+import io
+from datetime import datetime, timedelta
+import pytest
+from sqlmodel import select
+from backend.models.storage_deletion import StorageDeletion
+from backend.router.item import delete_item, delete_item_image
+from backend.storage.deletions import DeletionQueue, schedule_deletion
+from backend.storage.local import LocalStorage
+
+class FlakyStorage(LocalStorage):
+    def __init__(self, root, failures):
+        super().__init__(root)
+        self.failures = failures
+
+    async def delete(self, key):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk is busy")
+        await super().delete(key)
+
+class Clock:
+    def __init__(self):
+        self.now = datetime.utcnow() + timedelta(seconds=1)
+
+    def __call__(self):
+        return self.now
+
+async def tombstones(async_session):
+    return (await async_session.execute(select(StorageDeletion))).scalars().all()
+
+@pytest.mark.asyncio
+async def test_delete_item_defers_file_removal(async_session, session_maker, local_storage, seed_item):
+    user, item = await seed_item(local_storage, ["a.jpg", "b.jpg"])
+    prefix = f"{user.id}/items/{item.id}"
+
+    await delete_item(item.id, session=async_session, current_user=user)
+    # คำขอไม่แตะไฟล์เลย ลบโดย worker หลัง commit
+    assert await local_storage.exists(f"{prefix}/a.jpg")
+    assert [(t.key, t.is_prefix) for t in await tombstones(async_session)] == [(prefix, True)]
+
+    queue = DeletionQueue(local_storage, session_maker, batch_size=10, poll_interval=1, max_attempts=3, retry_backoff=1)
+    assert await queue.process() == 1
+    assert not await local_storage.exists(f"{prefix}/a.jpg")
+    assert await tombstones(async_session) == []
+
+@pytest.mark.asyncio
+async def test_rollback_keeps_files(async_session, local_storage, seed_item):
+    user, item = await seed_item(local_storage, ["a.jpg"])
+    key = item.images[0]["key"]
+    schedule_deletion(async_session, key)
+    await async_session.rollback()
+    assert await tombstones(async_session) == []
+    assert await local_storage.exists(key)
+
+@pytest.mark.asyncio
+async def test_delete_item_image_updates_item(async_session, session_maker, local_storage, seed_item):
+    user, item = await seed_item(local_storage, ["a.jpg", "b.jpg"])
+    first, second = (image["key"] for image in item.images)
+
+    await delete_item_image(item.id, "a.jpg", session=async_session, current_user=user)
+
+    await async_session.refresh(item)
+    assert item.images == [{"id": "b.jpg", "key": second}]
+    queue = DeletionQueue(local_storage, session_maker, batch_size=10, poll_interval=1, max_attempts=3, retry_backoff=1)
+    await queue.process()
+    assert not await local_storage.exists(first)
+    assert await local_storage.exists(second)
+    with pytest.raises(Exception) as error:
+        await delete_item_image(item.id, "a.jpg", session=async_session, current_user=user)
+    assert error.value.status_code == 404
+
+@pytest.mark.asyncio
+async def test_failed_deletions_back_off(tmp_path, async_session, session_maker):
+    storage = FlakyStorage(str(tmp_path), failures=2)
+    await storage.save("1/a.jpg", io.BytesIO(b"jpeg"))
+    schedule_deletion(async_session, "1/a.jpg")
+    await async_session.commit()
+
+    clock = Clock()
+    queue = DeletionQueue(storage, session_maker, batch_size=10, poll_interval=1, max_attempts=5, retry_backoff=10, clock=clock)
+    assert await queue.process() == 1
+    [tombstone] = await tombstones(async_session)
+    await async_session.refresh(tombstone)
+    assert tombstone.attempts == 1
+    assert tombstone.next_attempt_at == clock.now + timedelta(seconds=10)
+    # ยังไม่ถึงเวลา retry
+    assert await queue.process() == 0
+
+    clock.now += timedelta(seconds=10)
+    assert await queue.process() == 1
+    clock.now += timedelta(seconds=20)
+    assert await queue.process() == 1
+    assert not await storage.exists("1/a.jpg")
+    assert await tombstones(async_session) == []
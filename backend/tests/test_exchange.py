@@ -3,6 +3,7 @@ from backend.models.exchanges import Exchange
 from backend.models.items import Item
 from backend.models.user import User
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
 
 @pytest.mark.asyncio
 async def test_create_exchange(async_session: AsyncSession):
@@ -147,3 +148,31 @@ async def test_delete_exchange(async_session: AsyncSession):
     
     exchange_from_db = await async_session.get(Exchange, exchange.id)
     assert exchange_from_db is None
+
+@pytest.mark.asyncio
+async def test_exchange_updated_at_moves_on_status_change(async_session: AsyncSession):
+    user1 = User(name="User 1", email="user1@example.com", hashed_password="hashedpassword")
+    user2 = User(name="User 2", email="user2@example.com", hashed_password="hashedpassword")
+    async_session.add_all([user1, user2])
+    await async_session.commit()
+
+    item1 = Item(title="Item 1", owner_id=user1.id)
+    async_session.add(item1)
+    await async_session.commit()
+
+    exchange = Exchange(requester_id=user2.id, requested_item_id=item1.id)
+    async_session.add(exchange)
+    await async_session.commit()
+    await async_session.refresh(exchange)
+    created = exchange.updated_at
+
+    # ``since=`` listings rely on updated_at following every change
+    exchange.status = "rejected"
+    await async_session.commit()
+    await async_session.refresh(exchange)
+
+    assert exchange.updated_at > created
+    changed = await async_session.execute(
+        select(Exchange).where(Exchange.updated_at > created)
+    )
+    assert [row.id for row in changed.scalars().all()] == [exchange.id]
@@ -0,0 +1,106 @@
+import gzip
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.image_files import ImageFiles, mount_images, parse_range
+
+IMAGE_NAME = "0b5e2c1e-7a40-4a43-9a35-3f1f0f6c2d11"
+CONTENT = bytes(range(256)) * 4
+
+@pytest.fixture
+def images_dir(tmp_path):
+    (tmp_path / "1" / "items").mkdir(parents=True)
+    (tmp_path / "1" / "items" / f"{IMAGE_NAME}.jpg").write_bytes(CONTENT)
+    return tmp_path
+
+def make_client(images_dir, **options) -> TestClient:
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def fail_on_images(request, call_next):
+        assert not request.url.path.startswith("/images"), "images must not reach the app"
+        return await call_next(request)
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    images = ImageFiles(directory=str(images_dir), cache_max_age=31536000, **options)
+    return TestClient(mount_images(app, images))
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    assert parse_range("bytes=9-1", 100) is None
+
+def test_serves_uuid_images_as_immutable(images_dir):
+    client = make_client(images_dir)
+    response = client.get(f"/images/1/items/{IMAGE_NAME}.jpg")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"].startswith('"')
+
+    not_modified = client.get(f"/images/1/items/{IMAGE_NAME}.jpg", headers={"If-None-Match": response.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    assert client.get("/images/1/items/missing.jpg").status_code == 404
+    assert client.get("/api/ping").json() == {"ok": True}
+
+def test_range_requests(images_dir):
+    client = make_client(images_dir)
+    url = f"/images/1/items/{IMAGE_NAME}.jpg"
+    etag = client.head(url).headers["etag"]
+
+    partial = client.get(url, headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == CONTENT[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+
+    assert client.get(url, headers={"Range": "bytes=10-19", "If-Range": etag}).status_code == 206
+    stale = client.get(url, headers={"Range": "bytes=10-19", "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.content == CONTENT
+
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={len(CONTENT)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+def test_prefers_variants_and_precompressed_files(images_dir):
+    item_dir = images_dir / "1" / "items"
+    (item_dir / f"{IMAGE_NAME}.webp").write_bytes(b"webp")
+    (item_dir / "logo.svg").write_bytes(b"<svg/>")
+    (item_dir / "logo.svg.gz").write_bytes(gzip.compress(b"<svg/>"))
+    client = make_client(images_dir)
+
+    webp = client.get(f"/images/1/items/{IMAGE_NAME}.jpg", headers={"Accept": "image/avif;q=0, image/webp, */*"})
+    assert webp.content == b"webp"
+    assert webp.headers["content-type"] == "image/webp"
+    assert webp.headers["vary"] == "Accept, Accept-Encoding"
+    assert client.get(f"/images/1/items/{IMAGE_NAME}.jpg", headers={"Accept": "image/webp;q=0"}).content == CONTENT
+
+    svg = client.get("/images/1/items/logo.svg", headers={"Accept-Encoding": "gzip"})
+    assert svg.headers["content-encoding"] == "gzip"
+    assert svg.content == b"<svg/>"
+    assert svg.headers["content-type"] == "image/svg+xml"
+    assert "cache-control" in svg.headers and "immutable" not in svg.headers["cache-control"]
+
+def test_x_accel_redirect_mode(images_dir):
+    client = make_client(images_dir, sendfile_header="X-Accel-Redirect", accel_prefix="/protected-images")
+    response = client.get(f"/images/1/items/{IMAGE_NAME}.jpg")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["x-accel-redirect"] == f"/protected-images/1/items/{IMAGE_NAME}.jpg"
+    assert response.headers["cache-control"].endswith("immutable")
+
+def test_rejects_paths_outside_the_directory(images_dir):
+    (images_dir.parent / "secret.txt").write_bytes(b"secret")
+    client = make_client(images_dir)
+    assert client.get("/images/../secret.txt").status_code == 404
+    assert client.post(f"/images/1/items/{IMAGE_NAME}.jpg").status_code == 405
@@ -0,0 +1,20 @@
+from backend.import_profile import LAZY_MODULES, by_package, eager_lazy_modules, parse_importtime, profile_once
+
+OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     jinja2.utils
+import time:       300 |        420 |   jinja2
+import time:        50 |        470 | backend.utils.templates
+"""
+
+def test_parse_importtime():
+    modules = parse_importtime(OUTPUT)
+    assert [module.name for module in modules] == ["jinja2.utils", "jinja2", "backend.utils.templates"]
+    assert modules[1].cumulative_us == 420
+    assert by_package(modules) == {"jinja2": 420, "backend": 50}
+    assert eager_lazy_modules(modules) == ["jinja2"]
+
+def test_app_import_leaves_heavy_dependencies_lazy():
+    # รันใน interpreter ใหม่ เทสต์อื่นในโปรเซสนี้อาจ import pymongo ไปแล้ว
+    modules = profile_once("backend.main")
+    assert any(module.name == "backend.main" for module in modules)
+    assert eager_lazy_modules(modules) == [], f"should load lazily: {LAZY_MODULES}"
@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models.user import User
+from backend.utils.loaders import UserLoader
+
+@pytest.mark.asyncio
+async def test_user_loader_batches_lookups(async_engine, async_session: AsyncSession):
+    users = [User(name=f"User {i}", email=f"loader{i}@example.com", hashed_password="hashedpassword") for i in range(3)]
+    async_session.add_all(users)
+    await async_session.commit()
+    user_ids = [user.id for user in users]
+    async_session.expunge_all()
+
+    statements = []
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+
+    loader = UserLoader(async_session)
+    # Simulates a message list: every message repeats the same participants
+    loaded = await loader.load_many(user_ids * 100 + [999])
+    assert len(statements) == 1
+    assert [user.id for user in loaded[:3]] == user_ids
+    assert loaded[-1] is None
+
+    # Already-resolved ids are served from the loader cache
+    users_by_id = await loader.load_map(user_ids)
+    assert set(users_by_id) == set(user_ids)
+    assert len(statements) == 1
+
+    # Concurrent loads issued in the same tick share one query too
+    await asyncio.gather(loader.load(1000), loader.load(1001))
+    assert len(statements) == 2
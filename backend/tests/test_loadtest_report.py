@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from loadtest.report import compare, summarize
+
+def entry(name, method, requests, failures=0, rps=10.0, p95=100):
+    return SimpleNamespace(
+        name=name, method=method, num_requests=requests, num_failures=failures, total_rps=rps,
+        avg_response_time=p95 / 2, max_response_time=p95 * 2, start_time=0, last_request_timestamp=60,
+        get_response_time_percentile=lambda percent: {0.5: p95 // 2, 0.95: p95, 0.99: p95 * 2}[percent],
+    )
+
+def report(**endpoints):
+    entries = {(name, "GET"): entry(name, "GET", *values) for name, values in endpoints.items()}
+    total = entry("Aggregated", "", sum(e.num_requests for e in entries.values()))
+    return summarize(SimpleNamespace(entries=entries, total=total))
+
+def test_summarize_reports_percentiles_per_endpoint():
+    summary = report(feed=(200, 2, 10.0, 120))
+    assert summary["duration_s"] == 60
+    assert summary["endpoints"]["GET feed"] == {
+        "requests": 200, "failures": 2, "rps": 10.0, "avg_ms": 60.0, "max_ms": 240,
+        "p50_ms": 60, "p95_ms": 120, "p99_ms": 240,
+    }
+
+def test_compare_flags_only_real_regressions():
+    baseline = report(feed=(200, 0, 10.0, 100), detail=(200, 0, 5.0, 50), rare=(10, 0, 0.1, 10))
+    current = report(feed=(200, 0, 9.0, 115), detail=(200, 10, 3.0, 80), rare=(10, 0, 0.1, 500))
+    regressions = compare(baseline, current, tolerance=0.2)
+    # feed อยู่ในเกณฑ์ 20% ส่วน rare มี request น้อยเกินจะเทียบได้
+    assert not any(line.startswith(("GET feed", "GET rare")) for line in regressions)
+    assert "GET detail: p95_ms 50 -> 80" in regressions
+    assert "GET detail: rps 5.0 -> 3.0" in regressions
+    assert "GET detail: failure rate 0.00% -> 5.00%" in regressions
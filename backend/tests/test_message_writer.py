@@ -0,0 +1,184 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from bson import ObjectId
+from backend.db import mongodb
+from backend.db.message_writer import MessageWriter, chat_updates
+from backend.utils.chat_messages import build_message
+from backend.utils.pending_events import take_digest
+
+class RecordingCollection:
+    def __init__(self, failures=0):
+        self.calls = []
+        self.failures = failures
+
+    async def _record(self, method, documents):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("primary stepped down")
+        self.calls.append((method, list(documents)))
+
+    async def insert_many(self, documents, ordered=True):
+        await self._record("insert_many", documents)
+
+    async def bulk_write(self, operations, ordered=True):
+        await self._record("bulk_write", operations)
+
+    async def distinct(self, key, query=None):
+        return []
+
+class RecordingDB:
+    def __init__(self, **collections):
+        self.collections = collections
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+@pytest.fixture
+def recording_db(monkeypatch):
+    db = RecordingDB(
+        messages=RecordingCollection(),
+        chats=RecordingCollection(),
+        presence=RecordingCollection(),
+        pending_events=RecordingCollection(),
+    )
+    monkeypatch.setattr(mongodb, "mongodb", db)
+    return db
+
+def test_chat_updates_fold_batch_per_chat():
+    chat_a, chat_b = ObjectId(), ObjectId()
+    first = build_message(chat_a, 1, [1, 2], "hi", "text")
+    second = build_message(chat_a, 2, [1, 2], "hello", "text")
+    second["timestamp"] = first["timestamp"] + timedelta(seconds=1)
+    third = build_message(chat_b, 1, [1, 3], "yo", "text")
+
+    batch_id = ObjectId()
+    operations = {op._filter["_id"]: op for op in chat_updates([first, second, third], batch_id)}
+    assert operations[chat_a]._filter["applied_batches"] == {"$ne": batch_id}
+    assert operations[chat_a]._doc["$push"]["applied_batches"]["$each"] == [batch_id]
+    operations = {chat_id: op._doc for chat_id, op in operations.items()}
+
+    assert len(operations) == 2
+    assert operations[chat_a]["$inc"] == {"message_count": 2, "read_counts.1": 1, "read_counts.2": 1}
+    assert operations[chat_a]["$set"]["last_message"]["message"] == "hello"
+    assert operations[chat_a]["$max"]["last_message_at"] == second["timestamp"]
+    assert operations[chat_b]["$inc"] == {"message_count": 1, "read_counts.1": 1}
+
+@pytest.mark.asyncio
+async def test_writer_batches_and_drains_on_stop(settings, recording_db):
+    settings.MESSAGE_WRITER_BATCH_SIZE = 2
+    settings.MESSAGE_WRITER_FLUSH_INTERVAL_MS = 60_000
+    writer = MessageWriter(settings)
+    writer.start()
+
+    chat_id = ObjectId()
+    for text in ("one", "two"):
+        writer.submit(build_message(chat_id, 1, [1, 2], text, "text"))
+    await asyncio.sleep(0.01)
+
+    # A full batch is written without waiting for the flush interval
+    inserts = recording_db.collections["messages"].calls
+    assert [len(documents) for _, documents in inserts] == [2]
+
+    writer.submit(build_message(chat_id, 1, [1, 2], "three", "text"))
+    await asyncio.sleep(0.01)
+    assert writer.pending == 1
+
+    await writer.stop()
+    assert [len(documents) for _, documents in inserts] == [2, 1]
+    assert len(recording_db.collections["chats"].calls) == 2
+    assert writer.pending == 0
+
+@pytest.mark.asyncio
+async def test_writer_retries_failed_writes(settings, recording_db):
+    settings.MESSAGE_WRITER_RETRY_BACKOFF_MS = 1
+    recording_db.collections["messages"].failures = 2
+    writer = MessageWriter(settings)
+
+    writer.submit(build_message(ObjectId(), 1, [1, 2], "retry me", "text"))
+    await writer.flush()
+
+    assert len(recording_db.collections["messages"].calls) == 1
+    assert len(recording_db.collections["chats"].calls) == 1
+
+@pytest.mark.asyncio
+async def test_writer_queues_one_pending_entry_per_offline_chat(settings, recording_db):
+    writer = MessageWriter(settings)
+    chat_id = ObjectId()
+    for text in ("one", "two", "three"):
+        writer.submit(build_message(chat_id, 1, [1, 2], text, "text"))
+    await writer.flush()
+
+    [(_, operations)] = recording_db.collections["pending_events"].calls
+    [operation] = operations
+    assert operation._filter == {"user_id": 2, "kind": "chat", "key": str(chat_id)}
+    assert operation._doc["$inc"] == {"count": 3}
+    assert operation._doc["$set"]["latest"]["message"] == "three"
+
+@pytest.mark.asyncio
+async def test_writer_requeues_batch_with_same_id_after_retries(settings, recording_db):
+    settings.MESSAGE_WRITER_MAX_RETRIES = 2
+    settings.MESSAGE_WRITER_RETRY_BACKOFF_MS = 1
+    chats = recording_db.collections["chats"]
+    chats.failures = 2
+    writer = MessageWriter(settings)
+    chat_id = ObjectId()
+    writer.submit(build_message(chat_id, 1, [1, 2], "keep me", "text"))
+
+    await writer.flush()
+    # ยังไม่หาย: รอ flush รอบถัดไป และยังนับเป็นข้อความที่ค้างของแชทนี้
+    assert writer.pending == 1
+    assert writer.buffered_count(chat_id) == 1
+    assert writer.buffered_count(chat_id, exclude_sender=1) == 0
+    [(first_batch_id, _)] = writer._failed
+
+    await writer.flush()
+    assert writer.pending == 0
+    [(_, [operation])] = chats.calls
+    assert operation._filter["applied_batches"] == {"$ne": first_batch_id}
+
+    # batch ใหม่ได้ id ใหม่ ส่วน batch ที่ลองซ้ำใช้ id เดิม จึงไม่ถูกนับซ้ำในแชทที่เขียนไปแล้ว
+    writer.submit(build_message(chat_id, 1, [1, 2], "next", "text"))
+    await writer.flush()
+    assert chats.calls[-1][1][0]._filter["applied_batches"]["$ne"] != first_batch_id
+
+class PendingEventsCollection(RecordingCollection):
+    def __init__(self, entries):
+        super().__init__()
+        self.entries = entries
+        self.deleted = []
+
+    def find(self, query):
+        entries = sorted(self.entries, key=lambda entry: entry["updated_at"], reverse=True)
+        cursor = SimpleNamespace(sort=lambda *args: cursor, limit=lambda count: cursor)
+        async def to_list(length):
+            return entries[:length]
+        cursor.to_list = to_list
+        return cursor
+
+    async def delete_many(self, query):
+        self.deleted.append(query)
+
+@pytest.mark.asyncio
+async def test_take_digest_deletes_only_the_entries_it_read(settings, recording_db):
+    recording_db.settings = settings
+    settings.PENDING_EVENTS_MAX_PER_USER = 2
+    now = datetime(2024, 10, 1, 12, 0, 0)
+    entries = [
+        {"_id": ObjectId(), "user_id": 1, "kind": "exchange", "key": str(index), "count": 1,
+         "status": "pending", "updated_at": now - timedelta(minutes=index)}
+        for index in range(3)
+    ]
+    pending = recording_db.collections["pending_events"] = PendingEventsCollection(entries)
+
+    digest = await take_digest(1)
+    assert [exchange["exchange_id"] for exchange in digest["exchanges"]] == [0, 1]
+    assert digest["truncated"] is True
+
+    # ลบตาม _id และ count ที่อ่านได้ ถ้ามี $inc เข้ามาระหว่างนี้ entry นั้นจะยังอยู่
+    [(_, deletes)] = pending.calls
+    assert [op._filter for op in deletes] == [{"_id": entry["_id"], "count": 1} for entry in entries[:2]]
+    [dropped] = pending.deleted
+    assert dropped["_id"] == {"$nin": [entries[0]["_id"], entries[1]["_id"]]}
+    assert dropped["updated_at"] == {"$lte": entries[1]["updated_at"]}
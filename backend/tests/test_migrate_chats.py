@@ -0,0 +1,111 @@
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from migrate_chats import backfill_inbox_fields, move_embedded_messages
+
+def matches(document, query):
+    for key, condition in query.items():
+        if isinstance(condition, dict) and "$exists" in condition:
+            if (key in document) != condition["$exists"]:
+                return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+class AsyncDocuments:
+    def __init__(self, documents):
+        self.documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class MemoryCollection:
+    """Just enough of a Motor collection for the chat migration."""
+
+    def __init__(self, *documents):
+        self.documents = {document["_id"]: dict(document) for document in documents}
+
+    def find(self, query, projection=None):
+        return AsyncDocuments([dict(document) for document in self.documents.values() if matches(document, query)])
+
+    async def find_one(self, query, projection=None, sort=None):
+        found = [document for document in self.documents.values() if matches(document, query)]
+        for key, direction in reversed(sort or []):
+            found.sort(key=lambda document: document[key], reverse=direction < 0)
+        return dict(found[0]) if found else None
+
+    async def count_documents(self, query):
+        return sum(1 for document in self.documents.values() if matches(document, query))
+
+    async def update_one(self, query, update):
+        document = self.documents[query["_id"]]
+        document.update(update.get("$set", {}))
+        for key in update.get("$unset", {}):
+            document.pop(key, None)
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            # UpdateOne(filter={"_id": ...}, {"$setOnInsert": ...}, upsert=True)
+            message_id = operation._filter["_id"]
+            if message_id not in self.documents:
+                self.documents[message_id] = {"_id": message_id, **operation._doc["$setOnInsert"]}
+
+def memory_db(**collections):
+    return {name: collections.get(name) or MemoryCollection() for name in ("chats", "messages")}
+
+def embedded(sender, receiver, text, timestamp):
+    return {"sender": sender, "receiver": receiver, "message": text, "timestamp": timestamp, "message_type": "text"}
+
+@pytest.mark.asyncio
+async def test_move_embedded_messages_keeps_identical_messages_and_is_rerunnable():
+    sent_at = datetime(2024, 10, 1, 12, 0, 0)
+    chat = {"_id": ObjectId(), "user1": 1, "user2": 2, "messages": [
+        embedded(1, 2, "ok", sent_at),
+        embedded(1, 2, "ok", sent_at),  # ส่งซ้ำในวินาทีเดียวกัน ต้องเก็บทั้งสองข้อความ
+        embedded(2, 1, "👍", sent_at),
+    ]}
+    db = memory_db(chats=MemoryCollection(chat))
+
+    await move_embedded_messages(db)
+    moved = sorted(db["messages"].documents.values(), key=lambda message: message["_id"])
+    assert [message["message"] for message in moved] == ["ok", "ok", "👍"]
+    assert all(message["chat_id"] == chat["_id"] for message in moved)
+    assert "messages" not in db["chats"].documents[chat["_id"]]
+
+    # migration ที่ถูกขัดจังหวะก่อน $unset ต้องรันซ้ำได้โดยไม่เกิดข้อความซ้ำ
+    db["chats"].documents[chat["_id"]]["messages"] = chat["messages"]
+    await move_embedded_messages(db)
+    assert len(db["messages"].documents) == 3
+
+@pytest.mark.asyncio
+async def test_backfill_inbox_fields_treats_history_as_read():
+    created_at = datetime(2024, 9, 1)
+    chat = {"_id": ObjectId(), "user1": 7, "user2": 3, "created_at": created_at}
+    empty = {"_id": ObjectId(), "user1": 1, "user2": 2, "created_at": created_at}
+    done = {"_id": ObjectId(), "user1": 1, "user2": 3, "participants": [1, 3], "message_count": 9}
+    messages = [
+        {"_id": ObjectId(), "chat_id": chat["_id"], **embedded(7, 3, f"message {minute}", datetime(2024, 10, 1, 12, minute))}
+        for minute in range(3)
+    ]
+    db = memory_db(chats=MemoryCollection(chat, empty, done), messages=MemoryCollection(*messages))
+
+    await backfill_inbox_fields(db)
+
+    backfilled = db["chats"].documents[chat["_id"]]
+    assert backfilled["participants"] == [3, 7]
+    assert backfilled["message_count"] == 3
+    assert backfilled["read_counts"] == {"3": 3, "7": 3}
+    assert backfilled["last_message"]["message"] == "message 2"
+    assert backfilled["last_message_at"] == datetime(2024, 10, 1, 12, 2)
+
+    without_messages = db["chats"].documents[empty["_id"]]
+    assert without_messages["message_count"] == 0 and without_messages["last_message"] is None
+    assert without_messages["last_message_at"] == created_at
+    # แชทที่ backfill ไปแล้วไม่ถูกแตะ
+    assert db["chats"].documents[done["_id"]] == done
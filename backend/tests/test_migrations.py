@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from backend.db import migrations
+
+@pytest.mark.asyncio
+async def test_upgrade_is_idempotent_and_matches_models(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'migrations.db'}")
+    try:
+        assert await migrations.upgrade(engine) == [migration.VERSION for migration in migrations.MIGRATIONS]
+        assert await migrations.upgrade(engine) == []
+
+        def index_names(sync_conn):
+            inspector = inspect(sync_conn)
+            return {
+                index["name"]
+                for table in inspector.get_table_names()
+                for index in inspector.get_indexes(table)
+            }
+
+        async with engine.connect() as conn:
+            created = await conn.run_sync(index_names)
+        expected = {index.name for table in SQLModel.metadata.sorted_tables for index in table.indexes}
+        assert expected <= created
+    finally:
+        await engine.dispose()
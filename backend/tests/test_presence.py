@@ -0,0 +1,72 @@
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from backend.db import mongodb
+from backend.utils.presence import PresenceTracker, get_presence, presence_info
+
+class PresenceCollection:
+    def __init__(self, *docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.updates = []
+        self.bulk_writes = []
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        self.updates.append((query, update, return_document))
+        return self.docs.get(query["_id"])
+
+    async def bulk_write(self, operations, ordered=True):
+        self.bulk_writes.append(operations)
+
+    def find(self, query):
+        docs = [doc for user_id, doc in self.docs.items() if user_id in query["_id"]["$in"]]
+        async def to_list(length):
+            return docs
+        return SimpleNamespace(to_list=to_list)
+
+@pytest.fixture
+def presence_db(monkeypatch):
+    collection = PresenceCollection()
+    monkeypatch.setattr(mongodb, "mongodb", SimpleNamespace(get_collection=lambda name: collection))
+    return collection
+
+def test_only_live_sockets_count_as_online():
+    now = datetime(2024, 10, 1, 12, 0, 0)
+    doc = {"_id": 1, "last_seen": now, "sockets": [{"sid": "a", "expires_at": now - timedelta(seconds=1)}]}
+    assert presence_info(doc, now)["online"] is False
+    doc["sockets"].append({"sid": "b", "expires_at": now + timedelta(seconds=30)})
+    assert presence_info(doc, now) == {"online": True, "last_seen": now.isoformat()}
+    assert presence_info(None, now) == {"online": False, "last_seen": None}
+
+@pytest.mark.asyncio
+async def test_crashed_worker_sockets_expire(presence_db):
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    # worker ที่ตายไปไม่ได้เรียก disconnect แต่ heartbeat หมดอายุแล้ว
+    presence_db.docs[1] = {"_id": 1, "last_seen": long_ago, "sockets": [{"sid": "gone", "expires_at": long_ago}]}
+    presence = await get_presence([1, 2])
+    assert presence[1] == {"online": False, "last_seen": long_ago.isoformat()}
+    assert presence[2]["online"] is False
+
+@pytest.mark.asyncio
+async def test_tracker_heartbeats_its_own_sockets(presence_db):
+    from pymongo import ReturnDocument
+
+    tracker = PresenceTracker(ttl=90, heartbeat_interval=3600)
+    try:
+        doc, previous = await tracker.connect(1, "sid-a")
+        assert previous == {}
+        assert [entry["sid"] for entry in doc["sockets"]] == ["sid-a"]
+        await tracker.connect(2, "sid-b")
+        assert tracker.sockets == {"sid-a": 1, "sid-b": 2}
+
+        await tracker.heartbeat()
+        [operations] = presence_db.bulk_writes
+        assert [op._filter for op in operations] == [{"_id": 1}, {"_id": 2}]
+
+        await tracker.disconnect(1, "sid-a")
+        query, update, return_document = presence_db.updates[-1]
+        assert query == {"_id": 1} and return_document == ReturnDocument.AFTER
+        # ลบ entry ของ sid นี้ (และที่หมดอายุ) โดยไม่เพิ่มใหม่
+        assert "$concatArrays" not in update[0]["$set"]["sockets"]
+        assert tracker.sockets == {"sid-b": 2}
+    finally:
+        await tracker.close()
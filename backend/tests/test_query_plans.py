@@ -0,0 +1,38 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.router.customer_interest import customer_interest_statement
+from backend.router.exchange import incoming_exchanges_statement, outgoing_exchanges_statement
+from backend.router.item import feed_statements, owner_items_statement, requested_item_ids_statement
+from backend.router.user import completed_exchange_count_statement, rating_scores_statement, user_with_post_count_statement
+
+async def full_table_scans(session: AsyncSession, statement):
+    """Tables that SQLite would read row by row, from EXPLAIN QUERY PLAN.
+
+    ``SCAN item USING INDEX ...`` walks an index in order and is fine; a bare
+    ``SCAN item`` is the SQLite equivalent of a Postgres Seq Scan.
+    """
+    sql = str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    plan = await session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+    return [row.detail for row in plan if row.detail.startswith("SCAN ") and "INDEX" not in row.detail]
+
+# สร้างจาก builder ตัวเดียวกับที่ router ใช้บนเส้นทางที่ถูกเรียกบ่อย
+HOT_PATH_QUERIES = {
+    "my items": owner_items_statement(1),
+    "feed exclusions": requested_item_ids_statement(1),
+    "feed page": feed_statements(1, [1, 2])[0].limit(10),
+    "feed count": feed_statements(1, [1, 2])[1],
+    "incoming exchanges": incoming_exchanges_statement(1),
+    "outgoing exchanges since": outgoing_exchanges_statement(1, since=datetime(2024, 1, 1)),
+    "completed exchange count": completed_exchange_count_statement(1),
+    "user profile": user_with_post_count_statement(1),
+    "ratings": rating_scores_statement(1),
+    "customer interest": customer_interest_statement(1),
+}
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", list(HOT_PATH_QUERIES))
+async def test_hot_path_queries_use_indexes(async_session: AsyncSession, name):
+    assert await full_table_scans(async_session, HOT_PATH_QUERIES[name]) == []
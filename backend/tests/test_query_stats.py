@@ -0,0 +1,104 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models.category import Category
+from backend.models.items import Item
+from backend.models.user import User
+from backend.router.item import get_items_by_user_id, get_user_items
+from backend.utils.query_stats import MongoCommandCounter, count_queries, query_stats_middleware, route_metrics
+
+async def seed_items(session: AsyncSession, count: int) -> User:
+    owner = User(name="Owner", email="owner@example.com", hashed_password="hashedpassword")
+    categories = [Category(name=f"Category {index}") for index in range(3)]
+    session.add_all([owner, *categories])
+    await session.commit()
+    session.add_all([
+        Item(
+            title=f"Item {index}",
+            owner_id=owner.id,
+            category_id=categories[0].id,
+            preferred_category_ids=[categories[1].id, categories[2].id],
+        )
+        for index in range(count)
+    ])
+    await session.commit()
+    return owner
+
+@pytest.mark.asyncio
+async def test_counts_sql_statements(async_session: AsyncSession):
+    with count_queries() as stats:
+        await async_session.execute(text("SELECT 1"))
+        await async_session.execute(text("SELECT 2"))
+    assert stats.sql_count == 2
+    assert stats.statements == ["SELECT 1", "SELECT 2"]
+
+    await async_session.execute(text("SELECT 3"))
+    assert stats.sql_count == 2
+
+@pytest.mark.asyncio
+async def test_item_listings_do_not_query_per_item(async_session: AsyncSession, assert_max_queries):
+    owner = await seed_items(async_session, 10)
+    async_session.expunge_all()
+
+    # รายการ + owner + category + preferred categories ไม่ขึ้นกับจำนวนสินค้า
+    with assert_max_queries(4):
+        items = await get_user_items(session=async_session, current_user=owner)
+    assert len(items) == 10
+    assert [category.name for category in items[0].preferred_category] == ["Category 1", "Category 2"]
+    assert items[0].owner.id == owner.id and items[0].owner.name is None
+
+    async_session.expunge_all()
+    with assert_max_queries(4):
+        items = await get_items_by_user_id(owner.id, session=async_session, current_user=owner)
+    assert len(items) == 10
+    assert items[0].owner.name == "Owner"
+
+def test_assert_max_queries_reports_statements(assert_max_queries):
+    from backend.utils.query_stats import current_stats
+    with pytest.raises(AssertionError, match="SELECT 1"):
+        with assert_max_queries(0):
+            current_stats.get().add_sql("SELECT 1", 0.0)
+
+def test_mongo_listener_credits_the_starting_context():
+    class Event:
+        request_id = 7
+        command_name = "find"
+        duration_micros = 1500
+
+    listener = MongoCommandCounter()
+    with count_queries() as stats:
+        listener.started(Event())
+    listener.succeeded(Event())
+    assert stats.mongo_count == 1
+    assert stats.mongo_time == pytest.approx(0.0015)
+
+@pytest.mark.parametrize("expose_headers", [True, False])
+def test_middleware_headers_and_route_metrics(expose_headers):
+    app = FastAPI()
+    app.middleware("http")(query_stats_middleware(expose_headers=expose_headers))
+
+    @app.get("/things/{thing_id}")
+    async def read_thing(thing_id: int):
+        from backend.utils.query_stats import current_stats
+        current_stats.get().add_sql("SELECT thing", 0.002)
+        return {"id": thing_id}
+
+    route_metrics.routes.pop("GET /things/{thing_id}", None)
+    response = TestClient(app).get("/things/1")
+    assert ("X-DB-Queries" in response.headers) is expose_headers
+    if expose_headers:
+        assert response.headers["X-DB-Queries"] == "sql=1; mongo=0"
+    assert route_metrics.snapshot()["GET /things/{thing_id}"]["sql_queries"] == 1
+
+def test_unmatched_paths_share_one_route_metrics_key():
+    app = FastAPI()
+    app.middleware("http")(query_stats_middleware(expose_headers=False))
+    client = TestClient(app)
+
+    route_metrics.routes.pop("GET <unmatched>", None)
+    for index in range(3):
+        assert client.get(f"/missing/{index}").status_code == 404
+    assert route_metrics.snapshot()["GET <unmatched>"]["requests"] == 3
+    assert not any(route.startswith("GET /missing") for route in route_metrics.routes)
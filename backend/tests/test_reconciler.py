@@ -0,0 +1,69 @@
+import io
+import os
+import time
+import pytest
+from backend.storage.reconciler import ImageReconciler, image_stem
+
+DAY = 24 * 60 * 60
+
+async def save(storage, key, data=b"jpeg", age=0):
+    await storage.save(key, io.BytesIO(data))
+    if age:
+        past = time.time() - age
+        os.utime(storage.path(key), (past, past))
+
+def test_image_stem_groups_variants():
+    assert image_stem("1/items/2/abc.jpg") == "1/items/2/abc"
+    assert image_stem("1/items/2/abc.webp") == "1/items/2/abc"
+    assert image_stem("1/items/2/abc.jpg.br") == "1/items/2/abc"
+
+@pytest.mark.asyncio
+async def test_reconciler_deletes_only_old_orphans(async_session, session_maker, local_storage, seed_item):
+    user, item = await seed_item()
+    kept = f"{user.id}/items/{item.id}/kept.jpg"
+    item.images = [{"id": "kept", "key": kept}]
+    await async_session.commit()
+
+    await save(local_storage, kept, age=2 * DAY)
+    await save(local_storage, f"{user.id}/items/{item.id}/kept.webp", age=2 * DAY)
+    await save(local_storage, f"{user.id}/items/{item.id}/old.jpg", b"orphan", age=2 * DAY)
+    await save(local_storage, f"{user.id}/items/999/gone.jpg", b"orphan!", age=2 * DAY)
+    await save(local_storage, f"{user.id}/items/{item.id}/uploading.jpg")
+    await save(local_storage, "README.txt", age=2 * DAY)
+
+    reconciler = ImageReconciler(local_storage, session_maker, grace_seconds=DAY, batch_size=2)
+
+    report = await reconciler.run(dry_run=True)
+    assert report["scanned"] == 6
+    assert report["orphans"] == 2
+    assert report["deleted"] == 0
+    assert report["reclaimed_bytes"] == len(b"orphan") + len(b"orphan!")
+    assert await local_storage.exists(f"{user.id}/items/{item.id}/old.jpg")
+
+    report = await reconciler.run()
+    assert report["deleted"] == 2
+    assert report["in_grace_period"] == 1
+    assert report["unrecognized"] == 1
+    assert reconciler.last_report is report
+    assert await local_storage.exists(kept)
+    assert await local_storage.exists(f"{user.id}/items/{item.id}/kept.webp")
+    assert await local_storage.exists(f"{user.id}/items/{item.id}/uploading.jpg")
+    assert not await local_storage.exists(f"{user.id}/items/{item.id}/old.jpg")
+    # โฟลเดอร์ของ item ที่ถูกลบไปแล้วต้องไม่ค้างอยู่
+    assert not os.path.exists(local_storage.path(f"{user.id}/items/999"))
+
+@pytest.mark.asyncio
+async def test_list_pages_is_batched(local_storage):
+    for index in range(5):
+        await save(local_storage, f"1/items/1/{index}.jpg")
+    pages = [page async for page in local_storage.list_pages(batch_size=2)]
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+@pytest.mark.asyncio
+async def test_prune_removes_old_empty_directories(local_storage):
+    os.makedirs(local_storage.path("1/items/7"))
+    past = time.time() - 2 * DAY
+    for directory in ("1/items/7", "1/items", "1"):
+        os.utime(local_storage.path(directory), (past, past))
+    assert await local_storage.prune(time.time() - DAY) == 3
+    assert os.listdir(local_storage.root) == []
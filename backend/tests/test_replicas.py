@@ -0,0 +1,63 @@
+import pytest
+from types import SimpleNamespace
+from backend import db
+from backend.db.replicas import PRIMARY_COOKIE, ReadYourWrites, ReplicaPool
+
+def make_request(method="GET", authorization=None, cookies=None):
+    headers = {"authorization": authorization} if authorization else {}
+    return SimpleNamespace(method=method, headers=headers, cookies=cookies or {})
+
+@pytest.mark.asyncio
+async def test_replica_pool_round_robin_skips_unhealthy(settings, tmp_path):
+    urls = [
+        f"sqlite+aiosqlite:///{tmp_path / 'replica-a.db'}",
+        f"sqlite+aiosqlite:///{tmp_path / 'missing-dir' / 'replica-b.db'}",
+        f"sqlite+aiosqlite:///{tmp_path / 'replica-c.db'}",
+    ]
+    replicas = ReplicaPool(urls, db.engine_options(settings, urls[0]), health_check_interval=1)
+    try:
+        assert [replicas.pick() for _ in range(3)] == [0, 1, 2]
+
+        await replicas.check_health()
+        assert replicas.healthy == [True, False, True]
+        assert {replicas.pick() for _ in range(4)} == {0, 2}
+
+        replicas.mark_unhealthy(0)
+        replicas.mark_unhealthy(2)
+        assert replicas.pick() is None
+    finally:
+        await replicas.close()
+
+def test_reads_stick_to_primary_after_own_write():
+    now = [1000.0]
+    tracker = ReadYourWrites(window_seconds=5, clock=lambda: now[0])
+    writer = make_request("POST", authorization="Bearer writer")
+
+    assert tracker.pinned_to_primary(writer) is True
+    assert tracker.pinned_to_primary(make_request(authorization="Bearer writer")) is False
+
+    tracker.record_write(writer)
+    assert tracker.pinned_to_primary(make_request(authorization="Bearer writer")) is True
+    assert tracker.pinned_to_primary(make_request(authorization="Bearer someone-else")) is False
+    # The cookie carries stickiness to workers that did not see the write
+    assert tracker.pinned_to_primary(make_request(cookies={PRIMARY_COOKIE: "1003"})) is True
+
+    now[0] += 6
+    assert tracker.pinned_to_primary(make_request(authorization="Bearer writer")) is False
+
+def dependency_calls(dependant):
+    for dependency in dependant.dependencies:
+        yield dependency.call
+        yield from dependency_calls(dependency)
+
+def test_read_only_endpoints_never_open_a_primary_session():
+    from backend.router import item, user
+
+    endpoints = {item.get_items, item.get_items_by_user_id, user.get_user_by_id}
+    routes = [route for module in (item, user) for route in module.router.routes if route.endpoint in endpoints]
+    assert len(routes) == len(endpoints)
+    for route in routes:
+        calls = set(dependency_calls(route.dependant))
+        # ผู้ใช้ที่ login ก็ดึงผ่าน session เดียวกับ endpoint (replica)
+        assert db.get_read_session in calls
+        assert db.get_session not in calls, route.path
@@ -0,0 +1,74 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import pytest
+from backend.core.workers import primary_worker
+from backend.serve import check_socketio, worker_count
+
+class FakeSettings:
+    def __init__(self, queue):
+        self.SOCKETIO_MESSAGE_QUEUE = queue
+
+# แอปเล็ก ๆ ที่ตอบ pid ของ worker ใช้ทดสอบ Supervisor จริงใน subprocess
+SERVER = """
+import os, sys, uvicorn
+from backend.serve import Supervisor
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    body = f"{os.getpid()} {os.environ['SERVE_WORKER_ID']}".encode()
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+config = uvicorn.Config(app, host="127.0.0.1", port=int(sys.argv[1]), lifespan="off", log_level="warning")
+sys.exit(Supervisor(config, workers=2, graceful_timeout=5, preload=()).run())
+"""
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def test_worker_count_defaults_to_cpu_count():
+    assert worker_count(3) == 3
+    assert worker_count(0) == (os.cpu_count() or 1)
+
+def test_several_workers_need_a_message_queue():
+    check_socketio(FakeSettings(None), 1)
+    check_socketio(FakeSettings("redis://redis:6379/0"), 4)
+    with pytest.raises(SystemExit):
+        check_socketio(FakeSettings(None), 2)
+    with pytest.raises(SystemExit):
+        check_socketio(FakeSettings("local://"), 2)
+
+def test_primary_worker(monkeypatch):
+    monkeypatch.delenv("SERVE_WORKER_ID", raising=False)
+    assert primary_worker()
+    monkeypatch.setenv("SERVE_WORKER_ID", "1")
+    assert not primary_worker()
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="pre-fork server needs os.fork")
+def test_supervisor_serves_from_several_workers_and_stops_cleanly():
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-c", SERVER, str(port)])
+    try:
+        workers = set()
+        deadline = time.monotonic() + 10
+        while len(workers) < 2 and time.monotonic() < deadline:
+            try:
+                # connection ใหม่ทุกครั้ง เพื่อให้ kernel กระจายไปหลาย worker
+                workers.add(httpx.get(f"http://127.0.0.1:{port}/", headers={"Connection": "close"}).text)
+            except httpx.TransportError:
+                time.sleep(0.05)
+        assert len({worker.split()[1] for worker in workers}) == 2
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=10) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
@@ -0,0 +1,86 @@
+import json
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from backend.db import slow_queries
+from backend.db.slow_queries import SlowQueryLog, normalize_sql, parameter_shape
+from backend.utils.query_stats import count_queries
+
+def test_normalize_sql_groups_literals_and_placeholders():
+    assert normalize_sql("SELECT * FROM item WHERE id IN ($1, $2, $3) AND title = 'a''b'") == \
+        "SELECT * FROM item WHERE id IN (?) AND title = ?"
+    assert normalize_sql("SELECT x::INTEGER FROM t LIMIT 10 OFFSET :offset") == "SELECT x::INTEGER FROM t LIMIT ? OFFSET ?"
+    assert normalize_sql("SELECT anon_1.id\n  FROM  item AS anon_1 WHERE owner_id = ?") == \
+        "SELECT anon_1.id FROM item AS anon_1 WHERE owner_id = ?"
+
+def test_parameter_shape_hides_values():
+    assert parameter_shape((1, "secret")) == ["int", "str"]
+    assert parameter_shape({"email": "a@example.com"}) == {"email": "str"}
+    assert parameter_shape(tuple(range(50))) == {"count": 50, "types": ["int"]}
+    assert parameter_shape([(1, "a"), (2, "b")], executemany=True) == {"rows": 2, "row": ["int", "str"]}
+
+@pytest.mark.asyncio
+async def test_logs_and_reports_statements_over_threshold(caplog):
+    slow_queries.logger.addHandler(caplog.handler)
+    engine = create_async_engine("sqlite+aiosqlite://")
+    log = SlowQueryLog(threshold_ms=0, explain=True, report_size=10)
+    log.attach(engine)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("CREATE TABLE thing (id INTEGER, name TEXT)"))
+            with count_queries({"method": "GET", "path": "/things", "route": SimpleNamespace(path="/things")}):
+                for thing_id in range(3):
+                    await conn.execute(text("SELECT name FROM thing WHERE id = :id"), {"id": thing_id})
+            with pytest.raises(OperationalError):
+                await conn.execute(text("SELECT * FROM missing"))
+    finally:
+        await engine.dispose()
+        slow_queries.logger.removeHandler(caplog.handler)
+
+    top = {entry["statement"]: entry for entry in log.report.top(10)}
+    select = top["SELECT name FROM thing WHERE id = ?"]
+    assert select["count"] == 3
+    assert select["routes"] == ["GET /things"]
+    assert select["parameters"] == ["int"]
+    assert any("SCAN" in line for line in select["plan"])
+    assert "SELECT * FROM missing" in top
+
+    records = [json.loads(record.getMessage()) for record in caplog.records if record.name == slow_queries.logger.name]
+    assert {"statement": "SELECT * FROM missing", "error": "OperationalError"}.items() <= records[-1].items()
+
+def test_report_keeps_a_bounded_number_of_statements():
+    report = slow_queries.SlowQueryReport(max_statements=1)
+    for statement, duration in [("A", 5.0), ("B", 9.0), ("A", 1.0)]:
+        report.record({"statement": statement, "duration_ms": duration, "route": None, "parameters": None})
+    assert [(entry["statement"], entry["count"], entry["max_ms"], entry["avg_ms"]) for entry in report.top(5)] == [("A", 2, 5.0, 3.0)]
+    assert report.dropped == 1
+
+def test_disabled_with_zero_threshold(settings):
+    settings.DB_SLOW_QUERY_MS = 0
+    assert slow_queries.init_slow_query_log(settings, []) is None
+    assert slow_queries.slow_query_log is None
+
+@pytest.mark.asyncio
+async def test_failed_explain_leaves_the_transaction_usable(monkeypatch):
+    monkeypatch.setitem(slow_queries.EXPLAIN_PREFIXES, "sqlite", "EXPLAIN NOT VALID ")
+    engine = create_async_engine("sqlite+aiosqlite://")
+    log = SlowQueryLog(threshold_ms=0, explain=True, report_size=10)
+    log.attach(engine)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("CREATE TABLE thing (id INTEGER)"))
+            await conn.commit()
+            async with conn.begin():
+                await conn.execute(text("INSERT INTO thing VALUES (1)"))
+                await conn.execute(text("SELECT id FROM thing"))
+                # คำสั่งถัดไปใน transaction เดียวกันต้องยังทำงานได้ และงานก่อนหน้าไม่ถูก rollback ไปด้วย
+                await conn.execute(text("INSERT INTO thing VALUES (2)"))
+            rows = (await conn.execute(text("SELECT id FROM thing ORDER BY id"))).scalars().all()
+    finally:
+        await engine.dispose()
+
+    assert rows == [1, 2]
+    [select] = [entry for entry in log.report.top(10) if entry["statement"] == "SELECT id FROM thing"]
+    assert select["plan"][0].startswith("EXPLAIN failed")
@@ -0,0 +1,77 @@
+import pytest
+import socketio
+from bson import ObjectId
+from backend import socket_events
+from backend.db import message_writer
+from backend.db.message_writer import MessageWriter
+from backend.socket_events import (
+    RATE_LIMITED, chat_room, connect, get_connect_token, handle_join_room, handle_leave_room, handle_send_message,
+    rate_limiters, user_room,
+)
+from backend.utils.throttle import TokenBucket
+
+def test_get_connect_token_sources():
+    assert get_connect_token({}, {"token": "from-auth"}) == "from-auth"
+    assert get_connect_token({"HTTP_AUTHORIZATION": "Bearer from-header"}, None) == "from-header"
+    assert get_connect_token({"QUERY_STRING": "EIO=4&token=from-query"}, None) == "from-query"
+    assert get_connect_token({}, None) is None
+
+@pytest.mark.asyncio
+async def test_connect_requires_token():
+    with pytest.raises(socketio.exceptions.ConnectionRefusedError):
+        await connect("sid", {}, None)
+
+@pytest.mark.asyncio
+async def test_send_message_rejects_invalid_payload():
+    assert (await handle_send_message("sid", {"message": "no chat"}))["ok"] is False
+    assert (await handle_send_message("sid", {"chat_id": "abc", "message": "hi", "message_type": "video"}))["ok"] is False
+
+@pytest.mark.asyncio
+async def test_join_and_leave_room_reject_invalid_payload():
+    for data in (None, "room-id", {}, {"room": ""}, {"room": 42}):
+        assert await handle_join_room("sid", data) == {"ok": False, "error": "room is required"}
+        assert await handle_leave_room("sid", data) == {"ok": False, "error": "room is required"}
+
+@pytest.mark.asyncio
+async def test_events_beyond_burst_are_rate_limited():
+    rate_limiters["limited-sid"] = TokenBucket(rate=0, burst=1)
+    try:
+        await handle_send_message("limited-sid", {})
+        assert await handle_send_message("limited-sid", {}) == RATE_LIMITED
+    finally:
+        rate_limiters.pop("limited-sid")
+
+@pytest.mark.asyncio
+async def test_send_message_emits_acks_and_queues_for_persistence(monkeypatch, settings):
+    chat_id = ObjectId()
+    emitted = []
+
+    async def participants(sid, requested_chat_id):
+        return [1, 2] if requested_chat_id == str(chat_id) else None
+
+    async def get_session(sid):
+        return {"user_id": 1}
+
+    async def emit(event, payload, to=None, skip_sid=None):
+        emitted.append((event, payload, to, skip_sid))
+
+    writer = MessageWriter(settings)
+    monkeypatch.setattr(message_writer, "message_writer", writer)
+    monkeypatch.setattr(socket_events, "cached_chat_participants", participants)
+    monkeypatch.setattr(socket_events.sio, "get_session", get_session)
+    monkeypatch.setattr(socket_events.sio, "emit", emit)
+
+    ack = await handle_send_message("sender-sid", {"chat_id": str(chat_id), "message": "hello"})
+
+    assert ack["ok"] is True
+    assert ack["message"]["sender"] == 1 and ack["message"]["receiver"] == 2
+    assert ack["message"]["message_type"] == "text"
+    # ส่งให้ห้องแชทและห้องส่วนตัวของทั้งสองคน ยกเว้น socket ที่ส่งเอง
+    [(event, payload, rooms, skip_sid)] = emitted
+    assert (event, payload, skip_sid) == ("new_message", ack["message"], "sender-sid")
+    assert set(rooms) == {chat_room(str(chat_id)), user_room(1), user_room(2)}
+    assert writer.buffered_count(chat_id) == 1
+
+    assert (await handle_send_message("sender-sid", {"chat_id": str(ObjectId()), "message": "hi"}))["ok"] is False
+    assert writer.pending == 1
+    rate_limiters.pop("sender-sid", None)
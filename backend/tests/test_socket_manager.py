@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+import socketio
+from socketio.packet import Packet
+from backend.socket_manager import AsyncLocalPubSubManager, LocalBus, build_client_manager, socket_transports
+
+async def start_worker(bus: LocalBus):
+    """An AsyncServer wired like one uvicorn worker, recording what it sends."""
+    server = socketio.AsyncServer(async_mode="asgi", client_manager=AsyncLocalPubSubManager(channel="test", bus=bus))
+    server.manager.initialize()
+    server.manager_initialized = True
+    sent = []
+    async def send_eio_packet(eio_sid, eio_pkt):
+        sent.append((eio_sid, Packet(encoded_packet=eio_pkt.data).data))
+    server._send_eio_packet = send_eio_packet
+    await asyncio.sleep(0)  # let the listener subscribe
+    return server, sent
+
+@pytest.mark.asyncio
+async def test_emit_reaches_sockets_on_another_worker():
+    bus = LocalBus()
+    worker_a, sent_a = await start_worker(bus)
+    worker_b, sent_b = await start_worker(bus)
+
+    # A client of worker B has joined a chat room
+    sid = await worker_b.manager.connect("eio-b", "/")
+    await worker_b.manager.enter_room(sid, "/", "chat:1")
+
+    # Worker A handles the HTTP send and emits to the room
+    await worker_a.emit("new_message", {"message": "hello"}, room="chat:1")
+    await asyncio.sleep(0.01)
+
+    assert sent_a == []
+    assert sent_b == [("eio-b", ["new_message", {"message": "hello"}])]
+
+    # Rooms nobody on worker B joined are not delivered there
+    await worker_a.emit("new_message", {"message": "elsewhere"}, room="chat:2")
+    await asyncio.sleep(0.01)
+    assert len(sent_b) == 1
+
+    for worker in (worker_a, worker_b):
+        worker.manager.thread.cancel()
+
+def test_build_client_manager(settings):
+    assert build_client_manager(settings) is None
+    assert socket_transports(settings) == ["polling", "websocket"]
+
+    settings.SOCKETIO_MESSAGE_QUEUE = "redis://localhost:6379/0"
+    assert isinstance(build_client_manager(settings), socketio.AsyncRedisManager)
+    assert socket_transports(settings) == ["websocket"]
+
+    settings.SOCKETIO_STICKY_SESSIONS = True
+    assert socket_transports(settings) == ["polling", "websocket"]
+
+    settings.SOCKETIO_MESSAGE_QUEUE = "local://"
+    assert isinstance(build_client_manager(settings), AsyncLocalPubSubManager)
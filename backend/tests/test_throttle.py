@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+from backend.utils.throttle import Coalescer, TokenBucket
+
+def test_token_bucket_refills_at_rate():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=3, clock=lambda: now[0])
+
+    assert [bucket.allow() for _ in range(4)] == [True, True, True, False]
+
+    now[0] = 0.5
+    assert bucket.allow() is True
+    assert bucket.allow() is False
+
+    # Idle time never banks more than the burst
+    now[0] = 100
+    assert [bucket.allow() for _ in range(4)] == [True, True, True, False]
+
+@pytest.mark.asyncio
+async def test_coalescer_emits_latest_state_once_per_window():
+    emitted = []
+    async def emit(event, room, updates):
+        emitted.append((event, room, dict(updates)))
+
+    coalescer = Coalescer(emit, window=0.01, max_pending=2)
+    coalescer.push("typing", "chat:1", 1, True)
+    coalescer.push("typing", "chat:1", 2, True)
+    coalescer.push("typing", "chat:1", 1, False)
+    coalescer.push("typing", "chat:2", 1, True)
+    assert emitted == []
+
+    await asyncio.sleep(0.03)
+    assert sorted(emitted) == [
+        ("typing", "chat:1", {1: False, 2: True}),
+        ("typing", "chat:2", {1: True}),
+    ]
+
+    # Past max_pending the oldest update is dropped
+    emitted.clear()
+    for user_id in (1, 2, 3):
+        coalescer.push("typing", "chat:1", user_id, True)
+    await asyncio.sleep(0.03)
+    assert emitted == [("typing", "chat:1", {2: True, 3: True})]
+    assert coalescer.dropped == 1
+
+@pytest.mark.asyncio
+async def test_coalescer_close_cancels_pending_flushes():
+    emitted = []
+    async def emit(event, room, updates):
+        emitted.append(room)
+
+    coalescer = Coalescer(emit, window=10, max_pending=10)
+    coalescer.push("presence", "user:1", 2, {"online": True})
+    await coalescer.close()
+    assert emitted == []
@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend import db
+from backend.core.config import get_settings
+from backend.models.category import Category
+from backend.router import root
+from backend.utils.category_cache import CategoryCache
+from backend.utils.templates import warm_templates
+from backend.warmup import readiness
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_settings_are_read_once():
+    assert get_settings() is get_settings()
+
+def test_templates_are_compiled():
+    assert warm_templates() >= 5
+
+def test_readiness_endpoint():
+    app = FastAPI()
+    app.include_router(root.router)
+    client = TestClient(app)
+    assert client.get("/health/live").status_code == 200
+    assert client.get("/health/ready").status_code == 503
+    readiness.ready = True
+    try:
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        assert response.json()["ready"] is True
+    finally:
+        readiness.ready = False
+
+@pytest.mark.asyncio
+async def test_category_cache(async_session, assert_max_queries):
+    async_session.add_all([Category(name="Books"), Category(name="Toys")])
+    await async_session.commit()
+    clock = Clock()
+    cache = CategoryCache(ttl=60, clock=clock)
+
+    with assert_max_queries(1):
+        results = await asyncio.gather(*(cache.get(async_session) for _ in range(5)))
+    assert [category["name"] for category in results[0]] == ["Books", "Toys"]
+
+    async_session.add(Category(name="Tools"))
+    await async_session.commit()
+    with assert_max_queries(0):
+        assert len(await cache.get(async_session)) == 2
+    cache.invalidate()
+    assert len(await cache.get(async_session)) == 3
+
+    async_session.add(Category(name="Shoes"))
+    await async_session.commit()
+    clock.now += 61
+    assert len(await cache.get(async_session)) == 4
+
+@pytest.mark.asyncio
+async def test_category_cache_drops_a_load_invalidated_midway(async_session):
+    async_session.add(Category(name="Books"))
+    await async_session.commit()
+    cache = CategoryCache(ttl=60)
+
+    class InvalidatedDuringQuery:
+        async def execute(self, statement):
+            result = await async_session.execute(statement)
+            cache.invalidate()  # มีการแก้ category ระหว่างที่ query ยังไม่เสร็จ
+            return result
+
+    assert [category["name"] for category in await cache.load(InvalidatedDuringQuery())] == ["Books"]
+    assert not cache.fresh
+
+    async_session.add(Category(name="Toys"))
+    await async_session.commit()
+    assert len(await cache.get(async_session)) == 2
+    assert cache.fresh
+
+@pytest.mark.asyncio
+async def test_warm_pool_keeps_connections_open(settings, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'warmup.db'}")
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URLS", None)
+    db.init_db(settings)
+    try:
+        await db.warm_pool(3)
+        assert db.engine.pool.checkedin() == 3
+    finally:
+        await db.close_session()
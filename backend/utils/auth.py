@@ -6,7 +6,7 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from backend.db import get_session
+from backend.db import get_read_session, get_session
 from ..core.config import get_settings
 from ..models.user import User
 from datetime import timedelta
@@ -28,19 +28,32 @@ def create_access_token(data: dict, expires_delta: timedelta):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
+async def authenticate_token(token: str, session: AsyncSession):
+    """Resolve a bearer token to its user, or ``None`` if it is not valid."""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-        user = await session.execute(select(User).where(User.email == email))
-        user = user.scalar_one_or_none()
-        if not user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-        return user
     except JWTError:
+        return None
+    email = payload.get("sub")
+    if email is None:
+        return None
+    user = await session.execute(select(User).where(User.email == email))
+    return user.scalar_one_or_none()
+
+async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
+    user = await authenticate_token(token, session)
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    return user
+
+async def get_current_user_for_read(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_read_session)):
+    """``get_current_user`` for read-only endpoints.
+
+    Looks the user up through ``get_read_session``; FastAPI caches the
+    dependency per request, so the endpoint and authentication share one
+    replica session and the primary isn't touched at all.
+    """
+    return await get_current_user(token, session)
 
 # Create a password reset token (JWT)
 def create_password_reset_token(email: str):
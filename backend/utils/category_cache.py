@@ -0,0 +1,68 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlmodel import select
+
+from ..models.category import Category
+
+class CategoryCache:
+    """All categories, kept in memory for ``ttl`` seconds.
+
+    Categories are few and rarely change, but every client loads them on
+    start. This worker's writes call ``invalidate``; other workers pick the
+    change up when their copy expires. A load that was running when
+    ``invalidate`` was called may have read the old rows, so its result is
+    returned to its caller but not kept.
+    """
+
+    def __init__(self, ttl: float, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._categories: Optional[List[Dict[str, Any]]] = None
+        self._loaded_at = 0.0
+        self._generation = 0  # เพิ่มทุกครั้งที่ invalidate
+        self._lock = asyncio.Lock()
+
+    @property
+    def fresh(self) -> bool:
+        return self._categories is not None and self.clock() - self._loaded_at < self.ttl
+
+    async def get(self, session) -> List[Dict[str, Any]]:
+        if self.fresh:
+            return self._categories
+        # ให้ request ที่มาพร้อมกันรอผลโหลดเดียวกัน แทนที่จะ query ซ้ำทุกตัว
+        async with self._lock:
+            if self.fresh:
+                return self._categories
+            return await self.load(session)
+
+    async def load(self, session) -> List[Dict[str, Any]]:
+        generation = self._generation
+        result = await session.execute(select(Category.id, Category.name, Category.image).order_by(Category.id))
+        categories = [dict(row._mapping) for row in result]
+        if generation == self._generation:
+            self._categories = categories
+            self._loaded_at = self.clock()
+        return categories
+
+    def invalidate(self):
+        self._generation += 1
+        self._categories = None
+
+# Global CategoryCache instance
+category_cache: Optional[CategoryCache] = None
+
+def init_category_cache(settings) -> CategoryCache:
+    global category_cache
+    category_cache = CategoryCache(settings.CATEGORY_CACHE_TTL_SECONDS)
+    return category_cache
+
+def get_category_cache() -> CategoryCache:
+    if category_cache is None:
+        raise Exception("CategoryCache is not initialized")
+    return category_cache
+
+def invalidate_category_cache():
+    if category_cache is not None:
+        category_cache.invalidate()
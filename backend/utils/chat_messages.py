@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+
+from ..db.mongodb import get_db
+
+MESSAGE_PREVIEW_LENGTH = 100
+
+def other_participant(participants: List[int], user_id: int) -> int:
+    # A chat with yourself has the same id twice
+    return next((participant for participant in participants if participant != user_id), user_id)
+
+def message_preview(message_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "sender": message_data["sender"],
+        "message": message_data["message"][:MESSAGE_PREVIEW_LENGTH],
+        "message_type": message_data["message_type"],
+        "timestamp": message_data["timestamp"],
+    }
+
+def build_message(chat_object_id: ObjectId, sender_id: int, participants: List[int], message: str, message_type: str) -> Dict[str, Any]:
+    # _id ถูกสร้างฝั่งเซิร์ฟเวอร์ จึงส่งต่อให้ client ได้ทันทีก่อนบันทึกลง Mongo
+    # Mongo เก็บเวลาแค่ระดับมิลลิวินาที ตัดทิ้งตั้งแต่ตอนสร้าง ให้ timestamp ที่ส่งสดตรงกับที่อ่านจากประวัติ
+    # (client ใช้เป็น cursor ของ (timestamp, _id) ได้)
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "chat_id": chat_object_id,
+        "sender": sender_id,
+        "receiver": other_participant(participants, sender_id),
+        "message": message,
+        "timestamp": now.replace(microsecond=now.microsecond // 1000 * 1000),
+        "message_type": message_type,
+    }
+
+async def get_chat_participants(chat_object_id: ObjectId, user_id: int) -> Optional[List[int]]:
+    """Participants of the chat, or ``None`` if ``user_id`` is not one of them."""
+    chat = await get_db().get_collection("chats").find_one(
+        {"_id": chat_object_id, "participants": user_id}, {"participants": 1}
+    )
+    return chat["participants"] if chat else None
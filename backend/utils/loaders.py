@@ -0,0 +1,78 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from ..db import get_session
+from ..models.user import User
+
+class UserLoader:
+    """Request-scoped batching loader for ``User`` rows.
+
+    ``load`` calls made in the same event-loop tick are collected and resolved
+    with a single ``IN`` query; resolved users are cached for the rest of the
+    request, so asking for the same participant again costs nothing.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._futures: Dict[int, asyncio.Future] = {}
+        self._pending: List[int] = []
+        self._lock = asyncio.Lock()
+        self._tasks = set()
+
+    def load(self, user_id: Optional[int]) -> "asyncio.Future[Optional[User]]":
+        loop = asyncio.get_running_loop()
+        if user_id is None:
+            future = loop.create_future()
+            future.set_result(None)
+            return future
+
+        future = self._futures.get(user_id)
+        if future is None:
+            future = loop.create_future()
+            self._futures[user_id] = future
+            if not self._pending:
+                # รวบรวม id ที่ขอภายใน tick เดียวกันแล้วค่อยยิง query ครั้งเดียว
+                task = loop.create_task(self._dispatch())
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            self._pending.append(user_id)
+        return future
+
+    async def load_many(self, user_ids: Iterable[Optional[int]]) -> List[Optional[User]]:
+        return list(await asyncio.gather(*(self.load(user_id) for user_id in user_ids)))
+
+    async def load_map(self, user_ids: Iterable[Optional[int]]) -> Dict[int, User]:
+        unique_ids = list(dict.fromkeys(user_id for user_id in user_ids if user_id is not None))
+        users = await self.load_many(unique_ids)
+        return {user_id: user for user_id, user in zip(unique_ids, users) if user is not None}
+
+    def prime(self, user: User):
+        if user.id not in self._futures:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(user)
+            self._futures[user.id] = future
+
+    async def _dispatch(self):
+        batch, self._pending = self._pending, []
+        # AsyncSession ไม่รองรับการ query พร้อมกัน จึงต้องรอ batch ก่อนหน้าให้เสร็จ
+        async with self._lock:
+            try:
+                result = await self.session.execute(select(User).where(User.id.in_(batch)))
+                users = {user.id: user for user in result.scalars().all()}
+            except Exception as e:
+                for user_id in batch:
+                    future = self._futures.pop(user_id)
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+        for user_id in batch:
+            future = self._futures[user_id]
+            if not future.done():
+                future.set_result(users.get(user_id))
+
+async def get_user_loader(session: AsyncSession = Depends(get_session)) -> UserLoader:
+    return UserLoader(session)
@@ -0,0 +1,120 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..db.mongodb import DESCENDING, get_db
+from .chat_messages import message_preview
+from .presence import online_filter
+
+async def offline_users(user_ids: Iterable[int]) -> List[int]:
+    """The subset of ``user_ids`` with no socket connected on any worker."""
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return []
+    online = set(await get_db().get_collection("presence").distinct(
+        "_id", {"_id": {"$in": user_ids}, **online_filter(datetime.utcnow())}
+    ))
+    return [user_id for user_id in user_ids if user_id not in online]
+
+async def record_chat_messages(batch: List[Dict[str, Any]]):
+    """Fold a batch of messages into pending entries for offline receivers.
+
+    There is one entry per (user, chat) holding the count and the newest
+    preview, so a long absence still replays as one line per chat.
+    """
+    from pymongo import UpdateOne
+
+    grouped: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+    for message_data in batch:
+        if message_data["receiver"] != message_data["sender"]:
+            grouped[(message_data["receiver"], message_data["chat_id"])].append(message_data)
+
+    offline = set(await offline_users(receiver for receiver, _ in grouped))
+    operations = []
+    for (receiver, chat_id), messages in grouped.items():
+        if receiver not in offline:
+            continue
+        latest = max(reversed(messages), key=lambda message_data: message_data["timestamp"])
+        operations.append(UpdateOne(
+            {"user_id": receiver, "kind": "chat", "key": str(chat_id)},
+            {
+                "$inc": {"count": len(messages)},
+                "$set": {"latest": message_preview(latest), "updated_at": latest["timestamp"]},
+            },
+            upsert=True,
+        ))
+    if operations:
+        await get_db().get_collection("pending_events").bulk_write(operations, ordered=False)
+
+async def record_exchange_event(user_ids: Iterable[int], exchange_id: int, status: str):
+    """Remember the newest status of an exchange for users who are offline."""
+    from pymongo import UpdateOne
+
+    offline = await offline_users(user_ids)
+    if not offline:
+        return
+    now = datetime.utcnow()
+    await get_db().get_collection("pending_events").bulk_write([
+        UpdateOne(
+            {"user_id": user_id, "kind": "exchange", "key": str(exchange_id)},
+            {"$inc": {"count": 1}, "$set": {"status": status, "updated_at": now}},
+            upsert=True,
+        )
+        for user_id in offline
+    ], ordered=False)
+
+async def take_digest(user_id: int, since: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """Read and clear a user's pending entries as one catch-up payload.
+
+    At most ``PENDING_EVENTS_MAX_PER_USER`` of the newest entries are
+    returned; older ones are dropped and ``truncated`` tells the client to
+    fall back to a full refresh.
+
+    Only the entries that were read are deleted, and only if their count is
+    unchanged: an entry upserted or bumped by a flush while the digest is
+    being built stays for the next one.
+    """
+    from pymongo import DeleteOne
+
+    mongodb = get_db()
+    collection = mongodb.get_collection("pending_events")
+    limit = mongodb.settings.PENDING_EVENTS_MAX_PER_USER
+
+    entries = await (
+        collection.find({"user_id": user_id})
+        .sort("updated_at", DESCENDING)
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+    if not entries:
+        return None
+    delivered = entries[:limit]
+    await collection.bulk_write([
+        DeleteOne({"_id": entry["_id"], "count": entry["count"]}) for entry in delivered
+    ], ordered=False)
+    if len(entries) > limit:
+        # ส่วนที่เก่ากว่าหน้านี้ทิ้งไป client จะ refresh ทั้งหมดเอง
+        await collection.delete_many({
+            "user_id": user_id,
+            "_id": {"$nin": [entry["_id"] for entry in delivered]},
+            "updated_at": {"$lte": delivered[-1]["updated_at"]},
+        })
+
+    digest = {
+        "since": since.isoformat() if since else None,
+        "truncated": len(entries) > limit,
+        "chats": [],
+        "exchanges": [],
+    }
+    for entry in delivered:
+        if entry["kind"] == "chat":
+            latest = dict(entry["latest"], timestamp=entry["latest"]["timestamp"].isoformat())
+            digest["chats"].append({"chat_id": entry["key"], "count": entry["count"], "latest": latest})
+        else:
+            digest["exchanges"].append({
+                "exchange_id": int(entry["key"]),
+                "status": entry["status"],
+                "changes": entry["count"],
+                "updated_at": entry["updated_at"].isoformat(),
+            })
+    return digest
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..db.mongodb import get_db
+
+logger = logging.getLogger(__name__)
+
+# จำนวนแชทล่าสุดที่จะแจ้งสถานะออนไลน์ให้ เมื่อผู้ใช้เข้า/ออกจากระบบ
+PRESENCE_FANOUT_LIMIT = 200
+
+def live_sockets(doc: Optional[Dict[str, Any]], now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Socket entries of a presence document whose heartbeat hasn't expired."""
+    now = now or datetime.utcnow()
+    return [entry for entry in (doc or {}).get("sockets", []) if entry["expires_at"] > now]
+
+def presence_info(doc: Optional[Dict[str, Any]], now: Optional[datetime] = None) -> Dict[str, Any]:
+    last_seen = doc.get("last_seen") if doc else None
+    return {
+        "online": bool(live_sockets(doc, now)),
+        "last_seen": last_seen.isoformat() if last_seen else None,
+    }
+
+def online_filter(now: datetime) -> Dict[str, Any]:
+    """Presence documents with at least one live socket."""
+    return {"sockets": {"$elemMatch": {"expires_at": {"$gt": now}}}}
+
+def socket_update(sid: str, now: datetime, expires_at: Optional[datetime]) -> List[Dict[str, Any]]:
+    """Pipeline update that (re)sets ``sid``'s entry, or removes it when ``expires_at`` is None.
+
+    Expired entries, e.g. from a worker that crashed, are pruned on the way.
+    """
+    kept = {"$filter": {
+        "input": {"$ifNull": ["$sockets", []]},
+        "cond": {"$and": [{"$gt": ["$$this.expires_at", now]}, {"$ne": ["$$this.sid", sid]}]},
+    }}
+    if expires_at is not None:
+        kept = {"$concatArrays": [kept, [{"sid": sid, "expires_at": expires_at}]]}
+    return [{"$set": {"sockets": kept, "last_seen": now}}]
+
+class PresenceTracker:
+    """Online status shared between workers through the ``presence`` collection.
+
+    Each user document lists the user's sockets with an ``expires_at`` that
+    the worker holding the socket pushes forward every ``heartbeat_interval``.
+    A user is online while any entry is live, so sockets of a worker that
+    died without running ``disconnect`` stop counting after ``ttl``.
+    """
+
+    def __init__(self, ttl: float = 90, heartbeat_interval: float = 30):
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.sockets: Dict[str, int] = {}  # sid -> user_id บน worker นี้
+        self._task: Optional[asyncio.Task] = None
+
+    async def _update(self, user_id: int, sid: str, connected: bool, return_after: bool) -> Dict[str, Any]:
+        from pymongo import ReturnDocument
+
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl) if connected else None
+        return await get_db().get_collection("presence").find_one_and_update(
+            {"_id": user_id},
+            socket_update(sid, now, expires_at),
+            upsert=True,
+            return_document=ReturnDocument.AFTER if return_after else ReturnDocument.BEFORE,
+        ) or {}
+
+    async def connect(self, user_id: int, sid: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Register a socket; returns the presence document after and before.
+
+        The update is atomic per user, so of two sockets connecting at once
+        exactly one sees no live socket in the document before.
+        """
+        self.sockets[sid] = user_id
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        previous = await self._update(user_id, sid, True, return_after=False)
+        now = datetime.utcnow()
+        doc = {
+            "_id": user_id,
+            "sockets": [*live_sockets(previous, now), {"sid": sid, "expires_at": now + timedelta(seconds=self.ttl)}],
+            "last_seen": now,
+        }
+        return doc, previous
+
+    async def disconnect(self, user_id: int, sid: str) -> Dict[str, Any]:
+        """Remove a socket; returns the presence document after."""
+        self.sockets.pop(sid, None)
+        return await self._update(user_id, sid, False, return_after=True)
+
+    async def heartbeat(self):
+        """Push forward the expiry of every socket connected to this worker."""
+        from pymongo import UpdateOne
+
+        if not self.sockets:
+            return
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        await get_db().get_collection("presence").bulk_write([
+            UpdateOne({"_id": user_id}, socket_update(sid, now, expires_at), upsert=True)
+            for sid, user_id in list(self.sockets.items())
+        ], ordered=False)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.heartbeat()
+            except Exception:
+                logger.exception("Presence heartbeat failed")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+async def get_presence(user_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    user_ids = list(set(user_ids))
+    docs = await get_db().get_collection("presence").find({"_id": {"$in": user_ids}}).to_list(length=len(user_ids))
+    by_id = {doc["_id"]: doc for doc in docs}
+    now = datetime.utcnow()
+    return {user_id: presence_info(by_id.get(user_id), now) for user_id in user_ids}
+
+async def chat_partners(user_id: int) -> List[int]:
+    """Users who share a chat with ``user_id``, from the most recent chats."""
+    chats = (
+        get_db().get_collection("chats")
+        .find({"participants": user_id}, {"participants": 1})
+        .sort("last_message_at", -1)
+        .limit(PRESENCE_FANOUT_LIMIT)
+    )
+    partners = set()
+    async for chat in chats:
+        partners.update(chat["participants"])
+    partners.discard(user_id)
+    return list(partners)
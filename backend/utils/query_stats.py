@@ -0,0 +1,147 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+MAX_RECORDED_STATEMENTS = 50
+# request ที่ไม่ match route ไหน (404, static mount) รวมไว้ key เดียว
+# ไม่อย่างนั้น path ดิบจะทำให้ RouteQueryMetrics โตไม่มีขอบเขต
+UNMATCHED_ROUTE = "<unmatched>"
+
+class QueryStats:
+    """SQL and Mongo round trips made while handling one request."""
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.mongo_count = 0
+        self.mongo_time = 0.0
+        self.statements: List[str] = []
+        # Motor ส่งคำสั่งจาก thread pool จึงต้องล็อกตอนบวกค่า
+        self._lock = threading.Lock()
+
+    @property
+    def total_count(self) -> int:
+        return self.sql_count + self.mongo_count
+
+    @property
+    def route(self) -> Optional[str]:
+        # router ใส่ "route" ลงใน scope ตอน match ก่อนเรียก endpoint
+        if self.scope is None:
+            return None
+        route = self.scope.get("route")
+        return f"{self.scope.get('method')} {route.path if route else UNMATCHED_ROUTE}"
+
+    def add_sql(self, statement: str, elapsed: float):
+        with self._lock:
+            self.sql_count += 1
+            self.sql_time += elapsed
+            if len(self.statements) < MAX_RECORDED_STATEMENTS:
+                self.statements.append(statement)
+
+    def add_mongo(self, command: str, elapsed: float):
+        with self._lock:
+            self.mongo_count += 1
+            self.mongo_time += elapsed
+            if len(self.statements) < MAX_RECORDED_STATEMENTS:
+                self.statements.append(f"mongo {command}")
+
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_stats", default=None)
+
+@contextmanager
+def count_queries(scope: Optional[dict] = None):
+    """Collect the queries made inside the block into a fresh ``QueryStats``."""
+    stats = QueryStats(scope)
+    token = current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start_time"] = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_start_time")
+    stats = current_stats.get()
+    if stats is not None:
+        stats.add_sql(statement, time.perf_counter() - started)
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # statement ที่ error จะไม่ผ่าน after_cursor_execute
+    conn = exception_context.connection
+    started = conn.info.pop("query_start_time", None) if conn is not None else None
+    if started is None:
+        return
+    stats = current_stats.get()
+    if stats is not None:
+        stats.add_sql(exception_context.statement or "", time.perf_counter() - started)
+
+class MongoCommandCounter:
+    """pymongo command listener feeding the request's ``QueryStats``.
+
+    Motor copies the caller's context into its executor, so the request's
+    context variable is visible here. ``mongodb.command_listener`` mixes in
+    ``pymongo.monitoring.CommandListener`` so pymongo is not imported here.
+    """
+
+    def __init__(self):
+        self._started: Dict[int, tuple] = {}
+
+    def started(self, event):
+        self._started[event.request_id] = (current_stats.get(), event.command_name)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        stats, command_name = self._started.pop(event.request_id, (None, None))
+        if stats is not None:
+            stats.add_mongo(command_name, event.duration_micros / 1_000_000)
+
+class RouteQueryMetrics:
+    """Per-route query totals since the worker started."""
+
+    def __init__(self):
+        self.routes: Dict[str, Dict[str, float]] = {}
+
+    def record(self, route: str, stats: QueryStats):
+        entry = self.routes.setdefault(route, {
+            "requests": 0, "sql_queries": 0, "mongo_commands": 0,
+            "max_queries": 0, "db_time_ms": 0.0,
+        })
+        entry["requests"] += 1
+        entry["sql_queries"] += stats.sql_count
+        entry["mongo_commands"] += stats.mongo_count
+        entry["max_queries"] = max(entry["max_queries"], stats.total_count)
+        entry["db_time_ms"] += (stats.sql_time + stats.mongo_time) * 1000
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {
+            route: {**entry, "avg_queries": (entry["sql_queries"] + entry["mongo_commands"]) / entry["requests"]}
+            for route, entry in self.routes.items()
+        }
+
+route_metrics = RouteQueryMetrics()
+
+def query_stats_middleware(expose_headers: bool):
+    async def middleware(request: Request, call_next):
+        with count_queries(request.scope) as stats:
+            response = await call_next(request)
+        route_metrics.record(stats.route, stats)
+        if expose_headers:
+            response.headers["X-DB-Queries"] = f"sql={stats.sql_count}; mongo={stats.mongo_count}"
+            response.headers["X-DB-Time-Ms"] = f"{(stats.sql_time + stats.mongo_time) * 1000:.1f}"
+        return response
+    return middleware
@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+TEMPLATE_DIRECTORY = "backend/template"
+
+# jinja2 ใช้แค่หน้ายืนยันอีเมล/รีเซ็ตรหัสผ่านและอีเมล จึง import เมื่อใช้ครั้งแรก (หรือตอน warm-up)
+# แทนที่จะโหลดตอน import แอป; สร้างครั้งเดียว Jinja2 เก็บ template ที่ compile แล้วไว้ใน environment
+
+@lru_cache
+def get_templates():
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory=TEMPLATE_DIRECTORY)
+
+@lru_cache
+def get_email_templates():
+    from jinja2 import Environment, FileSystemLoader
+    return Environment(loader=FileSystemLoader(TEMPLATE_DIRECTORY))
+
+def warm_templates() -> int:
+    """Compile every template ahead of the first request; returns how many."""
+    names = get_email_templates().list_templates()
+    for name in names:
+        get_email_templates().get_template(name)
+        get_templates().get_template(name)
+    return len(names)
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Allow ``rate`` events per second on average, with bursts up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def allow(self, cost: float = 1) -> bool:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+class Coalescer:
+    """Merge ephemeral events per (event, room) into one emit per window.
+
+    Updates are keyed (e.g. by user id) and a newer update replaces the
+    pending one for the same key, so stale typing/presence states are never
+    sent. Each room holds at most ``max_pending`` keys; beyond that the
+    oldest update is dropped.
+    """
+
+    def __init__(self, emit: Callable[[str, str, Dict[Hashable, Any]], Awaitable[None]], window: float, max_pending: int):
+        self.emit = emit
+        self.window = window
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[str, str], Dict[Hashable, Any]] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.dropped = 0
+
+    def push(self, event: str, room: str, key: Hashable, value: Any):
+        pending = self._pending.setdefault((event, room), {})
+        pending.pop(key, None)
+        pending[key] = value
+        if len(pending) > self.max_pending:
+            del pending[next(iter(pending))]
+            self.dropped += 1
+
+        if (event, room) not in self._timers:
+            self._timers[(event, room)] = asyncio.create_task(self._flush_later(event, room))
+
+    async def _flush_later(self, event: str, room: str):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._timers.pop((event, room), None)
+        updates = self._pending.pop((event, room), None)
+        if updates:
+            try:
+                await self.emit(event, room, updates)
+            except Exception:
+                logger.exception("Failed to emit coalesced %s to %s", event, room)
+
+    async def close(self):
+        timers = list(self._timers.values())
+        for timer in timers:
+            timer.cancel()
+        await asyncio.gather(*timers, return_exceptions=True)
+        self._pending.clear()
@@ -0,0 +1,61 @@
+"""Startup warm-up and readiness.
+
+The lifespan opens the SQL and Mongo pools, the storage client, the
+category cache, templates and the password hasher before the worker says
+it is ready. A load balancer polling ``/health/ready`` therefore only
+sends traffic once the first request will be as fast as later ones.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict
+
+import anyio
+
+from . import db
+from .db import mongodb
+from .storage import get_storage
+from .utils.auth import pwd_context
+from .utils.category_cache import get_category_cache
+from .utils.templates import warm_templates
+
+logger = logging.getLogger(__name__)
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.warmup_ms: Dict[str, float] = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "warmup_ms": dict(self.warmup_ms)}
+
+readiness = Readiness()
+
+async def warm_categories():
+    async with db.async_session_maker() as session:
+        await get_category_cache().load(session)
+
+async def warm_password_hashing():
+    # passlib เลือก backend ของ bcrypt ตอนใช้ครั้งแรก (import และทดสอบ backend)
+    pwd_context.handler("bcrypt").get_backend()
+
+async def warm_up(settings):
+    async def timed(name: str, step):
+        started = time.perf_counter()
+        await step
+        readiness.warmup_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def compile_templates():
+        # import jinja2 และ compile ใช้ CPU ล้วน ๆ ทำใน thread ให้ซ้อนกับการรอเชื่อมต่อขั้นอื่น
+        await anyio.to_thread.run_sync(warm_templates)
+
+    await asyncio.gather(
+        timed("sql", db.warm_pool(min(settings.DB_WARM_CONNECTIONS, settings.DB_POOL_SIZE))),
+        timed("mongo", mongodb.get_db().warm_pool(settings.MONGO_WARM_CONNECTIONS)),
+        timed("storage", get_storage().warm_up()),
+        timed("categories", warm_categories()),
+        timed("templates", compile_templates()),
+        timed("password_hashing", warm_password_hashing()),
+    )
+    readiness.ready = True
+    logger.info("Warm-up finished: %s", readiness.warmup_ms)
@@ -0,0 +1,128 @@
+"""Seeded datasets for the micro-benchmarks.
+
+Rows are bulk-inserted with Core ``insert`` (the ORM would take minutes at
+a million items). A database whose item count already matches is reused,
+so the SQLite files under ``benchmarks/data`` are only built once. Seeding
+drops every table, so any other database that already has tables is
+refused unless ``reseed`` is passed.
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, inspect
+from sqlmodel import SQLModel, select
+
+from add_categories import categories as CATEGORY_NAMES
+from add_items import sample_descriptions, sample_titles
+from backend.models.category import Category
+from backend.models.exchanges import Exchange
+from backend.models.items import Item
+from backend.models.user import User
+
+BENCH_EMAIL = "bench@example.com"
+ITEMS_PER_USER = 20
+EXCHANGES = 20  # in each direction for the benchmark user
+BATCH_SIZE = 10_000
+
+def user_row(index: int, now: datetime) -> dict:
+    return {
+        "email": BENCH_EMAIL if index == 0 else f"user{index}@example.com",
+        "name": f"User {index}",
+        "hashed_password": "not-a-real-hash",
+        "is_active": True,
+        "is_verified": True,
+        "is_first_login": False,
+        "created_at": now,
+        "updated_at": now,
+        "post_count": ITEMS_PER_USER,
+        "exchange_complete_count": 0,
+        "rating": 0.0,
+        "rating_count": 0,
+    }
+
+def item_row(rng: random.Random, owner_id: int, category_ids, created_at: datetime) -> dict:
+    return {
+        "title": rng.choice(sample_titles),
+        "description": rng.choice(sample_descriptions),
+        "owner_id": owner_id,
+        "category_id": rng.choice(category_ids),
+        "preferred_category_ids": rng.sample(category_ids, 3),
+        "images": [],
+        "is_exchangeable": rng.random() < 0.7,
+        "require_all_categories": False,
+        "is_exchanged": rng.random() < 0.05,
+        "address": f"ที่อยู่สมมติ {rng.randint(1, 100)}",
+        "lon": rng.uniform(100, 101),
+        "lat": rng.uniform(13, 14),
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+async def item_count(engine) -> int:
+    async with engine.connect() as conn:
+        try:
+            return (await conn.execute(select(func.count()).select_from(Item))).scalar_one()
+        except Exception:
+            return -1
+
+class DatabaseNotEmpty(Exception):
+    pass
+
+async def table_names(engine):
+    async with engine.connect() as conn:
+        return await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+
+async def seed_dataset(engine, items: int, seed: int = 0, reseed: bool = False):
+    """Recreate the schema and fill it with ``items`` items, unless it already has them.
+
+    Raises ``DatabaseNotEmpty`` instead of dropping existing tables unless
+    ``reseed`` is true.
+    """
+    count = await item_count(engine)
+    if count == items:
+        return
+    if not reseed and await table_names(engine):
+        raise DatabaseNotEmpty(
+            f"{engine.url.render_as_string()} already has tables"
+            + (f" and {count} items" if count >= 0 else "")
+            + f", not {items}; pass --reseed to drop and reseed it"
+        )
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    users = max(2, items // ITEMS_PER_USER)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(insert(Category), [{"name": name} for name in CATEGORY_NAMES])
+        category_ids = list((await conn.execute(select(Category.id))).scalars())
+        for start in range(0, users, BATCH_SIZE):
+            await conn.execute(insert(User), [user_row(index, now) for index in range(start, min(start + BATCH_SIZE, users))])
+        user_ids = list((await conn.execute(select(User.id).order_by(User.id))).scalars())
+        bench_id = user_ids[0]
+
+        # items.created_at ย้อนหลังทีละวินาที ให้ลำดับของฟีดแน่นอน
+        for start in range(0, items, BATCH_SIZE):
+            await conn.execute(insert(Item), [
+                item_row(rng, user_ids[index % users], category_ids, now - timedelta(seconds=index))
+                for index in range(start, min(start + BATCH_SIZE, items))
+            ])
+
+        own = list((await conn.execute(select(Item.id).where(Item.owner_id == bench_id).limit(EXCHANGES))).scalars())
+        others = list((await conn.execute(
+            select(Item.id, Item.owner_id).where(Item.owner_id != bench_id).limit(2 * EXCHANGES)
+        )).all())
+        rows = []
+        for index, (item_id, owner_id) in enumerate(others[:EXCHANGES]):
+            # ขาออก: ผู้ใช้ benchmark ขอของคนอื่น
+            rows.append({"requester_id": bench_id, "requested_item_id": item_id,
+                         "offered_item_id": own[index % len(own)] if own else None})
+        for index, (item_id, owner_id) in enumerate(others[EXCHANGES:]):
+            # ขาเข้า: คนอื่นขอของผู้ใช้ benchmark
+            if own:
+                rows.append({"requester_id": owner_id, "requested_item_id": own[index % len(own)],
+                             "offered_item_id": item_id})
+        if rows:
+            await conn.execute(insert(Exchange), [
+                {**row, "status": "pending", "created_at": now, "updated_at": now} for row in rows
+            ])
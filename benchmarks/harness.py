@@ -0,0 +1,87 @@
+"""Timing, baselines and comparison for the micro-benchmarks."""
+import inspect
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+async def measure(fn, min_time: float = 0.2, repeats: int = 5) -> Dict[str, Any]:
+    """Time ``fn`` (sync or async, no arguments) like ``timeit``.
+
+    The loop count doubles until one repeat takes ``min_time``; the result
+    is the median and minimum time per call over ``repeats`` repeats.
+    """
+    is_async = inspect.iscoroutinefunction(fn)
+
+    async def run(loops: int) -> float:
+        started = time.perf_counter()
+        if is_async:
+            for _ in range(loops):
+                await fn()
+        else:
+            for _ in range(loops):
+                fn()
+        return time.perf_counter() - started
+
+    await run(1)  # warm-up: caches, compiled statements, first connection
+    # 1, 2, 5, 10, 20, 50, ... เหมือน timeit.autorange
+    loops = 1
+    for multiplier in itertools.cycle((2, 2.5, 2)):
+        if await run(loops) >= min_time:
+            break
+        loops = int(loops * multiplier)
+    timings = [await run(loops) / loops for _ in range(repeats)]
+    return {
+        "median_us": round(statistics.median(timings) * 1e6, 2),
+        "min_us": round(min(timings) * 1e6, 2),
+        "loops": loops,
+    }
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} {platform.node()}",
+    }
+
+def save(path: str, results: Dict[str, Dict[str, Any]], database: str):
+    with open(path, "w") as f:
+        json.dump({**environment(), "database": database, "results": results}, f, indent=2)
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+def compare(baseline: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]],
+            tolerance: float = 0.15) -> Tuple[List[str], List[str]]:
+    """(regressions, improvements) beyond ``tolerance`` in median time per call."""
+    regressions, improvements = [], []
+    for name, before in baseline.items():
+        after = current.get(name)
+        if after is None:
+            continue
+        change = after["median_us"] / before["median_us"] - 1
+        line = f"{name}: {format_us(before['median_us'])} -> {format_us(after['median_us'])} ({change:+.0%})"
+        if change > tolerance:
+            regressions.append(line)
+        elif change < -tolerance:
+            improvements.append(line)
+    return regressions, improvements
+
+def format_us(us: float) -> str:
+    if us >= 1e6:
+        return f"{us / 1e6:.2f} s"
+    if us >= 1e3:
+        return f"{us / 1e3:.2f} ms"
+    return f"{us:.1f} us"
+
+def print_results(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]] = None, out=sys.stdout):
+    width = max((len(name) for name in results), default=10)
+    print(f"{'benchmark':<{width}} {'median':>10} {'min':>10} {'loops':>7}" + ("  vs baseline" if baseline else ""), file=out)
+    for name, result in results.items():
+        line = f"{name:<{width}} {format_us(result['median_us']):>10} {format_us(result['min_us']):>10} {result['loops']:>7}"
+        if baseline and name in baseline:
+            line += f"  {result['median_us'] / baseline[name]['median_us'] - 1:+.0%}"
+        print(line, file=out)
@@ -0,0 +1,201 @@
+"""Micro-benchmarks for hot paths: ``python -m benchmarks.run``.
+
+Covers ``ItemRead`` construction from ORM rows, ``ExchangeRead`` list
+building, ``create_access_token``, ``get_current_user`` (token decode and
+user lookup), the feed statement builder and the whole ``get_items``
+endpoint against seeded datasets (``--sizes 1k,100k,1m``). Results can be
+saved as a baseline and later runs compared against it::
+
+    python -m benchmarks.run --sizes 1k,100k --save baseline.json
+    python -m benchmarks.run --sizes 1k,100k --compare baseline.json
+
+``benchmarks/baselines/main.json`` is a recorded 1k SQLite run.
+
+``--compare`` exits non-zero when a benchmark got slower than
+``--tolerance``. Baselines only mean something on the machine (and
+database) they were recorded on.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import joinedload, selectinload, sessionmaker
+from sqlmodel import select
+
+from backend.models.exchanges import Exchange
+from backend.models.items import Item
+from backend.models.user import User
+from backend.router.exchange import incoming_exchange_read, outgoing_exchange_read
+from backend.router.item import feed_statements, get_items, item_read, preferred_categories_by_id
+from backend.utils.auth import create_access_token, get_current_user
+
+from . import harness
+from .dataset import BENCH_EMAIL, DatabaseNotEmpty, seed_dataset
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+PAGE_SIZE = 20
+SEARCH_TERM = "กล้อง"
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+def size_label(size: int) -> str:
+    if size >= 1_000_000 and size % 1_000_000 == 0:
+        return f"{size // 1_000_000}m"
+    if size >= 1_000 and size % 1_000 == 0:
+        return f"{size // 1_000}k"
+    return str(size)
+
+def database_url(size: int, url: str = None) -> str:
+    if url:
+        return url
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return f"sqlite+aiosqlite:///{os.path.join(DATA_DIR, f'items-{size_label(size)}.db')}"
+
+async def load_fixtures(session) -> Dict[str, Any]:
+    """The rows the pure benchmarks work on, loaded the way the routers load them."""
+    user = (await session.execute(select(User).where(User.email == BENCH_EMAIL))).scalar_one()
+    result = await session.execute(
+        select(Item).options(selectinload(Item.owner), selectinload(Item.category))
+        .order_by(Item.created_at.desc()).limit(PAGE_SIZE)
+    )
+    items = result.scalars().all()
+    incoming = (await session.execute(
+        select(Exchange)
+        .options(
+            joinedload(Exchange.requested_item).joinedload(Item.category),
+            joinedload(Exchange.offered_item).joinedload(Item.category),
+            joinedload(Exchange.requester),
+        )
+        .join(Item, Exchange.requested_item_id == Item.id)
+        .where(Item.owner_id == user.id)
+    )).scalars().all()
+    outgoing = (await session.execute(
+        select(Exchange)
+        .options(
+            joinedload(Exchange.requested_item).joinedload(Item.category),
+            joinedload(Exchange.offered_item).joinedload(Item.category),
+            joinedload(Exchange.requested_item).joinedload(Item.owner),
+        )
+        .where(Exchange.requester_id == user.id)
+    )).scalars().all()
+    return {
+        "user": user,
+        "items": items,
+        "categories": await preferred_categories_by_id(session, items),
+        "incoming": incoming,
+        "outgoing": outgoing,
+        "requested_item_ids": [exchange.requested_item_id for exchange in outgoing],
+    }
+
+def pure_benchmarks(fixtures) -> Dict[str, Any]:
+    """Benchmarks that don't touch the database; their cost doesn't depend on the dataset size."""
+    user, items, categories = fixtures["user"], fixtures["items"], fixtures["categories"]
+    incoming, outgoing = fixtures["incoming"], fixtures["outgoing"]
+    requested_item_ids = fixtures["requested_item_ids"]
+    return {
+        f"item_read[page={len(items)}]": lambda: [item_read(item, categories) for item in items],
+        f"exchange_reads[{len(incoming)}+{len(outgoing)}]": lambda: (
+            [incoming_exchange_read(exchange) for exchange in incoming],
+            [outgoing_exchange_read(exchange) for exchange in outgoing],
+        ),
+        "create_access_token": lambda: create_access_token({"sub": user.email}, timedelta(minutes=30)),
+        "feed_statements": lambda: feed_statements(user.id, requested_item_ids),
+        "feed_statements[search]": lambda: feed_statements(user.id, requested_item_ids, SEARCH_TERM),
+    }
+
+def database_benchmarks(session_maker, user) -> Dict[str, Any]:
+    token = create_access_token({"sub": user.email}, timedelta(minutes=30))
+
+    async def current_user():
+        async with session_maker() as session:
+            await get_current_user(token=token, session=session)
+
+    async def feed(query=None):
+        async with session_maker() as session:
+            await get_items(session=session, current_user=user, query=query, page=1,
+                            items_per_page=PAGE_SIZE, sort_by="created_at", sort_order="desc")
+
+    async def search():
+        await feed(SEARCH_TERM)
+
+    return {
+        "get_current_user": current_user,
+        "get_items": feed,
+        "get_items[search]": search,
+    }
+
+async def run(sizes: List[int], url: str = None, min_time: float = 0.2, repeats: int = 5,
+              only: str = None, log=print, reseed: bool = False) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    # ไฟล์ SQLite ใต้ benchmarks/data เป็นของ benchmark เอง สร้างใหม่ได้เสมอ
+    reseed = reseed or not url
+    for index, size in enumerate(sizes):
+        engine = create_async_engine(database_url(size, url))
+        try:
+            log(f"Preparing {size_label(size)} items ...")
+            await seed_dataset(engine, size, reseed=reseed)
+            session_maker = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+            async with session_maker() as session:
+                fixtures = await load_fixtures(session)
+            cases = {f"{name}[{size_label(size)}]": fn
+                     for name, fn in database_benchmarks(session_maker, fixtures["user"]).items()}
+            if index == 0:
+                cases = {**pure_benchmarks(fixtures), **cases}
+            for name, fn in cases.items():
+                if only and only not in name:
+                    continue
+                results[name] = await harness.measure(fn, min_time, repeats)
+        finally:
+            await engine.dispose()
+    return results
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the micro-benchmarks.")
+    parser.add_argument("--sizes", default="1k", help="comma separated item counts, e.g. 1k,100k,1m")
+    parser.add_argument("--database-url", help="benchmark this database (e.g. Postgres) instead of SQLite files; "
+                        "use a dedicated database, it is refused if it already has other data")
+    parser.add_argument("--reseed", action="store_true",
+                        help="allow dropping and reseeding --database-url when its item count differs")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--only", help="run benchmarks whose name contains this")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    try:
+        results = asyncio.run(run(sizes, args.database_url, args.min_time, args.repeats, args.only,
+                                  reseed=args.reseed))
+    except DatabaseNotEmpty as error:
+        parser.exit(2, f"{error}\n")
+    database = (args.database_url or "sqlite").split(":")[0]
+
+    baseline = harness.load(args.compare) if args.compare else None
+    print()
+    harness.print_results(results, baseline["results"] if baseline else None)
+    if args.save:
+        harness.save(args.save, results, database)
+        print(f"\nSaved to {args.save}")
+    if not baseline:
+        return 0
+
+    if (baseline.get("machine"), baseline.get("database")) != (harness.environment()["machine"], database):
+        print(f"\nWarning: baseline is from {baseline.get('machine')} ({baseline.get('database')})")
+    regressions, improvements = harness.compare(baseline["results"], results, args.tolerance)
+    for line in improvements:
+        print(f"faster {line}")
+    for line in regressions:
+        print(f"SLOWER {line}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Marketplace load test: ``locust -f loadtest/locustfile.py --host http://localhost:9090``.
+
+Each virtual user logs in as one seeded trader (see ``loadtest/seed.py``)
+and mixes what people do in the app: browsing and searching the feed
+dominates, then opening items, chats and messages over the socket, and now
+and then a whole exchange (request, the peer accepts, complete). Adjust
+``@task`` weights when the production mix changes.
+
+``--report-json PATH`` writes p50/p95/p99, throughput and failures per
+endpoint when the run ends; compare two runs with ``python -m loadtest.report``.
+"""
+import itertools
+import json
+import os
+import random
+import time
+
+from locust import HttpUser, between, events, task
+from locust.runners import WorkerRunner
+
+# locust ใส่โฟลเดอร์ของ locustfile ไว้ใน sys.path
+from report import write_report
+from socketio_client import SocketIOClient
+
+MANIFEST = os.environ.get("LOADTEST_MANIFEST", os.path.join(os.path.dirname(__file__), "manifest.json"))
+FEED_PAGES = 5
+PAGE_SIZE = 20
+
+with open(MANIFEST) as f:
+    manifest = json.load(f)
+# บัญชีละหนึ่งผู้ใช้เสมือน ถ้าผู้ใช้มากกว่าบัญชีที่ seed ไว้ การแลกจะชนกันและนับเป็น failure
+accounts = itertools.cycle(manifest["traders"])
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument("--report-json", default=os.environ.get("LOADTEST_REPORT_JSON", ""),
+                        help="write per-endpoint percentiles and throughput here when the run ends")
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    path = environment.parsed_options.report_json if environment.parsed_options else ""
+    # ใน distributed mode มีแค่ master ที่ถือสถิติรวมของทุก worker
+    if path and not isinstance(environment.runner, WorkerRunner):
+        write_report(environment.stats, path)
+
+class MarketplaceUser(HttpUser):
+    wait_time = between(1, 5)
+
+    def on_start(self):
+        account = next(accounts)
+        self.peer_id = account["peer"]["id"]
+        self.offered_items = list(account["items"])
+        self.requested_items = list(account["peer"]["items"])
+        self.seen_items = []
+        self.headers = self.login(account["email"])
+        self.peer_headers = self.login(account["peer"]["email"])
+
+        response = self.client.post("/api/chats", json={"user": self.peer_id}, headers=self.headers)
+        self.chat_id = response.json()["chat_id"] if response.ok else None
+        self.socket = None
+        if self.headers and self.chat_id:
+            self.connect_socket()
+
+    def on_stop(self):
+        if self.socket is not None:
+            self.socket.close()
+
+    def login(self, email: str):
+        response = self.client.post("/api/auth/login", json={"username": email, "password": manifest["password"]})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"} if response.ok else {}
+
+    def timed_socket(self, name: str, call) -> bool:
+        """Run a socket round trip and report it to locust like an HTTP request."""
+        started = time.perf_counter()
+        exception = None
+        try:
+            result = call()
+            if isinstance(result, dict) and result.get("ok") is False:
+                exception = Exception(result.get("error"))
+        except Exception as e:
+            exception = e
+        self.environment.events.request.fire(
+            request_type="WS",
+            name=name,
+            response_time=(time.perf_counter() - started) * 1000,
+            response_length=0,
+            exception=exception,
+            context={},
+        )
+        return exception is None
+
+    def connect_socket(self):
+        token = self.headers["Authorization"][len("Bearer "):]
+        socket = SocketIOClient(self.host, token)
+        self.socket = None
+        if self.timed_socket("connect", socket.connect) and self.timed_socket(
+            "join_room", lambda: socket.call("join_room", {"room": self.chat_id})
+        ):
+            self.socket = socket
+        else:
+            socket.close()
+
+    @task(40)
+    def browse_feed(self):
+        page = random.randint(1, FEED_PAGES)
+        response = self.client.get(
+            f"/api/items/?page={page}&items_per_page={PAGE_SIZE}",
+            headers=self.headers,
+            name="/api/items/?page=[page]",
+        )
+        if response.ok:
+            self.seen_items = [item["id"] for item in response.json()["items"]] or self.seen_items
+
+    @task(15)
+    def search(self):
+        self.client.get(
+            "/api/items/",
+            params={"query": random.choice(manifest["search_terms"]), "items_per_page": PAGE_SIZE},
+            headers=self.headers,
+            name="/api/items/?query=[term]",
+        )
+
+    @task(20)
+    def item_detail(self):
+        if self.seen_items:
+            self.client.get(f"/api/items/{random.choice(self.seen_items)}", headers=self.headers, name="/api/items/[id]")
+
+    @task(4)
+    def categories(self):
+        self.client.get("/api/categorys/categories", headers=self.headers)
+
+    @task(5)
+    def chat_sessions(self):
+        self.client.get("/api/chats/sessions", headers=self.headers)
+
+    @task(5)
+    def chat_messages(self):
+        if self.chat_id:
+            self.client.get(f"/api/chats/messages/{self.chat_id}", headers=self.headers, name="/api/chats/messages/[id]")
+
+    @task(8)
+    def send_message(self):
+        if self.socket is None or not self.socket.connected:
+            if not self.chat_id:
+                return
+            self.connect_socket()
+            if self.socket is None:
+                return
+        self.timed_socket("send_message", lambda: self.socket.call(
+            "send_message", {"chat_id": self.chat_id, "message": f"load test {time.time():.3f}", "message_type": "text"},
+        ))
+
+    @task(3)
+    def exchange(self):
+        if not self.requested_items:
+            return
+        requested = self.requested_items.pop()
+        offered_id = None
+        if requested["is_exchangeable"]:
+            if not self.offered_items:
+                return
+            offered_id = self.offered_items.pop()
+
+        response = self.client.post(
+            "/api/exchanges/request",
+            json={"requested_item_id": requested["id"], "offered_item_id": offered_id},
+            headers=self.headers,
+        )
+        if not response.ok:
+            return
+        exchange_id = response.json()["id"]
+
+        self.client.get("/api/exchanges/incoming", headers=self.peer_headers)
+        response = self.client.post("/api/exchanges/accept", json={"exchange_id": exchange_id}, headers=self.peer_headers)
+        if not response.ok:
+            return
+        self.client.post(
+            "/api/exchanges/check-uuid",
+            json={"exchange_id": exchange_id, "exchange_uuid": response.json()["exchange_uuid"]},
+            headers=self.headers,
+        )
+        self.client.get("/api/exchanges/outgoing", headers=self.headers)
@@ -0,0 +1,106 @@
+"""Per-endpoint load-test results as JSON, and regression checks between runs.
+
+The locustfile writes ``summarize(environment.stats)`` when the run ends
+(``--report-json``). Compare a run with a saved baseline with::
+
+    python -m loadtest.report baseline.json current.json --tolerance 0.2
+
+which exits non-zero when an endpoint's p95/p99 grew or its throughput
+fell beyond the tolerance, or its failure rate rose.
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+def summarize_entry(entry) -> Dict[str, Any]:
+    summary = {
+        "requests": entry.num_requests,
+        "failures": entry.num_failures,
+        "rps": round(entry.total_rps, 2),
+        "avg_ms": round(entry.avg_response_time, 1),
+        "max_ms": entry.max_response_time,
+    }
+    for name, percent in PERCENTILES.items():
+        summary[f"{name}_ms"] = entry.get_response_time_percentile(percent) if entry.num_requests else None
+    return summary
+
+def summarize(stats) -> Dict[str, Any]:
+    """JSON-ready summary of a locust ``RequestStats``."""
+    endpoints = {
+        f"{entry.method} {entry.name}": summarize_entry(entry)
+        for entry in sorted(stats.entries.values(), key=lambda entry: (entry.name, entry.method))
+    }
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "duration_s": round(stats.total.last_request_timestamp - stats.total.start_time, 1)
+        if stats.total.last_request_timestamp else 0,
+        "total": summarize_entry(stats.total),
+        "endpoints": endpoints,
+    }
+
+def write_report(stats, path: str) -> Dict[str, Any]:
+    report = summarize(stats)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+def failure_rate(summary: Dict[str, Any]) -> float:
+    return summary["failures"] / summary["requests"] if summary["requests"] else 0.0
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.2,
+            min_requests: int = 50, max_failure_increase: float = 0.01) -> List[str]:
+    """Regressions of ``current`` against ``baseline``, one line each.
+
+    Endpoints with fewer than ``min_requests`` in either run are skipped:
+    their percentiles are too noisy to compare.
+    """
+    regressions = []
+    pairs = [("total", baseline["total"], current["total"])]
+    pairs += [
+        (name, before, current["endpoints"][name])
+        for name, before in baseline["endpoints"].items()
+        if name in current["endpoints"]
+    ]
+    for name, before, after in pairs:
+        if min(before["requests"], after["requests"]) < min_requests:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if before[key] and after[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {before[key]} -> {after[key]}")
+        if after["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {before['rps']} -> {after['rps']}")
+        # อัตราล้มเหลวเทียบแบบบวกเพิ่ม (0.01 = 1 จุดเปอร์เซ็นต์) เพราะ baseline มักเป็น 0
+        if failure_rate(after) > failure_rate(before) + max_failure_increase:
+            regressions.append(f"{name}: failure rate {failure_rate(before):.2%} -> {failure_rate(after):.2%}")
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare a load-test report with a baseline.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change (0.2 = 20%%)")
+    parser.add_argument("--min-requests", type=int, default=50)
+    parser.add_argument("--max-failure-increase", type=float, default=0.01, help="0.01 = one percentage point")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    missing = sorted(set(baseline["endpoints"]) - set(current["endpoints"]))
+    if missing:
+        print(f"Not in the current run: {', '.join(missing)}")
+    regressions = compare(baseline, current, args.tolerance, args.min_requests, args.max_failure_increase)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
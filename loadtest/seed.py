@@ -0,0 +1,123 @@
+"""Seed data for the load test: ``python -m loadtest.seed``.
+
+Creates verified traders, each paired with a peer who owns the items the
+trader asks for (so a virtual user can walk a whole exchange without
+racing other users), plus a catalog of items for the feed. The accounts
+and item ids are written to a manifest that the locustfile reads. Every
+run uses fresh e-mail addresses, so it can be repeated on the same
+database.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from sqlmodel import select
+
+from add_categories import categories as CATEGORY_NAMES
+from add_items import sample_descriptions, sample_titles
+from backend import db
+from backend.core.config import get_settings
+from backend.models.category import Category
+from backend.models.items import Item
+from backend.models.user import User
+from backend.utils.auth import get_password_hash
+
+DEFAULT_PASSWORD = "loadtest-password"
+
+async def ensure_categories(session):
+    result = await session.execute(select(Category))
+    categories = result.scalars().all()
+    if not categories:
+        categories = [Category(name=name) for name in CATEGORY_NAMES]
+        session.add_all(categories)
+        await session.flush()
+    return [category.id for category in categories]
+
+def new_item(owner: User, category_ids, is_exchangeable: bool) -> Item:
+    return Item(
+        title=random.choice(sample_titles),
+        description=random.choice(sample_descriptions),
+        owner_id=owner.id,
+        category_id=random.choice(category_ids),
+        preferred_category_ids=random.sample(category_ids, min(3, len(category_ids))),
+        is_exchangeable=is_exchangeable,
+        address=f"ที่อยู่สมมติ {random.randint(1, 100)}",
+        lon=random.uniform(100, 101),
+        lat=random.uniform(13, 14),
+    )
+
+async def seed(traders: int, items_per_trader: int, catalog_items: int, password: str, tag: str):
+    # hash ครั้งเดียวใช้กับทุกบัญชี bcrypt ทีละบัญชีจะช้ากว่าการ insert ทั้งหมด
+    hashed_password = get_password_hash(password)
+
+    def new_user(suffix: str) -> User:
+        return User(
+            name=f"Load test {suffix}",
+            email=f"loadtest-{tag}-{suffix}@example.com",
+            hashed_password=hashed_password,
+            is_active=True,
+            is_verified=True,
+        )
+
+    async with db.async_session_maker() as session:
+        category_ids = await ensure_categories(session)
+        pairs = [(new_user(str(index)), new_user(f"{index}-peer")) for index in range(traders)]
+        session.add_all([user for pair in pairs for user in pair])
+        await session.flush()
+
+        stock = []
+        for trader, peer in pairs:
+            offered = [new_item(trader, category_ids, True) for _ in range(items_per_trader)]
+            # ครึ่งหนึ่งเป็นของบริจาค (ขอได้โดยไม่ต้องเสนอของแลก)
+            requested = [new_item(peer, category_ids, index % 2 == 0) for index in range(items_per_trader)]
+            session.add_all(offered + requested)
+            stock.append((offered, requested))
+        owners = [user for pair in pairs for user in pair]
+        session.add_all([
+            new_item(random.choice(owners), category_ids, random.random() < 0.7)
+            for _ in range(catalog_items)
+        ])
+        await session.flush()
+
+        manifest = {
+            "tag": tag,
+            "password": password,
+            "search_terms": sample_titles,
+            "traders": [
+                {
+                    "email": trader.email,
+                    "id": trader.id,
+                    "items": [item.id for item in offered],
+                    "peer": {
+                        "email": peer.email,
+                        "id": peer.id,
+                        "items": [{"id": item.id, "is_exchangeable": item.is_exchangeable} for item in requested],
+                    },
+                }
+                for (trader, peer), (offered, requested) in zip(pairs, stock)
+            ],
+        }
+        await session.commit()
+    return manifest
+
+async def main(args):
+    db.init_db(get_settings())
+    try:
+        manifest = await seed(args.traders, args.items_per_trader, args.catalog_items, args.password, args.tag)
+    finally:
+        await db.close_session()
+    with open(args.output, "w") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"Seeded {args.traders} trader pairs and {args.catalog_items} catalog items, manifest in {args.output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed accounts and items for the load test.")
+    parser.add_argument("--traders", type=int, default=200, help="at least the number of locust users")
+    parser.add_argument("--items-per-trader", type=int, default=20, help="exchanges each trader can complete")
+    parser.add_argument("--catalog-items", type=int, default=5000)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--tag", default=time.strftime("%Y%m%d%H%M%S"))
+    parser.add_argument("--output", default="loadtest/manifest.json")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""Minimal blocking Socket.IO client for the load test.
+
+python-socketio's own client needs ``websocket-client`` for the websocket
+transport, and long-polling would need sticky sessions in front of several
+workers. This speaks Engine.IO v4 over ``websockets`` (already installed
+with uvicorn) and only supports what the locustfile uses: connect with a
+token and emit events that expect an ack.
+"""
+import itertools
+import json
+from urllib.parse import urlsplit, urlunsplit
+
+import gevent
+from gevent.event import AsyncResult
+from socketio import packet
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.client import connect
+
+# Engine.IO packet types
+OPEN, CLOSE, PING, PONG, MESSAGE = "0", "1", "2", "3", "4"
+
+class SocketIOError(Exception):
+    pass
+
+def websocket_url(base_url: str, path: str = "socket.io") -> str:
+    parts = urlsplit(base_url)
+    scheme = "wss" if parts.scheme == "https" else "ws"
+    return urlunsplit((scheme, parts.netloc, f"/{path.strip('/')}/", "EIO=4&transport=websocket", ""))
+
+class SocketIOClient:
+    def __init__(self, base_url: str, token: str, timeout: float = 10):
+        self.url = websocket_url(base_url)
+        self.token = token
+        self.timeout = timeout
+        self.ws = None
+        self._ids = itertools.count(1)
+        self._acks = {}
+        self._reader = None
+
+    @property
+    def connected(self) -> bool:
+        return self._reader is not None and not self._reader.dead
+
+    def connect(self):
+        self.ws = connect(self.url, open_timeout=self.timeout, close_timeout=1)
+        opening = self.ws.recv(timeout=self.timeout)
+        if not opening.startswith(OPEN):
+            raise SocketIOError(f"Unexpected Engine.IO handshake: {opening!r}")
+        self.ws.send(MESSAGE + packet.Packet(packet.CONNECT, data={"token": self.token}).encode())
+        while True:
+            message = self.ws.recv(timeout=self.timeout)
+            if message == PING:
+                self.ws.send(PONG)
+                continue
+            reply = packet.Packet(encoded_packet=message[1:])
+            if reply.packet_type == packet.CONNECT:
+                break
+            if reply.packet_type == packet.CONNECT_ERROR:
+                self.close()
+                raise SocketIOError(f"Connection refused: {reply.data}")
+        # อ่านใน greenlet แยก ตอบ ping ของเซิร์ฟเวอร์ได้แม้ผู้ใช้ไม่ได้ส่งอะไรเป็นเวลานาน
+        self._reader = gevent.spawn(self._read)
+
+    def call(self, event: str, data):
+        """Emit ``event`` and wait for the server's ack."""
+        if not self.connected:
+            raise SocketIOError("Not connected")
+        ack_id = next(self._ids)
+        result = self._acks[ack_id] = AsyncResult()
+        self.ws.send(MESSAGE + packet.Packet(packet.EVENT, data=[event, data], id=ack_id).encode())
+        try:
+            args = result.get(timeout=self.timeout)
+        except gevent.Timeout:
+            raise SocketIOError(f"No ack for {event} within {self.timeout}s")
+        finally:
+            self._acks.pop(ack_id, None)
+        return args[0] if len(args) == 1 else args
+
+    def close(self):
+        if self.ws is not None:
+            self.ws.close()
+        if self._reader is not None:
+            self._reader.join(timeout=1)
+            self._reader = None
+
+    def _read(self):
+        try:
+            for message in self.ws:
+                if message == PING:
+                    self.ws.send(PONG)
+                elif message.startswith(MESSAGE):
+                    reply = packet.Packet(encoded_packet=message[1:])
+                    if reply.packet_type == packet.ACK and reply.id in self._acks:
+                        self._acks[reply.id].set(reply.data)
+                elif message.startswith(CLOSE):
+                    break
+        except ConnectionClosed:
+            pass
+        for result in self._acks.values():
+            result.set_exception(SocketIOError("Connection closed"))
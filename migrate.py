@@ -0,0 +1,16 @@
+import asyncio
+from backend import db
+from backend.core import config
+from backend.db import migrations
+
+async def migrate():
+    settings = config.get_settings()
+    db.init_db(settings)
+    try:
+        applied = await migrations.upgrade(db.engine)
+        print(f"Applied migrations: {', '.join(applied)}" if applied else "Database is up to date.")
+    finally:
+        await db.close_session()
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,150 @@
+import asyncio
+import calendar
+import hashlib
+from bson import ObjectId
+from pymongo import UpdateOne
+from backend.db import mongodb
+from backend.core.config import get_settings
+from backend.router.chat import chat_pair_key
+from backend.utils.chat_messages import message_preview
+
+BATCH_SIZE = 500
+
+def source_message_id(chat_id: ObjectId, index: int, message: dict) -> ObjectId:
+    """The ``_id`` the ``index``-th embedded message of a chat is stored under.
+
+    The old ``$push`` didn't give messages an ``_id``, so one is derived from
+    the chat and the position in the array, which doesn't change until the
+    array is removed. The message's timestamp leads, like in any ObjectId, so
+    ``_id`` order within a second follows the array.
+    """
+    if message.get("_id") is not None:
+        return message["_id"]
+    timestamp = message.get("timestamp") or chat_id.generation_time
+    seconds = calendar.timegm(timestamp.utctimetuple())
+    chat_hash = hashlib.sha1(chat_id.binary).digest()[:4]
+    return ObjectId(seconds.to_bytes(4, "big") + chat_hash + index.to_bytes(4, "big"))
+
+async def move_embedded_messages(db):
+    """Move the old per-chat ``messages`` arrays into the ``messages`` collection.
+
+    Each message is upserted on its source id (see ``source_message_id``),
+    so re-running after an interrupted migration does not duplicate
+    anything, and two messages with the same timestamp and sender are both
+    kept.
+    """
+    chats = db["chats"]
+    messages = db["messages"]
+    moved = 0
+
+    async for chat in chats.find({"messages": {"$exists": True}}, {"messages": 1}):
+        embedded = chat.get("messages") or []
+        operations = []
+        for index, message in enumerate(embedded):
+            message_doc = {key: value for key, value in message.items() if key != "_id"}
+            message_doc["chat_id"] = chat["_id"]
+            operations.append(UpdateOne(
+                {"_id": source_message_id(chat["_id"], index, message)},
+                {"$setOnInsert": message_doc},
+                upsert=True,
+            ))
+
+        for start in range(0, len(operations), BATCH_SIZE):
+            await messages.bulk_write(operations[start:start + BATCH_SIZE], ordered=False)
+
+        await chats.update_one({"_id": chat["_id"]}, {"$unset": {"messages": ""}})
+        moved += len(embedded)
+        print(f"Migrated {len(embedded)} messages from chat {chat['_id']}")
+
+    print(f"Moved {moved} messages in total.")
+
+async def summarize_messages(db, chat_id, fallback_time):
+    """Recompute the inbox fields of a chat from its stored messages.
+
+    Existing history is treated as read so nobody gets a burst of old unread
+    badges after the migration.
+    """
+    messages = db["messages"]
+    message_count = await messages.count_documents({"chat_id": chat_id})
+    latest = await messages.find_one({"chat_id": chat_id}, sort=[("timestamp", -1)])
+    return {
+        "last_message": message_preview(latest) if latest else None,
+        "last_message_at": latest["timestamp"] if latest else fallback_time,
+        "message_count": message_count,
+    }
+
+async def backfill_inbox_fields(db):
+    """Add participants, last-message preview and counters to older chats."""
+    chats = db["chats"]
+    updated = 0
+
+    async for chat in chats.find({"participants": {"$exists": False}}, {"user1": 1, "user2": 1, "created_at": 1}):
+        participants = sorted([chat["user1"], chat["user2"]])
+        fallback_time = chat.get("created_at") or chat["_id"].generation_time.replace(tzinfo=None)
+        summary = await summarize_messages(db, chat["_id"], fallback_time)
+
+        await chats.update_one({"_id": chat["_id"]}, {"$set": {
+            **summary,
+            "participants": participants,
+            "read_counts": {str(user_id): summary["message_count"] for user_id in participants},
+        }})
+        updated += 1
+
+    print(f"Backfilled inbox fields on {updated} chats.")
+
+async def merge_duplicate_pairs(db):
+    """Fold chats created more than once for the same pair into one, then set pair_key.
+
+    The old find-then-insert in create_chat could race and create duplicates,
+    which would block the unique pair_key index. The chat that already has a
+    pair_key wins, otherwise the oldest; messages are re-pointed at it.
+    """
+    chats = db["chats"]
+    messages = db["messages"]
+    merged = 0
+
+    groups = chats.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {
+            "_id": "$participants",
+            "chat_ids": {"$push": "$_id"},
+            "keyed_ids": {"$push": {"$cond": [{"$ifNull": ["$pair_key", False]}, "$_id", "$$REMOVE"]}},
+        }},
+        {"$match": {"$or": [{"chat_ids.1": {"$exists": True}}, {"keyed_ids": {"$size": 0}}]}},
+    ])
+    async for group in groups:
+        participants = group["_id"]
+        survivor_id = group["keyed_ids"][0] if group["keyed_ids"] else group["chat_ids"][0]
+        duplicate_ids = [chat_id for chat_id in group["chat_ids"] if chat_id != survivor_id]
+
+        if duplicate_ids:
+            await messages.update_many({"chat_id": {"$in": duplicate_ids}}, {"$set": {"chat_id": survivor_id}})
+            await chats.delete_many({"_id": {"$in": duplicate_ids}})
+            survivor = await chats.find_one({"_id": survivor_id}, {"created_at": 1})
+            fallback_time = survivor.get("created_at") or survivor_id.generation_time.replace(tzinfo=None)
+            summary = await summarize_messages(db, survivor_id, fallback_time)
+            await chats.update_one({"_id": survivor_id}, {"$set": {
+                **summary,
+                "read_counts": {str(user_id): summary["message_count"] for user_id in participants},
+            }})
+            merged += len(duplicate_ids)
+
+        await chats.update_one({"_id": survivor_id}, {"$set": {"pair_key": chat_pair_key(*participants)}})
+
+    print(f"Merged {merged} duplicate chats.")
+
+async def migrate_chats():
+    settings = get_settings()
+    mongodb.init_mongoDB(settings)
+    await mongodb.connect_mongoDB()
+
+    try:
+        db = mongodb.get_db().db
+        await move_embedded_messages(db)
+        await backfill_inbox_fields(db)
+        await merge_duplicate_pairs(db)
+    finally:
+        mongodb.close_mongoDB()
+
+if __name__ == "__main__":
+    asyncio.run(migrate_chats())
@@ -0,0 +1,25 @@
+import argparse
+import asyncio
+from backend import db, storage
+from backend.core import config
+from backend.storage.reconciler import ImageReconciler
+
+async def reconcile(dry_run: bool):
+    settings = config.get_settings()
+    db.init_db(settings)
+    try:
+        reconciler = ImageReconciler(
+            storage.init_storage(settings), db.async_session_maker,
+            settings.IMAGE_GC_GRACE_SECONDS, settings.IMAGE_GC_BATCH_SIZE,
+        )
+        report = await reconciler.run(dry_run=dry_run)
+        action = "Would reclaim" if dry_run else "Reclaimed"
+        print(f"Scanned {report['scanned']} objects, {report['orphans']} orphaned. "
+              f"{action} {report['reclaimed_bytes']} bytes ({report['errors']} errors).")
+    finally:
+        await db.close_session()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete stored images that no item, user or category references.")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be deleted")
+    asyncio.run(reconcile(parser.parse_args().dry_run))
@@ -1 +1,2 @@
-poetry run uvicorn backend.main:create_app --reload --factory --host 0.0.0.0
\ No newline at end of file
+# development: single process with auto-reload (production uses `python -m backend.serve`)
+poetry run python -m backend.serve --reload "$@"